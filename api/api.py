@@ -1,25 +1,198 @@
 #!/usr/bin/env python3
 """FastAPI application for image classification."""
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import tarfile
+import time
+import zipfile
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
 from PIL import Image
 import io
+import numpy as np
+import uvicorn
+from api import limits
+from api.uploads import (
+    StreamedUpload,
+    UploadSource,
+    open_upload,
+    raw_upload,
+    raw_upload_openapi,
+    stream_image_body,
+    stream_image_upload,
+    upload_digest,
+    upload_openapi,
+)
+from api.limits import BodySizeLimitMiddleware
+from api.metrics import MetricsMiddleware, observe_batch, render_metrics
 from logic.classifier import (
-    predict_class,
+    DEFAULT_FIT,
+    DEFAULT_QUALITY,
+    FIT_MODES,
+    ImageProbe,
+    ImageTooLargeError,
+    check_image_limits,
+    DEFAULT_REDUCING_GAP,
+    DEFAULT_RESIZE_PROFILE,
+    RESIZE_PROFILES,
+    draft_image,
+    fit_image,
+    fit_scaled_size,
+    images_to_batch,
+    parse_size,
+    resize_cascade,
+    encode_image,
+    images_to_tensor,
+    tensor_to_npy,
+    predict_batch as predict_images,
+    predict_array,
     resize_image,
     preprocess_image,
     normalize_image,
+    probe_image,
 )
+from logic.pipeline import PipelineError, compile_pipeline, parse_pipeline
+from logic.batching import batcher_from_env
+from logic.cache import get_cache, make_key
+from logic.executor import EXECUTOR_KINDS, run_in_pool, pool_stats, shutdown_pools
+from logic.timing import count, recording, stage
+
+logger = logging.getLogger("api")
+
+
+class Readiness:
+    """Startup warm-up state, reported by /ready."""
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.seconds: Optional[float] = None
+
+    def finish(self, phases: Dict[str, float], seconds: float, error: Optional[str] = None):
+        """Record the outcome of the warm-up."""
+        self.phases = phases
+        self.seconds = seconds
+        self.error = error
+        self.ready = error is None
+
+    def status(self) -> dict:
+        """Get the readiness status and warm-up phase timings in milliseconds."""
+        if self.seconds is None:
+            return {"status": "starting"}
+        status = {
+            "status": "ready" if self.ready else "failed",
+            "warmup_ms": round(self.seconds * 1000, 2),
+            "phases_ms": {name: round(secs * 1000, 2) for name, secs in self.phases.items()},
+        }
+        if self.error is not None:
+            status["error"] = self.error
+        return status
+
+
+# Flipped by the warm-up started in lifespan()
+readiness = Readiness()
+
+
+async def _warm_up_in_background() -> None:
+    """Warm up the app and the worker pool, then mark the app as ready."""
+    started = time.perf_counter()
+    error = None
+    with recording() as recorder:
+        try:
+            await asyncio.to_thread(_warm_up_app)
+            await run_in_pool(_warm_up_jobs)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Warm-up failed")
+            error = str(e) or type(e).__name__
+    seconds = time.perf_counter() - started
+    readiness.finish(recorder.totals(), seconds, error)
+    logger.info(
+        "Warm-up finished in %.2fs (%s)",
+        seconds,
+        ", ".join(f"{name} {secs * 1000:.1f}ms" for name, secs in recorder.totals().items()),
+    )
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Application lifespan: warm up in the background (see /ready), and shut down
+    the worker pools on exit.
+    """
+    warm_up_task = asyncio.create_task(_warm_up_in_background())
+    yield
+    warm_up_task.cancel()
+    shutdown_pools()
+
+
+# Maximum number of images (after expanding archives) in one /predict_batch request
+MAX_BATCH_ITEMS = 256
+
+# Media types of the image formats that /resize and /preprocess can return
+IMAGE_MEDIA_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# Media type of the .npy tensors that /preprocess can return
+NPY_MEDIA_TYPE = "application/x-npy"
+
+# Content hashes accepted by the /by-hash endpoints: hex SHA-256 digests
+SHA256_HEX_LENGTH = 64
+
+# Maximum number of sizes in one /thumbnails request
+MAX_THUMBNAIL_SIZES = 16
+
+# Media types of the archives that /thumbnails can return
+THUMBNAIL_MEDIA_TYPES = {"zip": "application/zip", "multipart": "multipart/mixed"}
+
+# File extensions of the image formats, used to name /thumbnails outputs
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+# Chunk size used when streaming encoded images back
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Model input size used for predictions (width, height)
+MODEL_INPUT_SIZE = (224, 224)
+
+# Media type of the Prometheus text exposition format served by /metrics
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 
 app = FastAPI(
     title="Image Classification API",
     description="API for image classification and preprocessing",
     version="1.0.0",
+    lifespan=lifespan,
 )
+app.add_middleware(BodySizeLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Configure templates
 templates = Jinja2Templates(directory="templates")
@@ -41,32 +214,819 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+@app.get("/ready")
+async def ready_check():
+    """
+    Readiness endpoint: 503 until the startup warm-up has finished, then 200.
+
+    Unlike /health, which only shows that the process is serving, this is meant
+    for load balancers that should not route traffic to a cold worker.
+    """
+    status = readiness.status()
+    return JSONResponse(content=status, status_code=200 if readiness.ready else 503)
+
+
+@app.get("/stats")
+async def stats():
+    """
+    Runtime statistics endpoint (worker pool queue depth and wait times).
+    """
+    return {
+        "executor": pool_stats(),
+        "cache": get_cache().stats(),
+        "batching": predict_batcher.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics endpoint (request counts, latency histograms, bytes in/out).
+    """
+    return PlainTextResponse(render_metrics(), media_type=METRICS_MEDIA_TYPE)
+
+
+def _json_response(content: Any, headers: Optional[dict] = None) -> JSONResponse:
+    """Build a JSON response, timing serialization as the "serialize" stage."""
+    with stage("serialize"):
+        return JSONResponse(content=content, headers=headers)
+
+
+def _cache_enabled(cache_control: Optional[str]) -> bool:
+    """Check whether a Cache-Control request header allows using the result cache."""
+    directives = {directive.strip().lower() for directive in (cache_control or "").split(",")}
+    return not directives & {"no-cache", "no-store"}
+
+
+async def _run_job(job, contents: Union[UploadSource, Image.Image], *params: Any) -> Any:
+    """Run a job: coroutine functions are awaited, plain functions run in the worker pool."""
+    if asyncio.iscoroutinefunction(job):
+        return await job(contents, *params)
+    return await run_in_pool(job, contents, *params)
+
+
+async def _run_cached(
+    op: str,
+    cache_control: Optional[str],
+    job,
+    contents: Union[UploadSource, Image.Image],
+    *params: Any,
+    digest: Optional[str] = None,
+) -> Tuple[Any, str]:
+    """
+    Run a job in the worker pool through the result cache.
+
+    Args:
+        op: Operation name used in the cache key
+        cache_control: Cache-Control request header ("no-cache"/"no-store" bypass)
+        job: Job function called as job(contents, *params), or a coroutine function
+        contents: Uploaded image contents (see open_upload), or an image already
+            decoded from them
+        *params: Operation parameters, also used in the cache key
+        digest: Content hash of the upload, if already known (required when
+            contents is a decoded image)
+
+    Returns:
+        Tuple containing (job result, cache status: "HIT", "MISS" or "BYPASS")
+    """
+    cache = get_cache()
+    if not cache.enabled or not _cache_enabled(cache_control):
+        return await _run_job(job, contents, *params), "BYPASS"
+
+    if digest is None:
+        digest = await run_in_pool(upload_digest, contents)
+    key = make_key(op, digest, *params)
+    result = cache.get(key)
+    if result is not None:
+        return result, "HIT"
+
+    result = await _run_job(job, contents, *params)
+    cache.set(key, result)
+    return result, "MISS"
+
+
+def _etag(op: str, digest: str, *params: Any) -> str:
+    """
+    Get the strong ETag of a result, keyed like the result cache.
+
+    The tag is a hash of the API version, the operation, the content hash of the
+    upload and the parameters. The same upload with the same parameters always
+    gets the same tag, whether or not its result is still cached.
+    """
+    key = repr((app.version,) + make_key(op, digest, *params))
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """Check whether an If-None-Match request header matches an ETag (weakly)."""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _not_modified_response(etag: str) -> Response:
+    """Build a 304 Not Modified response for a matching If-None-Match header."""
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def _check_digest(sha256: str) -> str:
+    """Validate a hex SHA-256 content hash from a /by-hash path, returning it lowercased."""
+    digest = sha256.lower()
+    if len(digest) != SHA256_HEX_LENGTH or any(char not in "0123456789abcdef" for char in digest):
+        raise HTTPException(status_code=400, detail="Hash must be a hex SHA-256 digest")
+    return digest
+
+
+def _cached_result(op: str, digest: str, *params: Any) -> Any:
+    """Get a cached result by content hash and parameters, or raise 404."""
+    cache = get_cache()
+    result = cache.get(make_key(op, digest, *params)) if cache.enabled else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="No cached result for this hash")
+    return result
+
+
+def _check_profile(profile: str) -> None:
+    """Reject unknown resize profiles."""
+    if profile not in RESIZE_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Resize profile must be one of {', '.join(RESIZE_PROFILES)}",
+        )
+
+
+def _check_dimensions(width: int, height: int) -> None:
+    """Raise a 400 error unless the target dimensions are positive."""
+    if width <= 0 or height <= 0:
+        raise HTTPException(status_code=400, detail="Width and height must be positive integers")
+
+
+def _check_fit(fit: str) -> None:
+    """Reject unknown fit modes."""
+    if fit not in FIT_MODES:
+        raise HTTPException(status_code=400, detail=f"Fit must be one of {', '.join(FIT_MODES)}")
+
+
+def _negotiate_output(
+    return_type: str,
+    output_format: Optional[str],
+    accept: Optional[str],
+    allow_tensor: bool = False,
+) -> Optional[str]:
+    """
+    Decide whether to return an encoded image or tensor, and in which format.
+
+    An image is returned for ?return=image, for an explicit ?format=, or when the
+    Accept header asks for one of IMAGE_MEDIA_TYPES. JPEG is the default format.
+    If allow_tensor is set, ?return=tensor or Accept: application/x-npy returns a
+    .npy tensor ("NPY").
+
+    Returns:
+        The PIL format name, "NPY", or None to return JSON
+    """
+    return_types = ("json", "image", "tensor") if allow_tensor else ("json", "image")
+    if return_type not in return_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Return must be one of {', '.join(repr(value) for value in return_types)}",
+        )
+    if return_type == "tensor":
+        return "NPY"
+
+    if output_format is not None:
+        image_format = output_format.upper()
+        if image_format not in IMAGE_MEDIA_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Format must be one of {', '.join(IMAGE_MEDIA_TYPES).lower()}",
+            )
+        return image_format
+
+    accepted = [
+        media_type.split(";")[0].strip().lower() for media_type in (accept or "").split(",")
+    ]
+    if allow_tensor and NPY_MEDIA_TYPE in accepted:
+        return "NPY"
+    for image_format, media_type in IMAGE_MEDIA_TYPES.items():
+        if media_type in accepted:
+            return image_format
+
+    return "JPEG" if return_type == "image" else None
+
+
+async def _iter_chunks(data: bytes) -> AsyncIterator[memoryview]:
+    """Yield zero-copy slices of encoded bytes."""
+    view = memoryview(data)
+    for start in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield view[start : start + STREAM_CHUNK_SIZE]
+
+
+def _stream_response(
+    encoded: bytes, output_format: str, original: Tuple[int, int, str], cache_status: str
+) -> StreamingResponse:
+    """Stream an encoded image or .npy tensor, with the original image info in headers."""
+    media_type = NPY_MEDIA_TYPE if output_format == "NPY" else IMAGE_MEDIA_TYPES[output_format]
+    return _stream_bytes(encoded, media_type, original, cache_status)
+
+
+def _stream_bytes(
+    encoded: bytes, media_type: str, original: Tuple[int, int, str], cache_status: str
+) -> StreamingResponse:
+    """Stream encoded bytes of a media type, with the original image info in headers."""
+    original_width, original_height, original_mode = original
+    return StreamingResponse(
+        _iter_chunks(encoded),
+        media_type=media_type,
+        headers={
+            "Content-Length": str(len(encoded)),
+            "X-Cache": cache_status,
+            "X-Original-Width": str(original_width),
+            "X-Original-Height": str(original_height),
+            "X-Original-Mode": original_mode,
+        },
+    )
+
+
+# The jobs below hold the CPU-bound PIL work for each endpoint. They run in the
+# worker pool from logic.executor, so they must stay module-level (picklable).
+
+
+def _open_image(contents: Union[UploadSource, Image.Image]) -> Image.Image:
+    """
+    Open an image from an upload and check its header against the size limits.
+
+    Only the header is read here; pixels are decoded later, on first use, straight
+    from the spooled or memory-mapped upload (see open_upload). Images already
+    decoded while streaming in (see stream_image_upload) were checked then, and
+    are returned as is.
+    """
+    if isinstance(contents, Image.Image):
+        return contents
+    with stage("open"):
+        if isinstance(contents, bytes):
+            contents = io.BytesIO(contents)
+        contents.seek(0)
+        image = Image.open(contents)
+        check_image_limits(probe_image(image), limits.MAX_IMAGE_PIXELS, limits.MAX_IMAGE_DIMENSION)
+    return image
+
+
+def _check_output_size(width: int, height: int, mode: str) -> None:
+    """Check a requested output size against the image limits before allocating it."""
+    check_image_limits(
+        ImageProbe(None, width, height, mode, 1),
+        limits.MAX_IMAGE_PIXELS,
+        limits.MAX_IMAGE_DIMENSION,
+    )
+
+
+def _count_decoded(image: Image.Image) -> None:
+    """Count the pixels of an image as decoded, if its pixel data has been loaded."""
+    if not getattr(image, "tile", None):
+        width, height = image.size
+        count("decoded_pixels", width * height)
+
+
+def _model_input(image: Image.Image, fit: str = DEFAULT_FIT) -> np.ndarray:
+    """Preprocess an image into a batch-of-one model input, timed as "preprocess"."""
+    with stage("preprocess"):
+        return images_to_batch([image], *MODEL_INPUT_SIZE, fit=fit)
+
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    """Encode an image, timed as the "encode" stage."""
+    with stage("encode"):
+        return encode_image(image, image_format, quality)
+
+
+def _predict_input_job(contents: Union[UploadSource, Image.Image]) -> np.ndarray:
+    """Decode an upload into a batch-of-one model input."""
+    image = _open_image(contents)
+    batch = _model_input(image)
+    _count_decoded(image)
+    return batch
+
+
+def _predict_batch_job(batches: List[np.ndarray]) -> List[str]:
+    """Predict the classes of a micro-batch of model inputs (see predict_batcher)."""
+    with stage("predict"):
+        return predict_array(np.concatenate(batches))
+
+
+def _synthetic_jpeg() -> bytes:
+    """Encode a small synthetic photo-like image for warming up."""
+    gradient = np.linspace(0, 255, 256, dtype=np.uint8)
+    pixels = np.stack(np.broadcast_arrays(gradient[None, :], gradient[:, None], 128), axis=-1)
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(pixels, dtype=np.uint8)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _warm_up_app() -> None:
+    """Load every PIL plugin and compile the home page template."""
+    with stage("plugins"):
+        Image.init()
+    with stage("template"):
+        templates.get_template("home.html")
+
+
+def _warm_up_jobs() -> None:
+    """Run a synthetic upload through the decode, resize, preprocess and predict jobs."""
+    contents = _synthetic_jpeg()
+    _predict_batch_job([_predict_input_job(contents)])
+    _resize_job(contents, 64, 64, DEFAULT_REDUCING_GAP, "JPEG")
+    _preprocess_job(contents, 64, 64, DEFAULT_REDUCING_GAP, "PNG")
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Warm up the app in the current process, without using the worker pools.
+
+    Returns:
+        dict mapping warm-up phase (stage) name to seconds
+    """
+    with recording() as recorder:
+        _warm_up_app()
+        _warm_up_jobs()
+    return recorder.totals()
+
+
+# Concurrent /predict and /classify_and_resize requests share prediction batches
+predict_batcher = batcher_from_env(_predict_batch_job, observer=observe_batch)
+
+
+async def _predict_job(contents: Union[UploadSource, Image.Image]) -> str:
+    """Decode an upload in the worker pool and predict its class in a shared batch."""
+    batch = await run_in_pool(_predict_input_job, contents)
+    return await predict_batcher.submit(batch)
+
+
+def _expand_upload(filename: str, contents: UploadSource) -> List[Tuple[str, UploadSource]]:
+    """
+    Expand a zip or tar archive upload into (name, bytes) items.
+
+    Uploads that are not archives are returned as a single item.
+    """
+    buffer = io.BytesIO(contents) if isinstance(contents, bytes) else contents
+    buffer.seek(0)
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            _check_archive_size(sum(info.file_size for info in members))
+            return [(f"{filename}/{info.filename}", archive.read(info)) for info in members]
+
+    buffer.seek(0)
+    try:
+        with tarfile.open(fileobj=buffer) as archive:
+            members = [member for member in archive.getmembers() if member.isfile()]
+            _check_archive_size(sum(member.size for member in members))
+            return [
+                (f"{filename}/{member.name}", archive.extractfile(member).read())
+                for member in members
+            ]
+    except tarfile.TarError:
+        return [(filename, contents)]
+
+
+def _check_archive_size(expanded: int) -> None:
+    """Reject archives that expand beyond the upload size limit."""
+    if limits.MAX_UPLOAD_BYTES is not None and expanded > limits.MAX_UPLOAD_BYTES:
+        raise ImageTooLargeError(
+            f"Archive expands to {expanded} bytes, over the limit of {limits.MAX_UPLOAD_BYTES}"
+        )
+
+
+def _batch_item_job(contents: UploadSource) -> Image.Image:
+    """Decode one batch item and preprocess it to the model input size."""
+    image = _open_image(contents)
+    with stage("preprocess"):
+        preprocessed = preprocess_image(image)
+    _count_decoded(image)
+    return preprocessed
+
+
+def _resize_job(
+    contents: UploadSource,
+    width: int,
+    height: int,
+    reducing_gap: float,
+    image_format: Optional[str] = None,
+    quality: int = DEFAULT_QUALITY,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> Tuple[Tuple[int, int, str], Optional[bytes]]:
+    """
+    Decode and resize an upload with a resize profile.
+
+    Returns its original (width, height, mode), and the resized image encoded in
+    image_format (or None if no format is given).
+    """
+    image = _open_image(contents)
+    original = normalize_image(image)
+    _check_output_size(width, height, image.mode)
+    with stage("resize"):
+        resized = resize_image(image, width, height, reducing_gap, profile)
+    _count_decoded(image)
+    if image_format is None:
+        return original, None
+    return original, _encode(resized, image_format, quality)
+
+
+def _thumbnails_job(
+    contents: UploadSource,
+    specs: Tuple[str, ...],
+    reducing_gap: float,
+    image_format: str,
+    quality: int = DEFAULT_QUALITY,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> Tuple[Tuple[int, int, str], List[Tuple[int, int, bytes]]]:
+    """
+    Decode an upload once and resize it to several sizes as a cascade.
+
+    Returns its original (width, height, mode), and a (width, height, encoded image)
+    entry per size spec (see parse_size), in the order of the specs.
+    """
+    image = _open_image(contents)
+    original = normalize_image(image)
+    sizes = [parse_size(spec, image.size) for spec in specs]
+    for width, height in sizes:
+        _check_output_size(width, height, image.mode)
+    with stage("resize"):
+        resized = resize_cascade(image, sizes, reducing_gap, profile)
+    _count_decoded(image)
+    return original, [
+        (width, height, _encode(thumbnail, image_format, quality))
+        for (width, height), thumbnail in zip(sizes, resized)
+    ]
+
+
+def _pack_thumbnails(
+    images: List[Tuple[int, int, bytes]], stem: str, image_format: str, archive: str
+) -> Tuple[bytes, str]:
+    """
+    Pack encoded thumbnails into a zip archive or a multipart/mixed body.
+
+    Each one is named "<stem>_<width>x<height>.<extension>". Zip members are
+    stored uncompressed, since the images are compressed already.
+
+    Returns:
+        The body and its media type
+    """
+    stem = "".join(char if char.isprintable() and char != '"' else "_" for char in stem)
+    names = [
+        f"{stem}_{width}x{height}.{IMAGE_EXTENSIONS[image_format]}" for width, height, _ in images
+    ]
+    if archive == "zip":
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as packed:
+            for name, (_, _, encoded) in zip(names, images):
+                packed.writestr(name, encoded)
+        return buffer.getvalue(), THUMBNAIL_MEDIA_TYPES["zip"]
+
+    boundary = secrets.token_hex(16)
+    parts = []
+    for name, (width, height, encoded) in zip(names, images):
+        headers = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {IMAGE_MEDIA_TYPES[image_format]}\r\n"
+            f'Content-Disposition: attachment; filename="{name}"\r\n'
+            f"Content-Length: {len(encoded)}\r\n"
+            f"X-Width: {width}\r\n"
+            f"X-Height: {height}\r\n\r\n"
+        )
+        parts += [headers.encode("utf-8"), encoded, b"\r\n"]
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"{THUMBNAIL_MEDIA_TYPES['multipart']}; boundary={boundary}"
+
+
+def _preprocess_job(
+    contents: UploadSource,
+    width: int,
+    height: int,
+    reducing_gap: float,
+    image_format: Optional[str] = None,
+    quality: int = DEFAULT_QUALITY,
+    tensor_dtype: str = "float32",
+    profile: str = DEFAULT_RESIZE_PROFILE,
+    fit: str = DEFAULT_FIT,
+) -> Tuple[Tuple[int, int, str], Optional[bytes]]:
+    """
+    Decode and preprocess an upload with a resize profile and fit mode.
+
+    Returns its original (width, height, mode), and the preprocessed image encoded
+    in image_format (or None if no format is given). For image_format "NPY", the
+    image is returned as a batch-of-one .npy tensor of the given dtype.
+    """
+    image = _open_image(contents)
+    original = normalize_image(image)
+    _check_output_size(width, height, "RGB")
+    with stage("preprocess"):
+        if image_format == "NPY":
+            preprocessed = images_to_tensor(
+                [image],
+                width,
+                height,
+                tensor_dtype,
+                reducing_gap=reducing_gap,
+                profile=profile,
+                fit=fit,
+            )
+        else:
+            preprocessed = preprocess_image(image, width, height, reducing_gap, profile, fit)
+    _count_decoded(image)
+    if image_format == "NPY":
+        with stage("encode"):
+            return original, tensor_to_npy(preprocessed)
+    if image_format is None:
+        return original, None
+    return original, _encode(preprocessed, image_format, quality)
+
+
+def _pipeline_job(
+    contents: UploadSource,
+    spec: str,
+    image_format: Optional[str] = None,
+    quality: int = DEFAULT_QUALITY,
+) -> Tuple[Tuple[int, int, str], Tuple[int, int, str], List[str], Optional[bytes]]:
+    """
+    Decode an upload and run a pipeline spec (see logic.pipeline) on it.
+
+    Returns its original (width, height, mode), the output (width, height, mode),
+    the plan steps, and the output image encoded in image_format (or None if no
+    format is given).
+    """
+    image = _open_image(contents)
+    original = normalize_image(image)
+    plan = compile_pipeline(spec, image.size, image.mode)
+    _check_output_size(*plan.size, plan.mode)
+    with stage("pipeline"):
+        processed = plan.run(image)
+    _count_decoded(image)
+    output = normalize_image(processed)
+    if image_format is None:
+        return original, output, plan.describe(), None
+    return original, output, plan.describe(), _encode(processed, image_format, quality)
+
+
+def _classify_and_resize_input_job(
+    contents: UploadSource,
+    width: int,
+    height: int,
+    reducing_gap: float,
+    fit: str = DEFAULT_FIT,
+) -> Tuple[np.ndarray, Tuple[int, int, str]]:
+    """Decode and resize an upload with a fit mode, and build its batch-of-one model input."""
+    image = _open_image(contents)
+    original = normalize_image(image)
+    _check_output_size(width, height, image.mode)
+    # One reduced-size decode, large enough for both the resize and the model input
+    resize_size = fit_scaled_size(image.size, width, height, fit)
+    model_size = fit_scaled_size(image.size, *MODEL_INPUT_SIZE, fit)
+    draft_image(
+        image,
+        max(resize_size[0], model_size[0]),
+        max(resize_size[1], model_size[1]),
+        reducing_gap,
+    )
+    with stage("resize"):
+        fit_image(image, width, height, fit, reducing_gap)
+    batch = _model_input(image, fit)
+    _count_decoded(image)
+    return batch, original
+
+
+async def _classify_and_resize_job(
+    contents: UploadSource,
+    width: int,
+    height: int,
+    reducing_gap: float,
+    fit: str = DEFAULT_FIT,
+) -> Tuple[str, Tuple[int, int, str]]:
+    """Decode and resize an upload in the worker pool, and predict its class in a batch."""
+    batch, original = await run_in_pool(
+        _classify_and_resize_input_job, contents, width, height, reducing_gap, fit
+    )
+    return await predict_batcher.submit(batch), original
+
+
+def _predict_content(predicted_class: Any, filename: Optional[str]) -> Dict[str, Any]:
+    """Build the JSON body of a /predict response."""
+    return {"success": True, "predicted_class": predicted_class, "filename": filename}
+
+
+async def _predict_response(
+    receive: Awaitable[StreamedUpload],
+    cache_control: Optional[str],
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """Receive an upload, and predict its class through the result cache."""
+    try:
+        # Receive and decode the image as it streams in
+        upload = await receive
+        etag = _etag("predict", upload.digest)
+        if _not_modified(if_none_match, etag):
+            return _not_modified_response(etag)
+
+        # Predict the class in the worker pool
+        predicted_class, cache_status = await _run_cached(
+            "predict", cache_control, _predict_job, upload.source, digest=upload.digest
+        )
+
+        return _json_response(
+            content=_predict_content(predicted_class, upload.filename),
+            headers={"X-Cache": cache_status, "ETag": etag},
+        )
+    except (HTTPException, RequestValidationError):
+        raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+
+
+@app.post("/predict", openapi_extra=upload_openapi("file"))
+async def predict(
+    request: Request,
+    cache_control: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Predict the class of an uploaded image.
 
+    The upload (form field "file") is decoded while it streams in, and rejected as
+    soon as its header shows that it exceeds the size limits.
+
     Args:
-        file: Image file to classify
+        request: Request with the multipart image upload
+        cache_control: Send "no-cache" to bypass the result cache
+        if_none_match: ETag of a result the client already has, answered with 304
 
     Returns:
-        JSON with predicted class
+        JSON with predicted class, and the ETag of the result
+    """
+    return await _predict_response(
+        stream_image_upload(request, "file", MODEL_INPUT_SIZE), cache_control, if_none_match
+    )
+
+
+@app.post("/predict/raw", openapi_extra=raw_upload_openapi())
+async def predict_raw(
+    request: Request,
+    filename: Optional[str] = Query(None),
+    cache_control: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Return the predicted class of an image sent as the raw body, like /predict."""
+    return await _predict_response(
+        stream_image_body(request, MODEL_INPUT_SIZE, filename=filename),
+        cache_control,
+        if_none_match,
+    )
+
+
+@app.get("/predict/by-hash/{sha256}")
+async def predict_by_hash(
+    sha256: str,
+    if_none_match: Optional[str] = Header(None),
+):
     """
+    Get the cached /predict result of an image by its content hash, without uploading it.
+
+    Clients can try the hash first and upload the image only on a 404. Results
+    leave the cache when they are evicted or expire, so a 404 is always possible.
+
+    Args:
+        sha256: Hex SHA-256 digest of the image file
+        if_none_match: ETag of a result the client already has, answered with 304
+
+    Returns:
+        JSON with predicted class, as /predict returns it, or 404 if not cached
+    """
+    digest = _check_digest(sha256)
+    etag = _etag("predict", digest)
+    if _not_modified(if_none_match, etag):
+        return _not_modified_response(etag)
+    predicted_class = _cached_result("predict", digest)
+    return _json_response(
+        content=_predict_content(predicted_class, None),
+        headers={"X-Cache": "HIT", "ETag": etag},
+    )
+
+
+@app.post("/predict_batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    Predict the class of several uploaded images in one request.
+
+    Zip and tar archives are expanded into their member files. Images are decoded
+    concurrently and classified together as one batch.
+
+    Args:
+        files: Image files (or archives of image files) to classify
+
+    Returns:
+        JSON with one result per image, in input order. Images that fail to
+        decode get an error entry instead of failing the whole batch.
+    """
+    # The uploads stay open until every item has been decoded from them
+    async with AsyncExitStack() as uploads:
+        try:
+            # Open the uploads and expand archives in the worker pool
+            items = []
+            for file in files:
+                contents = await uploads.enter_async_context(open_upload(file))
+                items.extend(await run_in_pool(_expand_upload, file.filename, contents))
+        except ImageTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error reading upload: {str(e)}")
+
+        if len(items) > MAX_BATCH_ITEMS:
+            raise HTTPException(
+                status_code=400, detail=f"Batch must contain at most {MAX_BATCH_ITEMS} images"
+            )
+
+        # Decode all items concurrently; failures are reported per item
+        decoded = await asyncio.gather(
+            *(run_in_pool(_batch_item_job, contents) for _, contents in items),
+            return_exceptions=True,
+        )
+    images = [image for image in decoded if not isinstance(image, BaseException)]
+
+    try:
+        predictions = iter(await run_in_pool(predict_images, images))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing batch: {str(e)}")
+
+    results = []
+    for (filename, _), image in zip(items, decoded):
+        if isinstance(image, BaseException):
+            results.append(
+                {
+                    "success": False,
+                    "filename": filename,
+                    "error": f"Error processing image: {str(image)}",
+                }
+            )
+        else:
+            results.append(
+                {"success": True, "filename": filename, "predicted_class": next(predictions)}
+            )
+
+    return _json_response({"success": True, "count": len(results), "results": results})
+
+
+async def _resize_response(
+    opener: AsyncContextManager[UploadSource],
+    filename: Optional[str],
+    width: int,
+    height: int,
+    reducing_gap: float,
+    profile: str,
+    return_type: str,
+    output_format: Optional[str],
+    quality: int,
+    accept: Optional[str],
+    cache_control: Optional[str],
+) -> Any:
+    """Resize an upload opened by opener, and respond as /resize does."""
     try:
-        # Read and validate the image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        _check_dimensions(width, height)
+        _check_profile(profile)
+        image_format = _negotiate_output(return_type, output_format, accept)
 
-        # Predict the class
-        predicted_class = predict_class(image)
+        # Resize (and encode) the image in the worker pool, straight from the upload
+        async with opener as contents:
+            (original, encoded), cache_status = await _run_cached(
+                "resize",
+                cache_control,
+                _resize_job,
+                contents,
+                width,
+                height,
+                reducing_gap,
+                image_format,
+                quality,
+                profile,
+            )
+        if encoded is not None:
+            return _stream_response(encoded, image_format, original, cache_status)
+        original_width, original_height, mode = original
 
-        return JSONResponse(
+        return _json_response(
             content={
                 "success": True,
-                "predicted_class": predicted_class,
-                "filename": file.filename,
-            }
+                "filename": filename,
+                "original_size": {"width": original_width, "height": original_height},
+                "new_size": {"width": width, "height": height},
+                "mode": mode,
+            },
+            headers={"X-Cache": cache_status},
         )
+    except HTTPException:
+        raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
@@ -76,6 +1036,13 @@ async def resize(
     file: UploadFile = File(...),
     width: int = Form(...),
     height: int = Form(...),
+    reducing_gap: float = Form(DEFAULT_REDUCING_GAP),
+    profile: str = Form(DEFAULT_RESIZE_PROFILE),
+    return_type: str = Query("json", alias="return"),
+    output_format: Optional[str] = Query(None, alias="format"),
+    quality: int = Query(DEFAULT_QUALITY),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None),
 ):
     """
     Resize an uploaded image.
@@ -84,38 +1051,200 @@ async def resize(
         file: Image file to resize
         width: Target width in pixels
         height: Target height in pixels
+        reducing_gap: Two-step downscaling quality knob (0 disables)
+        profile: Resize speed/quality profile: fast, balanced or quality (default)
+        return_type: "json" (default) or "image" to stream the resized image back
+        output_format: Image format to return: jpeg, png or webp (implies an image)
+        quality: Lossy encoding quality from 1 to 100 (default: 85)
+        accept: An image media type here (e.g. image/webp) also returns an image
+        cache_control: Send "no-cache" to bypass the result cache
+
+    Returns:
+        JSON with resized image information, or the resized image itself
+    """
+    return await _resize_response(
+        open_upload(file),
+        file.filename,
+        width,
+        height,
+        reducing_gap,
+        profile,
+        return_type,
+        output_format,
+        quality,
+        accept,
+        cache_control,
+    )
+
+
+@app.post("/resize/raw", openapi_extra=raw_upload_openapi())
+async def resize_raw(
+    request: Request,
+    width: int = Query(...),
+    height: int = Query(...),
+    reducing_gap: float = Query(DEFAULT_REDUCING_GAP),
+    profile: str = Query(DEFAULT_RESIZE_PROFILE),
+    return_type: str = Query("json", alias="return"),
+    output_format: Optional[str] = Query(None, alias="format"),
+    quality: int = Query(DEFAULT_QUALITY),
+    filename: Optional[str] = Query(None),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None),
+):
+    """Return an image sent as the raw body resized, like /resize."""
+    return await _resize_response(
+        raw_upload(request),
+        filename,
+        width,
+        height,
+        reducing_gap,
+        profile,
+        return_type,
+        output_format,
+        quality,
+        accept,
+        cache_control,
+    )
+
+
+@app.post("/thumbnails")
+async def thumbnails(
+    file: UploadFile = File(...),
+    sizes: str = Form(...),
+    reducing_gap: float = Form(DEFAULT_REDUCING_GAP),
+    profile: str = Form(DEFAULT_RESIZE_PROFILE),
+    return_type: Optional[str] = Query(None, alias="return"),
+    output_format: str = Query("jpeg", alias="format"),
+    quality: int = Query(DEFAULT_QUALITY),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None),
+):
+    """
+    Resize an uploaded image to several sizes from one decode.
+
+    Each size is resampled from the next larger one, so the upload is decoded and
+    read at full resolution once per request instead of once per size.
+
+    Args:
+        file: Image file to resize
+        sizes: Comma-separated sizes: "WIDTHxHEIGHT", or "N" to scale the longer
+            side to N pixels (e.g. "512,256,128,64")
+        reducing_gap: Two-step downscaling quality knob (0 disables)
+        profile: Resize speed/quality profile: fast, balanced or quality (default)
+        return_type: "zip" (default) for a zip archive, or "multipart" for a
+            multipart/mixed body with one part per size
+        output_format: Image format of the thumbnails: jpeg (default), png or webp
+        quality: Lossy encoding quality from 1 to 100 (default: 85)
+        accept: multipart/mixed here also returns a multipart body
+        cache_control: Send "no-cache" to bypass the result cache
 
     Returns:
-        JSON with resized image information
+        The thumbnails, named "<filename stem>_<width>x<height>.<extension>"
     """
     try:
-        # Validate dimensions
-        if width <= 0 or height <= 0:
+        specs = tuple(spec.strip() for spec in sizes.split(",") if spec.strip())
+        if not 1 <= len(specs) <= MAX_THUMBNAIL_SIZES:
             raise HTTPException(
-                status_code=400, detail="Width and height must be positive integers"
+                status_code=400, detail=f"Sizes must list 1 to {MAX_THUMBNAIL_SIZES} sizes"
             )
+        for spec in specs:
+            try:
+                parse_size(spec, (1, 1))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        _check_profile(profile)
+        image_format = _negotiate_output("image", output_format, None)
+        if return_type is None:
+            accepted = (accept or "").lower()
+            return_type = "multipart" if THUMBNAIL_MEDIA_TYPES["multipart"] in accepted else "zip"
+        if return_type not in THUMBNAIL_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="Return must be one of 'zip', 'multipart'")
 
-        # Read and validate the image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        # Resize to every size and encode in the worker pool, straight from the upload
+        async with open_upload(file) as contents:
+            (original, results), cache_status = await _run_cached(
+                "thumbnails",
+                cache_control,
+                _thumbnails_job,
+                contents,
+                specs,
+                reducing_gap,
+                image_format,
+                quality,
+                profile,
+            )
+        with stage("serialize"):
+            body, media_type = _pack_thumbnails(
+                results, Path(file.filename or "image").stem, image_format, return_type
+            )
+        return _stream_bytes(body, media_type, original, cache_status)
+    except HTTPException:
+        raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
-        # Get original size
-        original_width, original_height, mode = normalize_image(image)
 
-        # Resize the image
-        resized = resize_image(image, width, height)
+async def _preprocess_response(
+    opener: AsyncContextManager[UploadSource],
+    filename: Optional[str],
+    width: int,
+    height: int,
+    reducing_gap: float,
+    profile: str,
+    fit: str,
+    return_type: str,
+    output_format: Optional[str],
+    quality: int,
+    dtype: str,
+    accept: Optional[str],
+    cache_control: Optional[str],
+) -> Any:
+    """Preprocess an upload opened by opener, and respond as /preprocess does."""
+    try:
+        _check_dimensions(width, height)
+        _check_profile(profile)
+        _check_fit(fit)
+        image_format = _negotiate_output(return_type, output_format, accept, allow_tensor=True)
 
-        return JSONResponse(
+        # Preprocess (and encode) the image in the worker pool, straight from the upload
+        async with opener as contents:
+            (original, encoded), cache_status = await _run_cached(
+                "preprocess",
+                cache_control,
+                _preprocess_job,
+                contents,
+                width,
+                height,
+                reducing_gap,
+                image_format,
+                quality,
+                dtype,
+                profile,
+                fit,
+            )
+        if encoded is not None:
+            return _stream_response(encoded, image_format, original, cache_status)
+        original_width, original_height, original_mode = original
+
+        return _json_response(
             content={
                 "success": True,
-                "filename": file.filename,
-                "original_size": {"width": original_width, "height": original_height},
-                "new_size": {"width": width, "height": height},
-                "mode": mode,
-            }
+                "filename": filename,
+                "original_size": {
+                    "width": original_width,
+                    "height": original_height,
+                    "mode": original_mode,
+                },
+                "new_size": {"width": width, "height": height, "mode": "RGB"},
+            },
+            headers={"X-Cache": cache_status},
         )
     except HTTPException:
         raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
@@ -125,6 +1254,15 @@ async def preprocess(
     file: UploadFile = File(...),
     width: int = Form(224),
     height: int = Form(224),
+    reducing_gap: float = Form(DEFAULT_REDUCING_GAP),
+    profile: str = Form(DEFAULT_RESIZE_PROFILE),
+    fit: str = Form(DEFAULT_FIT),
+    return_type: str = Query("json", alias="return"),
+    output_format: Optional[str] = Query(None, alias="format"),
+    quality: int = Query(DEFAULT_QUALITY),
+    dtype: str = Query("float32"),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None),
 ):
     """
     Preprocess an uploaded image (convert to RGB and resize).
@@ -133,28 +1271,124 @@ async def preprocess(
         file: Image file to preprocess
         width: Target width in pixels (default: 224)
         height: Target height in pixels (default: 224)
+        reducing_gap: Two-step downscaling quality knob (0 disables)
+        profile: Resize speed/quality profile: fast, balanced or quality (default)
+        fit: How to fit the aspect ratio: stretch (default), cover (center crop) or
+            contain (letterbox onto black padding)
+        return_type: "json" (default), "image" to stream the preprocessed image back,
+            or "tensor" to stream it back as a .npy model input tensor
+        output_format: Image format to return: jpeg, png or webp (implies an image)
+        quality: Lossy encoding quality from 1 to 100 (default: 85)
+        dtype: Tensor dtype: "float32" (normalized NCHW, default) or "uint8" (NHWC)
+        accept: An image media type (e.g. image/webp) or application/x-npy here also
+            returns an image or tensor
+        cache_control: Send "no-cache" to bypass the result cache
 
     Returns:
-        JSON with preprocessed image information
+        JSON with preprocessed image information, or the preprocessed image/tensor
     """
-    try:
-        # Validate dimensions
-        if width <= 0 or height <= 0:
-            raise HTTPException(
-                status_code=400, detail="Width and height must be positive integers"
-            )
+    return await _preprocess_response(
+        open_upload(file),
+        file.filename,
+        width,
+        height,
+        reducing_gap,
+        profile,
+        fit,
+        return_type,
+        output_format,
+        quality,
+        dtype,
+        accept,
+        cache_control,
+    )
+
+
+@app.post("/preprocess/raw", openapi_extra=raw_upload_openapi())
+async def preprocess_raw(
+    request: Request,
+    width: int = Query(224),
+    height: int = Query(224),
+    reducing_gap: float = Query(DEFAULT_REDUCING_GAP),
+    profile: str = Query(DEFAULT_RESIZE_PROFILE),
+    fit: str = Query(DEFAULT_FIT),
+    return_type: str = Query("json", alias="return"),
+    output_format: Optional[str] = Query(None, alias="format"),
+    quality: int = Query(DEFAULT_QUALITY),
+    dtype: str = Query("float32"),
+    filename: Optional[str] = Query(None),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None),
+):
+    """Return an image sent as the raw body preprocessed, like /preprocess."""
+    return await _preprocess_response(
+        raw_upload(request),
+        filename,
+        width,
+        height,
+        reducing_gap,
+        profile,
+        fit,
+        return_type,
+        output_format,
+        quality,
+        dtype,
+        accept,
+        cache_control,
+    )
 
-        # Read and validate the image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
 
-        # Get original info
-        original_width, original_height, original_mode = normalize_image(image)
+@app.post("/pipeline")
+async def pipeline(
+    file: UploadFile = File(...),
+    spec: str = Form(...),
+    return_type: str = Query("json", alias="return"),
+    output_format: Optional[str] = Query(None, alias="format"),
+    quality: int = Query(DEFAULT_QUALITY),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None),
+):
+    """
+    Run a declarative preprocessing pipeline on an uploaded image.
+
+    Args:
+        file: Image file to process
+        spec: JSON list of ops, e.g. [{"op": "rgb"}, {"op": "resize_shorter", "size": 256},
+            {"op": "center_crop", "size": 224}] (see logic.pipeline)
+        return_type: "json" (default) or "image" to stream the processed image back
+        output_format: Image format to return: jpeg, png or webp (implies an image)
+        quality: Lossy encoding quality from 1 to 100 (default: 85)
+        accept: An image media type here (e.g. image/webp) also returns an image
+        cache_control: Send "no-cache" to bypass the result cache
 
-        # Preprocess the image
-        preprocessed = preprocess_image(image, width, height)
+    Returns:
+        JSON with the original and output image information and the compiled plan,
+        or the processed image itself
+    """
+    try:
+        try:
+            ops = parse_pipeline(spec)
+        except PipelineError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        image_format = _negotiate_output(return_type, output_format, accept)
 
-        return JSONResponse(
+        # Compile and run the pipeline in the worker pool, straight from the upload
+        async with open_upload(file) as contents:
+            (original, output, plan, encoded), cache_status = await _run_cached(
+                "pipeline",
+                cache_control,
+                _pipeline_job,
+                contents,
+                json.dumps(ops, sort_keys=True),
+                image_format,
+                quality,
+            )
+        if encoded is not None:
+            return _stream_response(encoded, image_format, original, cache_status)
+        original_width, original_height, original_mode = original
+        width, height, mode = output
+
+        return _json_response(
             content={
                 "success": True,
                 "filename": file.filename,
@@ -163,11 +1397,75 @@ async def preprocess(
                     "height": original_height,
                     "mode": original_mode,
                 },
-                "new_size": {"width": width, "height": height, "mode": "RGB"},
-            }
+                "new_size": {"width": width, "height": height, "mode": mode},
+                "plan": plan,
+            },
+            headers={"X-Cache": cache_status},
+        )
+    except HTTPException:
+        raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+
+
+def _classify_and_resize_content(
+    result: Any, filename: Optional[str], width: int, height: int
+) -> Dict[str, Any]:
+    """Build the JSON body of a /classify_and_resize response from its job result."""
+    predicted_class, (original_width, original_height, mode) = result
+    return {
+        "success": True,
+        "predicted_class": predicted_class,
+        "filename": filename,
+        "original_size": {"width": original_width, "height": original_height},
+        "new_size": {"width": width, "height": height},
+        "mode": mode,
+    }
+
+
+async def _classify_and_resize_response(
+    opener: AsyncContextManager[UploadSource],
+    filename: Optional[str],
+    width: int,
+    height: int,
+    reducing_gap: float,
+    fit: str,
+    cache_control: Optional[str],
+    if_none_match: Optional[str] = None,
+) -> Any:
+    """Classify and resize an upload opened by opener, and respond as /classify_and_resize does."""
+    try:
+        _check_dimensions(width, height)
+        _check_fit(fit)
+
+        # Predict class and resize in the worker pool, straight from the upload
+        async with opener as contents:
+            digest = await run_in_pool(upload_digest, contents)
+            etag = _etag("classify_and_resize", digest, width, height, reducing_gap, fit)
+            if _not_modified(if_none_match, etag):
+                return _not_modified_response(etag)
+            result, cache_status = await _run_cached(
+                "classify_and_resize",
+                cache_control,
+                _classify_and_resize_job,
+                contents,
+                width,
+                height,
+                reducing_gap,
+                fit,
+                digest=digest,
+            )
+
+        return _json_response(
+            content=_classify_and_resize_content(result, filename, width, height),
+            headers={"X-Cache": cache_status, "ETag": etag},
         )
     except HTTPException:
         raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
@@ -177,6 +1475,10 @@ async def classify_and_resize(
     file: UploadFile = File(...),
     width: int = Form(...),
     height: int = Form(...),
+    reducing_gap: float = Form(DEFAULT_REDUCING_GAP),
+    fit: str = Form(DEFAULT_FIT),
+    cache_control: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Classify and resize an image in one request.
@@ -185,47 +1487,114 @@ async def classify_and_resize(
         file: Image file to process
         width: Target width in pixels
         height: Target height in pixels
+        reducing_gap: Two-step downscaling quality knob (0 disables)
+        fit: How to fit the aspect ratio of the resize and the model input: stretch
+            (default), cover (center crop) or contain (letterbox)
+        cache_control: Send "no-cache" to bypass the result cache
+        if_none_match: ETag of a result the client already has, answered with 304
 
     Returns:
-        JSON with predicted class and resized image information
+        JSON with predicted class and resized image information, and the ETag of the result
     """
-    try:
-        # Validate dimensions
-        if width <= 0 or height <= 0:
-            raise HTTPException(
-                status_code=400, detail="Width and height must be positive integers"
-            )
+    return await _classify_and_resize_response(
+        open_upload(file),
+        file.filename,
+        width,
+        height,
+        reducing_gap,
+        fit,
+        cache_control,
+        if_none_match,
+    )
+
+
+@app.post("/classify_and_resize/raw", openapi_extra=raw_upload_openapi())
+async def classify_and_resize_raw(
+    request: Request,
+    width: int = Query(...),
+    height: int = Query(...),
+    reducing_gap: float = Query(DEFAULT_REDUCING_GAP),
+    fit: str = Query(DEFAULT_FIT),
+    filename: Optional[str] = Query(None),
+    cache_control: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Return the class and a resized copy of a raw-body image, like /classify_and_resize."""
+    return await _classify_and_resize_response(
+        raw_upload(request),
+        filename,
+        width,
+        height,
+        reducing_gap,
+        fit,
+        cache_control,
+        if_none_match,
+    )
 
-        # Read and validate the image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
 
-        # Predict class
-        predicted_class = predict_class(image)
+@app.get("/classify_and_resize/by-hash/{sha256}")
+async def classify_and_resize_by_hash(
+    sha256: str,
+    width: int = Query(...),
+    height: int = Query(...),
+    reducing_gap: float = Query(DEFAULT_REDUCING_GAP),
+    fit: str = Query(DEFAULT_FIT),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get a cached /classify_and_resize result by content hash, without uploading the image.
 
-        # Get original info
-        original_width, original_height, mode = normalize_image(image)
+    Takes the parameters of /classify_and_resize in the query string. Only a
+    result computed with the same parameters is returned.
 
-        # Resize the image
-        resized = resize_image(image, width, height)
+    Args:
+        sha256: Hex SHA-256 digest of the image file
+        width: Target width in pixels
+        height: Target height in pixels
+        reducing_gap: Two-step downscaling quality knob (0 disables)
+        fit: Fit mode: stretch (default), cover or contain
+        if_none_match: ETag of a result the client already has, answered with 304
 
-        return JSONResponse(
-            content={
-                "success": True,
-                "predicted_class": predicted_class,
-                "filename": file.filename,
-                "original_size": {"width": original_width, "height": original_height},
-                "new_size": {"width": width, "height": height},
-                "mode": mode,
-            }
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+    Returns:
+        JSON as /classify_and_resize returns it, or 404 if not cached
+    """
+    digest = _check_digest(sha256)
+    _check_dimensions(width, height)
+    _check_fit(fit)
+    params = (width, height, reducing_gap, fit)
+    etag = _etag("classify_and_resize", digest, *params)
+    if _not_modified(if_none_match, etag):
+        return _not_modified_response(etag)
+    result = _cached_result("classify_and_resize", digest, *params)
+    return _json_response(
+        content=_classify_and_resize_content(result, None, width, height),
+        headers={"X-Cache": "HIT", "ETag": etag},
+    )
 
 
 if __name__ == "__main__":
-    import uvicorn
+    parser = argparse.ArgumentParser(description="Run the image classification API")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8000, help="Bind port (default: 8000)")
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTOR_KINDS,
+        default=None,
+        help="Worker pool kind for image work (default: $IMAGE_EXECUTOR_KIND or thread)",
+    )
+    parser.add_argument(
+        "--executor-workers",
+        type=int,
+        default=None,
+        help="Worker pool size (default: $IMAGE_EXECUTOR_WORKERS or based on CPU count)",
+    )
+    args = parser.parse_args()
+
+    # The worker pool reads its configuration from the environment on first use
+    if args.executor:
+        os.environ["IMAGE_EXECUTOR_KIND"] = args.executor
+    if args.executor_workers:
+        os.environ["IMAGE_EXECUTOR_WORKERS"] = str(args.executor_workers)
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,72 @@
+"""Admission control for uploads: body size, pixel and dimension limits."""
+
+import os
+from typing import Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+def _env_limit(name: str, default: int) -> Optional[int]:
+    """Read a limit from the environment; 0 disables it."""
+    value = int(os.environ.get(name, default))
+    return value if value > 0 else None
+
+
+# Maximum request body size in bytes (MAX_UPLOAD_BYTES, 0 disables)
+MAX_UPLOAD_BYTES = _env_limit("MAX_UPLOAD_BYTES", 50 * 1024 * 1024)
+
+# Maximum decoded image size in pixels (MAX_IMAGE_PIXELS, 0 disables)
+MAX_IMAGE_PIXELS = _env_limit("MAX_IMAGE_PIXELS", 64 * 1024 * 1024)
+
+# Maximum image width or height (MAX_IMAGE_DIMENSION, 0 disables)
+MAX_IMAGE_DIMENSION = _env_limit("MAX_IMAGE_DIMENSION", 16384)
+
+
+def _too_large(max_bytes: int) -> str:
+    """Error message for an oversized request body."""
+    return f"Request body exceeds the limit of {max_bytes} bytes"
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that caps the request body size.
+
+    Requests that declare a larger Content-Length are rejected with 413 before the
+    body is read. Bodies without a declared length are counted as they stream in.
+    Reading stops with 413 as soon as the limit is crossed, so oversized uploads are
+    never spooled in full. Without an explicit max_bytes, MAX_UPLOAD_BYTES is used.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.max_bytes if self.max_bytes is not None else MAX_UPLOAD_BYTES
+        if scope["type"] != "http" or max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > max_bytes:
+                    response = JSONResponse({"detail": _too_large(max_bytes)}, status_code=413)
+                    await response(scope, receive, send)
+                    return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=_too_large(max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
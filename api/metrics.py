@@ -0,0 +1,311 @@
+"""Prometheus-style metrics and Server-Timing for the API.
+
+The metric types are small, lock-protected and dependency-free, and they render
+the Prometheus text exposition format. MetricsMiddleware tracks request
+counts, in-flight requests, bytes in/out and per-stage latency histograms for
+every request. It also adds a Server-Timing header to the response with the same
+per-stage timings.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+from logic.timing import StageRecorder, recording
+
+# Histogram buckets in seconds, from sub-millisecond stages to slow requests
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    """Format a label set as {name="value",...}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class for labelled metrics."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        """Get the HELP and TYPE lines."""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, value: float = 1.0) -> None:
+        """Increase the counter for a label set."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def get(self, *labels: str) -> float:
+        """Get the current value for a label set."""
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        """Render the metric in text exposition format."""
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, labels)} {value:g}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, value: float = 1.0) -> None:
+        """Decrease the gauge for a label set."""
+        self.inc(*labels, value=-value)
+
+    def set(self, *labels: str, value: float) -> None:
+        """Set the gauge for a label set."""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: (per-bucket counts incl. +Inf, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        """Record one observation for a label set."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *labels: str) -> int:
+        """Get the number of observations for a label set."""
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        """Render the metric in text exposition format."""
+        with self._lock:
+            items = sorted((labels, (list(b), s, c)) for labels, (b, s, c) in self._values.items())
+        lines = self.header()
+        for labels, (bucket_counts, total, observations) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                label_text = _format_labels(self.labels, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {total:g}")
+            lines.append(f"{self.name}_count{label_text} {observations}")
+        return lines
+
+
+REQUESTS = Counter(
+    "image_api_requests_total", "HTTP requests handled.", ("endpoint", "method", "status")
+)
+IN_FLIGHT = Gauge("image_api_requests_in_flight", "HTTP requests being handled.", ("endpoint",))
+REQUEST_DURATION = Histogram(
+    "image_api_request_duration_seconds", "Total HTTP request latency.", ("endpoint",)
+)
+STAGE_DURATION = Histogram(
+    "image_api_stage_duration_seconds",
+    "Latency of request processing stages (read, queue, open, decode, predict, ...).",
+    ("endpoint", "stage"),
+)
+BYTES_IN = Counter("image_api_request_bytes_total", "Request body bytes received.", ("endpoint",))
+BYTES_OUT = Counter("image_api_response_bytes_total", "Response body bytes sent.", ("endpoint",))
+DECODED_PIXELS = Counter(
+    "image_api_decoded_pixels_total", "Image pixels decoded from uploads.", ("endpoint",)
+)
+
+BATCH_SIZE = Histogram(
+    "image_api_predict_batch_size",
+    "Number of requests coalesced into each prediction batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+BATCH_QUEUE_DELAY = Histogram(
+    "image_api_predict_batch_queue_seconds",
+    "Time requests waited for their prediction batch to start.",
+)
+
+METRICS = [
+    REQUESTS,
+    IN_FLIGHT,
+    REQUEST_DURATION,
+    STAGE_DURATION,
+    BYTES_IN,
+    BYTES_OUT,
+    DECODED_PIXELS,
+    BATCH_SIZE,
+    BATCH_QUEUE_DELAY,
+]
+
+
+def render_metrics(extra: Optional[List[_Metric]] = None) -> str:
+    """
+    Render all registered metrics in Prometheus text exposition format.
+
+    Args:
+        extra: Additional metrics to render after the registered ones
+
+    Returns:
+        str: Exposition text
+    """
+    lines = []
+    for metric in METRICS + (extra or []):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def observe_batch(size: int, delays: List[float]) -> None:
+    """
+    Record one prediction batch (a logic.batching observer).
+
+    Args:
+        size: Number of items in the batch
+        delays: Queueing delay of each item in seconds
+    """
+    BATCH_SIZE.observe(value=size)
+    for delay in delays:
+        BATCH_QUEUE_DELAY.observe(value=delay)
+
+
+def server_timing(recorder: StageRecorder, total: Optional[float] = None) -> str:
+    """
+    Format recorded stages as a Server-Timing header value (durations in ms).
+
+    Args:
+        recorder: Recorder holding the request's stages
+        total: Optional total request time in seconds
+
+    Returns:
+        str: Header value, e.g. "read;dur=0.12, decode;dur=3.40"
+    """
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in recorder.totals().items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records request metrics and adds a Server-Timing header.
+
+    Requests are labelled with their route path template (e.g. "/predict"), or
+    "other" for unknown paths, so that the number of label sets stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _endpoint(self, scope) -> str:
+        """Find the route path template matching a request."""
+        router = scope.get("app")
+        for route in getattr(router, "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "other")
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        started = time.perf_counter()
+        status = {"code": 500}
+        IN_FLIGHT.inc(endpoint)
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                BYTES_IN.inc(endpoint, value=len(message.get("body", b"")))
+            return message
+
+        with recording() as recorder:
+
+            async def timing_send(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    value = server_timing(recorder, time.perf_counter() - started)
+                    if value:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"server-timing", value.encode("latin-1")))
+                        message = dict(message, headers=headers)
+                elif message["type"] == "http.response.body":
+                    BYTES_OUT.inc(endpoint, value=len(message.get("body", b"")))
+                await send(message)
+
+            try:
+                await self.app(scope, counting_receive, timing_send)
+            finally:
+                IN_FLIGHT.dec(endpoint)
+                REQUEST_DURATION.observe(endpoint, value=time.perf_counter() - started)
+                REQUESTS.inc(endpoint, scope["method"], str(status["code"]))
+                for name, seconds in recorder.stages:
+                    STAGE_DURATION.observe(endpoint, name, value=seconds)
+                pixels = recorder.counts.get("decoded_pixels")
+                if pixels:
+                    DECODED_PIXELS.inc(endpoint, value=pixels)
@@ -0,0 +1,396 @@
+"""Pre-fork multi-worker server for the image API.
+
+A single uvicorn process decodes and resizes on one core at a time. This entry
+point imports the app and warms up logic.classifier once, and then forks N uvicorn
+workers (by default one per CPU) that share the warmed-up memory copy-on-write.
+The workers either accept from one listening socket inherited from the master,
+or, with --reuse-port, each bind their own SO_REUSEPORT socket so that the kernel
+balances connections between them.
+
+The master restarts workers that crash. On SIGHUP it replaces the workers one at a
+time (rolling restart), each new worker accepting connections before an old one
+is asked to finish its requests and exit. SIGTERM and SIGINT stop all workers
+gracefully.
+
+Usage:
+    python -m api.serve --host 0.0.0.0 --port 8000 --workers 4
+    kill -HUP <master pid>    # rolling restart
+"""
+
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger("api.serve")
+
+# A worker that exits sooner than this after starting is restarted after a delay,
+# so a worker that crashes on startup does not fork in a tight loop
+MIN_WORKER_LIFETIME = 1.0
+
+# Seconds to wait for a new worker to accept connections during a rolling restart
+READY_TIMEOUT = 30.0
+
+DEFAULT_GRACEFUL_TIMEOUT = 30.0
+
+
+def default_worker_count() -> int:
+    """Get the default number of workers: $WEB_CONCURRENCY, or the CPU count."""
+    workers = os.environ.get("WEB_CONCURRENCY", "").strip()
+    return int(workers) if workers else os.cpu_count() or 1
+
+
+def warm_up() -> None:
+    """
+    Import the app and warm it up (see api.api.warm_up), logging each phase.
+
+    Forked workers then share the loaded PIL plugins, compiled template and numpy
+    code paths instead of each paying for them on their first request. The
+    warm-up runs the jobs directly, since worker pools must not be created before
+    forking.
+    """
+    # pylint: disable=import-outside-toplevel
+    with _timed("import"):
+        from api import api
+
+    phases = api.warm_up()
+    logger.info(
+        "Warm-up phases: %s",
+        ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in phases.items()),
+    )
+
+
+@contextmanager
+def _timed(phase: str) -> Iterator[None]:
+    """Log the duration of a startup phase."""
+    started = time.perf_counter()
+    yield
+    logger.info("Startup phase %s took %.1fms", phase, (time.perf_counter() - started) * 1000)
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False, backlog: int = 2048):
+    """
+    Create a listening TCP socket that can be shared with forked workers.
+
+    Args:
+        host: Bind address
+        port: Bind port
+        reuse_port: Set SO_REUSEPORT, so that several sockets can bind the same port
+        backlog: Listen backlog
+
+    Returns:
+        socket.socket: The listening socket
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """Fork, supervise and restart uvicorn workers."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        reuse_port: bool = False,
+        graceful_timeout: float = DEFAULT_GRACEFUL_TIMEOUT,
+        log_level: str = "info",
+    ):
+        """
+        Args:
+            host: Bind address
+            port: Bind port (must not be 0 with reuse_port)
+            workers: Number of worker processes (default: default_worker_count())
+            reuse_port: Give each worker its own SO_REUSEPORT socket
+            graceful_timeout: Seconds a stopping worker may take to finish its requests
+            log_level: uvicorn log level in the workers
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Pre-fork serving needs os.fork (POSIX)")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+        if reuse_port and port == 0:
+            raise ValueError("A port must be given with reuse_port")
+
+        self.host = host
+        self.port = port
+        self.workers = workers or default_worker_count()
+        if self.workers <= 0:
+            raise ValueError("Workers must be a positive integer")
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.socket: Optional[socket.socket] = None
+        # Worker pid -> start time
+        self.children: Dict[int, float] = {}
+        self._retiring: set = set()
+        # Start times of workers that exited without being asked to
+        self._crashed: List[float] = []
+        self._stopping = False
+        self._reload = False
+        self._wakeup_r, self._wakeup_w = -1, -1
+
+    # Worker side
+
+    def _run_worker(self, ready_fd: int) -> None:
+        """Serve requests in a forked worker until it is told to stop."""
+        # pylint: disable=import-outside-toplevel
+        import uvicorn
+        from api.api import app
+
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+        sock = self.socket or bind_socket(self.host, self.port, reuse_port=True)
+
+        class WorkerServer(uvicorn.Server):
+            """uvicorn server that tells the master when it accepts connections."""
+
+            async def startup(self, sockets=None):
+                await super().startup(sockets)
+                if not self.should_exit:
+                    os.write(ready_fd, b".")
+
+        config = uvicorn.Config(
+            app,
+            log_level=self.log_level,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        WorkerServer(config).run(sockets=[sock])
+
+    def spawn(self) -> int:
+        """Fork one worker, returning its pid once it accepts connections (or times out)."""
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            code = 0
+            try:
+                self._run_worker(ready_w)
+            except BaseException:  # pylint: disable=broad-except
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)  # pylint: disable=protected-access
+
+        os.close(ready_w)
+        self.children[pid] = time.monotonic()
+        try:
+            readable, _, _ = select.select([ready_r], [], [], READY_TIMEOUT)
+            if not readable or not os.read(ready_r, 1):
+                logger.warning("Worker %d did not become ready", pid)
+        finally:
+            os.close(ready_r)
+        logger.info("Booted worker %d", pid)
+        return pid
+
+    # Master side
+
+    def _on_signal(self, signum, _frame) -> None:
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self._stopping = True
+        elif signum == signal.SIGHUP:
+            self._reload = True
+        try:
+            os.write(self._wakeup_w, b".")
+        except BlockingIOError:
+            pass
+
+    def _reap(self) -> None:
+        """Collect exited workers, remembering those that were not asked to stop."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            if pid in self._retiring:
+                self._retiring.discard(pid)
+                continue
+            logger.warning(
+                "Worker %d exited with status %d", pid, os.waitstatus_to_exitcode(status)
+            )
+            self._crashed.append(started)
+
+    def _wait(self, timeout: float) -> None:
+        """Sleep until a signal arrives or the timeout expires."""
+        readable, _, _ = select.select([self._wakeup_r], [], [], timeout)
+        if readable:
+            os.read(self._wakeup_r, 1024)
+
+    def _stop_worker(self, pid: int, sig: int = signal.SIGTERM) -> None:
+        self._retiring.add(pid)
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _wait_for_exit(self, pids, timeout: float) -> None:
+        """Wait for workers to exit, killing any still running after the timeout."""
+        deadline = time.monotonic() + timeout
+        while any(pid in self.children for pid in pids):
+            self._reap()
+            if time.monotonic() > deadline:
+                for pid in pids:
+                    if pid in self.children:
+                        self._stop_worker(pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(0.05)
+
+    def rolling_restart(self) -> None:
+        """Replace the workers one at a time, keeping the full count serving."""
+        logger.info("Rolling restart of %d workers", len(self.children))
+        for pid in list(self.children):
+            if self._stopping:
+                return
+            self.spawn()
+            self._stop_worker(pid)
+            self._wait_for_exit([pid], self.graceful_timeout)
+
+    def stop(self) -> None:
+        """Stop all workers gracefully."""
+        pids = list(self.children)
+        for pid in pids:
+            self._stop_worker(pid)
+        self._wait_for_exit(pids, self.graceful_timeout)
+
+    def run(self) -> int:
+        """
+        Preload the app, start the workers, and supervise them until stopped.
+
+        Returns:
+            int: Exit code
+        """
+        started = time.perf_counter()
+        warm_up()
+        logger.info("Preloaded the app in %.2fs", time.perf_counter() - started)
+
+        if not self.reuse_port:
+            self.socket = bind_socket(self.host, self.port)
+            self.port = self.socket.getsockname()[1]
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_w, False)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        logger.info(
+            "Serving on http://%s:%d with %d workers (master %d)",
+            self.host,
+            self.port,
+            self.workers,
+            os.getpid(),
+        )
+
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            while not self._stopping:
+                self._reap()
+                crashed, self._crashed = self._crashed, []
+                for worker_started in crashed:
+                    if time.monotonic() - worker_started < MIN_WORKER_LIFETIME:
+                        time.sleep(MIN_WORKER_LIFETIME)
+                    if not self._stopping:
+                        self.spawn()
+                if self._reload:
+                    self._reload = False
+                    self.rolling_restart()
+                    continue
+                self._wait(1.0)
+        finally:
+            self.stop()
+            if self.socket is not None:
+                self.socket.close()
+        logger.info("Shut down")
+        return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the pre-fork server from the command line."""
+    # pylint: disable=import-outside-toplevel
+    from logic.executor import EXECUTOR_KINDS, default_workers
+
+    parser = argparse.ArgumentParser(description="Serve the image API with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8000, help="Bind port (default: 8000)")
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=None,
+        help="Worker processes (default: $WEB_CONCURRENCY or the CPU count)",
+    )
+    parser.add_argument(
+        "--reuse-port",
+        action="store_true",
+        help="Bind one SO_REUSEPORT socket per worker, so the kernel balances connections",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=DEFAULT_GRACEFUL_TIMEOUT,
+        help="Seconds a stopping worker may take to finish its requests (default: 30)",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTOR_KINDS,
+        default=None,
+        help="Worker pool kind for image work (default: $IMAGE_EXECUTOR_KIND or thread)",
+    )
+    parser.add_argument(
+        "--executor-workers",
+        type=int,
+        default=None,
+        help="Worker pool size per process (default: $IMAGE_EXECUTOR_WORKERS, or the "
+        "default pool size divided between the workers)",
+    )
+    parser.add_argument("--log-level", default="info", help="Log level (default: info)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=args.log_level.upper(), format="[%(process)d] %(levelname)s: %(message)s"
+    )
+    workers = args.workers or default_worker_count()
+
+    # The worker pools read their configuration from the environment on first use
+    if args.executor:
+        os.environ["IMAGE_EXECUTOR_KIND"] = args.executor
+    if args.executor_workers:
+        os.environ["IMAGE_EXECUTOR_WORKERS"] = str(args.executor_workers)
+    elif "IMAGE_EXECUTOR_WORKERS" not in os.environ:
+        # Don't start a full-size pool in every process
+        kind = os.environ.get("IMAGE_EXECUTOR_KIND", "thread").strip().lower()
+        os.environ["IMAGE_EXECUTOR_WORKERS"] = str(max(1, -(-default_workers(kind) // workers)))
+
+    arbiter = Arbiter(
+        args.host,
+        args.port,
+        workers,
+        reuse_port=args.reuse_port,
+        graceful_timeout=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+    return arbiter.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
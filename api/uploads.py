@@ -0,0 +1,437 @@
+"""Ingest of image uploads: multipart forms and raw request bodies.
+
+FastAPI's UploadFile parameters make a handler wait until the whole body has been
+received and spooled. stream_image_upload instead parses the multipart body as it
+arrives, and feeds the image part to an IncrementalImageDecoder chunk by chunk. So
+decoding overlaps the network transfer, oversized images are rejected as soon as
+their header is in, and the content hash for the result cache is computed along
+the way.
+
+For endpoints that do take an UploadFile, open_upload gives the jobs the spooled
+file itself to decode from, instead of a bytes copy of it. Uploads that were
+spooled to disk are memory-mapped.
+
+The /raw endpoints take the image as the request body itself, skipping multipart
+parsing and the spool file. raw_upload reads such a body into bytes, and
+stream_image_body decodes it while it streams in. Both undo a gzip or deflate
+Content-Encoding on the fly, and cap the decoded size at MAX_UPLOAD_BYTES.
+"""
+
+import asyncio
+import hashlib
+import mmap
+import time
+import zlib
+from contextlib import asynccontextmanager
+from typing import IO, AsyncIterator, List, NamedTuple, Optional, Tuple, Union
+
+import python_multipart
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.exceptions import RequestValidationError
+from PIL import Image
+from python_multipart.multipart import parse_options_header
+
+from api import limits
+from logic.cache import content_hash
+from logic.classifier import DEFAULT_REDUCING_GAP
+from logic.executor import get_pool
+from logic.incremental import IncrementalImageDecoder
+from logic.timing import current_recorder, stage
+
+# Upload contents handed to jobs: bytes, a memory-mapped spool file, or the
+# in-memory spool file itself
+UploadSource = Union[bytes, mmap.mmap, IO[bytes]]
+
+# Chunk size used when hashing a spooled upload
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Content-Encodings accepted on raw uploads
+CONTENT_ENCODINGS = ("identity", "gzip", "x-gzip", "deflate")
+
+
+def _spooled_to_disk(file: UploadFile) -> bool:
+    """Check whether an upload's SpooledTemporaryFile has rolled over to disk."""
+    return getattr(file.file, "_rolled", True)
+
+
+@asynccontextmanager
+async def open_upload(file: UploadFile) -> AsyncIterator[UploadSource]:
+    """
+    Open an upload for decoding without copying it into a bytes object.
+
+    Uploads kept in memory are yielded as the spool file itself; uploads spooled to
+    disk are memory-mapped for the duration of the block. Jobs must be done with
+    the source when the block exits. Process pools can't share file objects, so
+    for those the upload is read into bytes as before. Opening is timed as the
+    "read" stage.
+
+    Args:
+        file: The uploaded file
+
+    Yields:
+        UploadSource: The upload contents (see _open_image in api.api)
+    """
+    mapped = None
+    with stage("read"):
+        if get_pool().kind == "process":
+            source = await file.read()
+        elif _spooled_to_disk(file) and file.size:
+            mapped = mmap.mmap(file.file.fileno(), 0, access=mmap.ACCESS_READ)
+            source = mapped
+        else:
+            source = file.file
+            source.seek(0)
+    try:
+        yield source
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def upload_digest(source: UploadSource) -> str:
+    """
+    Hash upload contents for use in cache keys (see content_hash).
+
+    Spool files are hashed in chunks, and memory-mapped files in place, so the
+    upload is not copied in full.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return content_hash(source)
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+class StreamedUpload(NamedTuple):
+    """An image upload received by stream_image_upload."""
+
+    filename: Optional[str]
+    # Decoded image, or the raw bytes for formats that can't be decoded incrementally
+    source: Union[Image.Image, bytes]
+    digest: str
+    size: int
+
+
+def upload_openapi(field: str = "file") -> dict:
+    """OpenAPI request body for an endpoint that streams a single image field."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": [field],
+                        "properties": {field: {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    }
+
+
+def raw_upload_openapi() -> dict:
+    """OpenAPI request body for an endpoint that takes the image as the raw body."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/octet-stream": {"schema": {"type": "string", "format": "binary"}}
+            },
+        }
+    }
+
+
+def _missing_field(field: str) -> RequestValidationError:
+    """The validation error FastAPI reports for a missing form field."""
+    return RequestValidationError(
+        [{"type": "missing", "loc": ("body", field), "msg": "Field required", "input": None}]
+    )
+
+
+class BodyDecoder:
+    """
+    Undo the Content-Encoding of a request body as it streams in.
+
+    Codings are undone in reverse order of the header; "deflate" is the zlib
+    format. The decoded size is capped, so a small compressed body can't expand
+    without bound: each decompress call may only produce what is left of the cap.
+
+    Raises:
+        HTTPException: 415 for an unsupported coding, 413 when the decoded body
+            exceeds max_bytes, and 400 for a corrupt or truncated body
+    """
+
+    def __init__(self, content_encoding: Optional[str], max_bytes: Optional[int] = None):
+        codings = [coding.strip().lower() for coding in (content_encoding or "").split(",")]
+        codings = [coding for coding in codings if coding and coding != "identity"]
+        if any(coding not in CONTENT_ENCODINGS for coding in codings):
+            raise HTTPException(
+                status_code=415,
+                detail=f"Content-Encoding must be one of {', '.join(CONTENT_ENCODINGS)}",
+            )
+        # wbits 32 + 15 accepts both gzip and zlib headers
+        self.stages = [
+            (coding, zlib.decompressobj(32 + zlib.MAX_WBITS)) for coding in reversed(codings)
+        ]
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Decoded request body exceeds the limit of {self.max_bytes} bytes",
+        )
+
+    def _run(self, data: bytes, final: bool) -> bytes:
+        for coding, decompressor in self.stages:
+            room = 0 if self.max_bytes is None else self.max_bytes - self.size + 1
+            try:
+                data = decompressor.decompress(data, room)
+                if decompressor.unconsumed_tail:
+                    raise self._too_large()
+                if final:
+                    data += decompressor.flush()
+            except zlib.error as e:
+                raise HTTPException(status_code=400, detail=f"Invalid {coding} body: {e}")
+            if final and not decompressor.eof:
+                raise HTTPException(status_code=400, detail=f"Invalid {coding} body: truncated")
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise self._too_large()
+        return data
+
+    def decode(self, chunk: bytes) -> bytes:
+        """Decode the next chunk of the body."""
+        return self._run(chunk, final=False)
+
+    def finish(self) -> bytes:
+        """Decode what is left, and check that every coded stream is complete."""
+        return self._run(b"", final=True)
+
+
+@asynccontextmanager
+async def raw_upload(request: Request) -> AsyncIterator[bytes]:
+    """
+    Read an image sent as the raw request body, undoing its Content-Encoding.
+
+    This is the raw-body counterpart of open_upload, behind the /raw variants of the
+    upload endpoints. They take the same parameters as their multipart endpoint, in the
+    query string, and the image as the request body, so no multipart parsing or spool
+    file is needed; the image is named by an optional filename parameter. A gzip or
+    deflate Content-Encoding is undone as the body streams in. Reading and decoding
+    the body are timed as the "read" stage.
+
+    Args:
+        request: The incoming request
+
+    Yields:
+        bytes: The decoded body
+
+    Raises:
+        HTTPException: If the body is empty, or for Content-Encoding errors (see
+            BodyDecoder)
+    """
+    with stage("read"):
+        decoder = BodyDecoder(request.headers.get("content-encoding"), limits.MAX_UPLOAD_BYTES)
+        chunks = [decoder.decode(chunk) async for chunk in request.stream()]
+        chunks.append(decoder.finish())
+        body = b"".join(chunks)
+    if not body:
+        raise HTTPException(status_code=400, detail="Request body is empty")
+    yield body
+
+
+class _PartEvents:
+    """Collect multipart parser callbacks as (event, data) tuples."""
+
+    def __init__(self):
+        self.events: List[Tuple[str, bytes]] = []
+
+    def callbacks(self) -> dict:
+        def data_event(name):
+            return lambda data, start, end: self.events.append((name, data[start:end]))
+
+        def event(name):
+            return lambda: self.events.append((name, b""))
+
+        return {
+            "on_part_begin": event("part_begin"),
+            "on_header_field": data_event("header_field"),
+            "on_header_value": data_event("header_value"),
+            "on_header_end": event("header_end"),
+            "on_headers_finished": event("headers_finished"),
+            "on_part_data": data_event("part_data"),
+            "on_part_end": event("part_end"),
+        }
+
+
+class _DecoderFeed:
+    """
+    Feed an IncrementalImageDecoder off the event loop.
+
+    Decoding runs in the worker pool when it is a thread pool, and in the event
+    loop's default thread executor otherwise (process pool workers can't hold the
+    decoder's state between chunks).
+
+    The time spent decoding is recorded as the "decode" stage when the decoder is
+    closed, and the rest of the time since the body started arriving as "read".
+    """
+
+    def __init__(self, target_size: Optional[Tuple[int, int]], reducing_gap: Optional[float]):
+        pool = get_pool()
+        # None selects the event loop's default executor
+        self.executor = pool.executor if pool.kind == "thread" else None
+        self.decoder = IncrementalImageDecoder(
+            target_size, reducing_gap, limits.MAX_IMAGE_PIXELS, limits.MAX_IMAGE_DIMENSION
+        )
+        self.decode_time = 0.0
+
+    @property
+    def bytes_received(self) -> int:
+        return self.decoder.bytes_received
+
+    async def feed(self, data: bytes) -> None:
+        started = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.decoder.feed, data)
+        self.decode_time += time.perf_counter() - started
+
+    async def close(self, received: float) -> Union[Image.Image, bytes]:
+        """Finish decoding, and record the stages of a body that started arriving at received."""
+        started = time.perf_counter()
+        source = await asyncio.get_running_loop().run_in_executor(self.executor, self.decoder.close)
+        finished = time.perf_counter()
+        self.decode_time += finished - started
+        recorder = current_recorder()
+        if recorder is not None:
+            recorder.add_stage("read", finished - received - self.decode_time)
+            recorder.add_stage("decode", self.decode_time)
+        return source
+
+
+async def stream_image_upload(
+    request: Request,
+    field: str = "file",
+    target_size: Optional[Tuple[int, int]] = None,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+) -> StreamedUpload:
+    """
+    Receive a multipart image upload, decoding it while it streams in.
+
+    Only the first part named ``field`` is read; other parts are skipped. Decoder
+    work runs in the worker pool when it is a thread pool, and in the event loop's
+    default thread executor otherwise. The time spent decoding is recorded as the
+    "decode" stage, and the rest of the time spent receiving the body as the "read"
+    stage.
+
+    Args:
+        request: The incoming request
+        field: Name of the form field holding the image (default: "file")
+        target_size: Size the image will be downscaled to, for a reduced-size JPEG
+            decode (see IncrementalImageDecoder)
+        reducing_gap: Quality knob for the reduced-size decode
+
+    Returns:
+        StreamedUpload: (filename, decoded image or bytes, SHA-256 hex digest, size)
+
+    Raises:
+        RequestValidationError: If the body has no such field
+        ImageTooLargeError: As soon as the image header exceeds the size limits
+        OSError: If the upload is not a valid image
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise _missing_field(field)
+
+    events = _PartEvents()
+    parser = python_multipart.MultipartParser(params[b"boundary"], events.callbacks())
+    decoder: Optional[_DecoderFeed] = None
+    digest = hashlib.sha256()
+    filename = None
+    target = False
+    header_field = header_value = b""
+    headers = {}
+    received = time.perf_counter()
+
+    async for chunk in request.stream():
+        parser.write(chunk)
+        for name, data in events.events:
+            if name == "part_begin":
+                headers = {}
+            elif name == "header_field":
+                header_field += data
+            elif name == "header_value":
+                header_value += data
+            elif name == "header_end":
+                headers[header_field.lower()] = header_value
+                header_field = header_value = b""
+            elif name == "headers_finished":
+                _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                target = decoder is None and options.get(b"name", b"").decode() == field
+                if target:
+                    filename = options.get(b"filename", b"").decode() or None
+                    decoder = _DecoderFeed(target_size, reducing_gap)
+            elif name == "part_data" and target:
+                digest.update(data)
+                await decoder.feed(data)
+            elif name == "part_end":
+                target = False
+        events.events.clear()
+    parser.finalize()
+
+    if decoder is None:
+        raise _missing_field(field)
+    source = await decoder.close(received)
+    return StreamedUpload(filename, source, digest.hexdigest(), decoder.bytes_received)
+
+
+async def stream_image_body(
+    request: Request,
+    target_size: Optional[Tuple[int, int]] = None,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    filename: Optional[str] = None,
+) -> StreamedUpload:
+    """
+    Receive an image sent as the raw request body, decoding it while it streams in.
+
+    This is the raw-body counterpart of stream_image_upload, with the same
+    decoding, timing and limits. The Content-Encoding is undone as the body
+    arrives (see BodyDecoder), and the digest is that of the decoded image.
+
+    Args:
+        request: The incoming request
+        target_size: Size the image will be downscaled to, for a reduced-size decode
+        reducing_gap: Quality knob for the reduced-size decode
+        filename: Name to report for the upload
+
+    Returns:
+        StreamedUpload: (filename, decoded image or bytes, SHA-256 hex digest, size)
+
+    Raises:
+        HTTPException: If the body is empty, or for Content-Encoding errors (see
+            BodyDecoder)
+        ImageTooLargeError: As soon as the image header exceeds the size limits
+        OSError: If the body is not a valid image
+    """
+    body = BodyDecoder(request.headers.get("content-encoding"), limits.MAX_UPLOAD_BYTES)
+    decoder = _DecoderFeed(target_size, reducing_gap)
+    digest = hashlib.sha256()
+    received = time.perf_counter()
+
+    async for chunk in request.stream():
+        data = body.decode(chunk)
+        if data:
+            digest.update(data)
+            await decoder.feed(data)
+    data = body.finish()
+    if data:
+        digest.update(data)
+        await decoder.feed(data)
+
+    if not decoder.bytes_received:
+        raise HTTPException(status_code=400, detail="Request body is empty")
+    source = await decoder.close(received)
+    return StreamedUpload(filename, source, digest.hexdigest(), decoder.bytes_received)
@@ -1,48 +1,41 @@
 """Gradio application for Image Classification."""
 
+import os
+
 import gradio as gr
-import requests
-from PIL import Image
-import io
+import httpx
+
+from client.client import APIError, ImageClient
+
+# API URL - Replace with your Render deployment URL (or set $API_URL)
+API_URL = os.environ.get("API_URL", "https://mlops-lab2-fq77.onrender.com")
 
-# API URL - Replace with your Render deployment URL
-API_URL = "https://mlops-lab2-fq77.onrender.com"  # Update this after deploying to Render
+# One client for the whole app: it keeps connections to the API alive, downscales
+# images before upload, caches results, and retries while the API cold-starts
+client = ImageClient(API_URL)
 
 
 def predict_image(image):
     """
     Predict the class of an uploaded image using the API.
-    
+
     Args:
         image: PIL Image object from Gradio
-        
+
     Returns:
         str: Predicted class label
     """
     if image is None:
         return "Please upload an image first."
-    
+
     try:
-        # Convert image to bytes
-        img_bytes = io.BytesIO()
-        image.save(img_bytes, format="JPEG")
-        img_bytes.seek(0)
-        
-        # Send request to API
-        files = {"file": ("image.jpg", img_bytes, "image/jpeg")}
-        response = requests.post(f"{API_URL}/predict", files=files, timeout=30)
-        
-        # Check response
-        if response.status_code == 200:
-            result = response.json()
-            predicted_class = result.get("predicted_class", "Unknown")
-            return f"🎯 Predicted Class: **{predicted_class}**"
-        else:
-            return f"❌ Error: {response.status_code} - {response.text}"
-            
-    except requests.exceptions.Timeout:
+        predicted_class = client.predict(image)
+        return f"🎯 Predicted Class: **{predicted_class}**"
+    except APIError as e:
+        return f"❌ Error: {e.status_code} - {e.detail}"
+    except httpx.TimeoutException:
         return "⏱️ Error: Request timeout. The API might be starting up (cold start). Please try again."
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         return "🔌 Error: Could not connect to the API. Please check if the API is running."
     except Exception as e:
         return f"❌ Error: {str(e)}"
@@ -102,8 +95,9 @@ with gr.Blocks(title="Image Classification - MLOps Lab 2", theme=gr.themes.Soft(
         outputs=output_text
     )
     
-    # Also trigger on image upload
-    input_image.change(
+    # Also trigger when an image is uploaded (not on every change, e.g. clearing it);
+    # clicking the button for the same image again is answered from the cache
+    input_image.upload(
         fn=predict_image,
         inputs=input_image,
         outputs=output_text
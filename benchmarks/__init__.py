@@ -0,0 +1 @@
+"""Benchmarks for image classification and preprocessing."""
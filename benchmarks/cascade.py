@@ -0,0 +1,137 @@
+"""Cost of a thumbnail pyramid: one resize per size vs one cascade.
+
+For each source size, an encoded synthetic JPEG is turned into every target
+size in two ways. "separate" opens, decodes and resizes the source once per size,
+the way repeated /resize calls run. "cascade" decodes once and resamples each
+size from the next larger one (see logic.classifier.resize_cascade), the way
+/thumbnails runs. The report gives the p50 latency of both, the speedup, and the
+lowest PSNR of a cascade output against its separately resized counterpart.
+
+Usage:
+    python -m benchmarks.cascade
+    python -m benchmarks.cascade --sources 2048 4096 --targets 64 128 256 512 --output cascade.json
+"""
+
+import argparse
+import io
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from PIL import Image
+from benchmarks.classifier import (
+    _percentiles_ms,
+    add_output_argument,
+    synthetic_image,
+    time_operation,
+    write_results,
+)
+from benchmarks.resize import _encode, psnr
+from logic.classifier import RESIZE_PROFILES, parse_size, resize_cascade, resize_image
+
+# Source widths (4:3 aspect) and the longer side of each pyramid level
+SOURCES = (2048, 4096)
+TARGETS = (64, 128, 256, 512)
+
+
+def _separate(data: bytes, targets: Sequence[str], profile: str) -> List[Image.Image]:
+    """Decode and resize the source once per size."""
+    results = []
+    for target in targets:
+        image = Image.open(io.BytesIO(data))
+        results.append(resize_image(image, *parse_size(target, image.size), profile=profile))
+    return results
+
+
+def _cascade(data: bytes, targets: Sequence[str], profile: str) -> List[Image.Image]:
+    """Decode the source once and resize it to every size as a cascade."""
+    image = Image.open(io.BytesIO(data))
+    sizes = [parse_size(target, image.size) for target in targets]
+    return resize_cascade(image, sizes, profile=profile)
+
+
+def iter_results(
+    sources: Sequence[int] = SOURCES,
+    targets: Sequence[int] = TARGETS,
+    profile: str = "quality",
+    min_time: float = 0.5,
+    min_iterations: int = 5,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Time the separate and cascade strategies on each source size.
+
+    Args:
+        sources: Source image widths
+        targets: Longer side of each output
+        profile: Resize profile from RESIZE_PROFILES
+        min_time: Minimum seconds to time each strategy
+        min_iterations: Minimum calls per strategy
+
+    Yields:
+        dict: One result per source size
+    """
+    specs = [str(target) for target in targets]
+    for source in sources:
+        data = _encode(synthetic_image(source, "RGB"), "JPEG")
+        timings = {
+            name: _percentiles_ms(
+                time_operation(
+                    lambda encoded, run=run: run(encoded, specs, profile),
+                    data,
+                    min_time,
+                    min_iterations,
+                )
+            )
+            for name, run in (("separate", _separate), ("cascade", _cascade))
+        }
+        pairs = zip(_cascade(data, specs, profile), _separate(data, specs, profile))
+        yield {
+            "source": source,
+            "targets": list(targets),
+            "profile": profile,
+            "latency_ms": timings,
+            "speedup": round(timings["separate"]["p50"] / timings["cascade"]["p50"], 2),
+            "min_psnr_db": round(min(psnr(ours, theirs) for ours, theirs in pairs), 2),
+        }
+
+
+def format_row(result: Dict[str, Any]) -> str:
+    """Format one result as a table row."""
+    latency = result["latency_ms"]
+    return (
+        f"{result['source']:>6} {result['profile']:<9} {latency['separate']['p50']:>11.2f}"
+        f" {latency['cascade']['p50']:>10.2f} {result['speedup']:>7.2f}x"
+        f" {result['min_psnr_db']:>8.2f}"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the cascade benchmark from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark thumbnail pyramids: separate vs cascade"
+    )
+    parser.add_argument("--sources", nargs="+", type=int, default=SOURCES, help="Source widths")
+    parser.add_argument(
+        "--targets", nargs="+", type=int, default=TARGETS, help="Longer side of each output"
+    )
+    parser.add_argument(
+        "--profile", choices=RESIZE_PROFILES, default="quality", help="Resize profile"
+    )
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per strategy")
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'source':>6} {'profile':<9} {'separate ms':>11} {'cascade ms':>10}"
+        f" {'speedup':>8} {'PSNR dB':>8}"
+    )
+    results: List[Dict[str, Any]] = []
+    for result in iter_results(args.sources, args.targets, args.profile, args.min_time):
+        results.append(result)
+        print(format_row(result))
+
+    write_results(args.output, {"results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
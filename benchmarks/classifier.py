@@ -0,0 +1,446 @@
+"""Micro-benchmarks for logic.classifier across image sizes, modes and formats.
+
+Synthetic inputs are generated for a matrix of sizes (longest side, 4:3 aspect),
+modes and formats. Each operation is then timed on the encoded bytes, from
+Image.open through the operation, the way the API and CLI run it. Each case runs
+in a fresh process, and on Linux its peak RSS counter is reset first, so earlier
+cases do not skew it.
+
+Usage:
+    python -m benchmarks.classifier --output bench_classifier.json
+    python -m benchmarks.classifier --sizes 64 1024 --modes L RGBA --ops resize
+    python -m benchmarks.classifier --compare old.json --output new.json
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import PIL
+from PIL import Image
+from logic.classifier import (
+    convert_to_rgb,
+    predict_class,
+    preprocess_image,
+    probe_image,
+    resize_image,
+)
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+SIZES = (64, 256, 1024, 2048, 4096, 8192)
+MODES = ("L", "P", "RGBA", "CMYK", "I;16")
+FORMATS = ("JPEG", "PNG", "WEBP")
+
+# Target size of the resize and preprocess operations (the model input size)
+TARGET_SIZE = 224
+
+
+def _open(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data))
+
+
+def _decode(data: bytes) -> None:
+    _open(data).load()
+
+
+def _probe(data: bytes) -> None:
+    probe_image(_open(data))
+
+
+def _convert_to_rgb(data: bytes) -> None:
+    convert_to_rgb(_open(data))
+
+
+def _resize(data: bytes) -> None:
+    resize_image(_open(data), TARGET_SIZE, TARGET_SIZE)
+
+
+def _preprocess(data: bytes) -> None:
+    preprocess_image(_open(data), TARGET_SIZE, TARGET_SIZE)
+
+
+def _predict(data: bytes) -> None:
+    predict_class(_open(data))
+
+
+# Benchmarked operations; each one takes the encoded image bytes
+OPERATIONS: Dict[str, Callable[[bytes], None]] = {
+    "probe": _probe,
+    "decode": _decode,
+    "convert_to_rgb": _convert_to_rgb,
+    "resize": _resize,
+    "preprocess": _preprocess,
+    "predict": _predict,
+}
+
+
+def synthetic_image(size: int, mode: str) -> Image.Image:
+    """
+    Generate a synthetic test image.
+
+    The image mixes gradients with noise, so it compresses roughly like a photo
+    rather than like a flat color.
+
+    Args:
+        size: Width in pixels (height is 3/4 of it)
+        mode: Image mode (one of MODES, or any mode RGB converts to)
+
+    Returns:
+        Image.Image: The generated image
+    """
+    width, height = size, max(1, size * 3 // 4)
+    horizontal = Image.linear_gradient("L").rotate(90).resize((width, height))
+    radial = Image.radial_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 48).convert("L")
+
+    if mode == "I;16":
+        # Spread the gradient over the full 16-bit range
+        return horizontal.convert("I").point(lambda value: value * 257).convert("I;16")
+
+    image = Image.merge("RGB", (horizontal, radial, noise))
+    if mode == "RGBA":
+        image.putalpha(radial)
+        return image
+    return image.convert(mode)
+
+
+def encode_synthetic(image: Image.Image, image_format: str) -> Optional[bytes]:
+    """
+    Encode a synthetic image, or return None if the format cannot store its mode.
+
+    Args:
+        image: Image from synthetic_image
+        image_format: PIL format name
+
+    Returns:
+        bytes or None
+    """
+    buffer = io.BytesIO()
+    try:
+        image.save(buffer, format=image_format)
+    except (OSError, ValueError, KeyError):
+        return None
+    return buffer.getvalue()
+
+
+def _read_status_mb(field: str) -> Optional[float]:
+    """Read a memory field (e.g. "VmHWM") from /proc/self/status in MiB, if available."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> None:
+    """Reset the peak RSS counter of this process (Linux only, best effort)."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def _current_rss_mb() -> Optional[float]:
+    """Get the resident set size of this process in MiB."""
+    return _read_status_mb("VmRSS")
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Get the peak resident set size of this process in MiB."""
+    peak = _read_status_mb("VmHWM")
+    if peak is not None or resource is None:
+        return peak
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere. It is not reset between
+    # cases and survives exec, so it is only an upper bound.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles_ms(samples: Sequence[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) in milliseconds."""
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return 1000 * ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "mean": 1000 * sum(ordered) / len(ordered),
+        "min": 1000 * ordered[0],
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": 1000 * ordered[-1],
+    }
+
+
+def time_operation(
+    fn: Callable[[bytes], None],
+    data: bytes,
+    min_time: float = 0.5,
+    min_iterations: int = 5,
+    max_iterations: int = 1000,
+) -> List[float]:
+    """
+    Time repeated calls of an operation after one warm-up call.
+
+    Calls are repeated until both min_time seconds and min_iterations calls have
+    passed, or max_iterations is reached.
+
+    Returns:
+        List of per-call latencies in seconds
+    """
+    fn(data)
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < max_iterations and (
+        len(samples) < min_iterations or time.perf_counter() - started < min_time
+    ):
+        call_started = time.perf_counter()
+        fn(data)
+        samples.append(time.perf_counter() - call_started)
+    return samples
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Benchmark one operation on one encoded input.
+
+    This function is module-level so that it can run in a worker process.
+
+    Args:
+        case: dict with op, size, mode, format, data and timing options
+
+    Returns:
+        dict with the case description, ops/s, latency percentiles and peak RSS
+    """
+    data = case["data"]
+    result = {key: case[key] for key in ("op", "size", "mode", "format")}
+    with _open(data) as image:
+        result["width"], result["height"] = image.size
+        result["decoded_mode"] = image.mode
+    result["bytes"] = len(data)
+
+    _reset_peak_rss()
+    rss_before = _current_rss_mb()
+    try:
+        samples = time_operation(
+            OPERATIONS[case["op"]],
+            data,
+            case["min_time"],
+            case["min_iterations"],
+            case["max_iterations"],
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        result["error"] = str(e)
+        return result
+    rss_after = _peak_rss_mb()
+
+    result["iterations"] = len(samples)
+    result["ops_per_sec"] = len(samples) / sum(samples) if sum(samples) > 0 else 0.0
+    result["latency_ms"] = _percentiles_ms(samples)
+    result["peak_rss_mb"] = rss_after
+    result["peak_rss_delta_mb"] = (
+        rss_after - rss_before if rss_after is not None and rss_before is not None else None
+    )
+    return result
+
+
+def iter_cases(
+    sizes: Sequence[int] = SIZES,
+    modes: Sequence[str] = MODES,
+    formats: Sequence[str] = FORMATS,
+    ops: Sequence[str] = tuple(OPERATIONS),
+    **options: Any,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generate the benchmark matrix, skipping format/mode pairs that cannot be encoded.
+
+    Each input is generated and encoded once and shared by all its operations.
+
+    Yields:
+        dict: One case per (size, mode, format, op), for run_case
+    """
+    for size in sizes:
+        for mode in modes:
+            image = synthetic_image(size, mode)
+            for image_format in formats:
+                data = encode_synthetic(image, image_format)
+                if data is None:
+                    continue
+                for op in ops:
+                    yield dict(options, op=op, size=size, mode=mode, format=image_format, data=data)
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = SIZES,
+    modes: Sequence[str] = MODES,
+    formats: Sequence[str] = FORMATS,
+    ops: Sequence[str] = tuple(OPERATIONS),
+    min_time: float = 0.5,
+    min_iterations: int = 5,
+    max_iterations: int = 1000,
+    isolate: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run the benchmark matrix.
+
+    Args:
+        sizes: Image widths in pixels
+        modes: Image modes
+        formats: Image formats
+        ops: Operation names from OPERATIONS
+        min_time: Minimum seconds to time each case
+        min_iterations: Minimum calls per case
+        max_iterations: Maximum calls per case
+        isolate: Run each case in a fresh process (for meaningful peak RSS)
+
+    Yields:
+        dict: One result per case (see run_case), in matrix order
+    """
+    unknown = set(ops) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+    cases = iter_cases(
+        sizes,
+        modes,
+        formats,
+        ops,
+        min_time=min_time,
+        min_iterations=min_iterations,
+        max_iterations=max_iterations,
+    )
+    if not isolate:
+        yield from map(run_case, cases)
+        return
+
+    # A new spawned worker per case, so each case starts from a clean heap
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        yield from pool.imap(run_case, cases)
+
+
+def _case_key(result: Dict[str, Any]) -> Tuple:
+    return result["op"], result["format"], result["mode"], result["size"]
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and library versions a run was made with."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+    }
+
+
+def add_output_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the --output option that every benchmark takes."""
+    parser.add_argument("--output", "-o", help="Write the results to this JSON file")
+
+
+def write_results(output: Optional[str], data: Dict[str, Any], table: Optional[str] = None) -> None:
+    """
+    Report the results of a benchmark run.
+
+    Args:
+        output: JSON file to write data to, with the environment it was measured
+            in (nothing is written if None)
+        data: JSON-serializable results
+        table: Results table to print first
+    """
+    if table is not None:
+        print(table)
+    if not output:
+        return
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), **data}, f, indent=2)
+    print(f"Results written to {output}")
+
+
+def format_row(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """Format one result as a table row, with the speedup against a baseline result."""
+    label = f"{result['op']:<15} {result['format']:<5} {result['mode']:<5} {result['size']:>5}"
+    if "error" in result:
+        return f"{label}  error: {result['error']}"
+    latency = result["latency_ms"]
+    rss = result["peak_rss_mb"]
+    row = (
+        f"{label} {result['ops_per_sec']:>10.1f} {latency['p50']:>9.3f} {latency['p99']:>9.3f}"
+        f" {rss if rss is not None else float('nan'):>8.1f}"
+    )
+    if baseline is not None and baseline.get("ops_per_sec"):
+        row += f" {result['ops_per_sec'] / baseline['ops_per_sec']:>7.2f}x"
+    return row
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark logic.classifier operations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Image widths")
+    parser.add_argument("--modes", nargs="+", default=MODES, help="Image modes")
+    parser.add_argument(
+        "--formats", nargs="+", type=str.upper, default=FORMATS, help="Image formats"
+    )
+    parser.add_argument(
+        "--ops", nargs="+", choices=tuple(OPERATIONS), default=tuple(OPERATIONS), help="Operations"
+    )
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per case")
+    parser.add_argument("--min-iterations", type=int, default=5, help="Minimum calls per case")
+    parser.add_argument("--max-iterations", type=int, default=1000, help="Maximum calls per case")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run all cases in this process (faster, but peak RSS is cumulative)",
+    )
+    add_output_argument(parser)
+    parser.add_argument("--compare", help="Baseline JSON file to report speedups against")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {_case_key(result): result for result in json.load(f)["results"]}
+
+    print(
+        f"{'op':<15} {'fmt':<5} {'mode':<5} {'size':>5} {'ops/s':>10} {'p50 ms':>9}"
+        f" {'p99 ms':>9} {'RSS MiB':>8}" + (" speedup" if baseline else "")
+    )
+    results = []
+    for result in run_benchmarks(
+        args.sizes,
+        args.modes,
+        args.formats,
+        args.ops,
+        args.min_time,
+        args.min_iterations,
+        args.max_iterations,
+        isolate=not args.in_process,
+    ):
+        results.append(result)
+        print(format_row(result, baseline.get(_case_key(result))), flush=True)
+
+    write_results(args.output, {"results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
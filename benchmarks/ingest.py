@@ -0,0 +1,130 @@
+"""Cost of multipart uploads vs raw-body uploads.
+
+For each endpoint and image size, the same workload (see benchmarks.loadtest) is
+sent as multipart/form-data to the endpoint and as an application/octet-stream
+body to its /raw variant. The report gives throughput and p50 latency for both,
+and the speedup of the raw variant. Small images show the fixed per-request
+cost of multipart parsing and spooling best. The target is the in-process app by
+default, or a server started with --spawn.
+
+Usage:
+    python -m benchmarks.ingest
+    python -m benchmarks.ingest --spawn --endpoints /resize /predict --sizes 64 256 1024
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from benchmarks.classifier import add_output_argument, write_results
+from benchmarks.loadtest import ENDPOINTS, build_workload, run_load, spawn_server
+
+# Image widths: thumbnails, where ingestion is a large share of the work, and up
+SIZES = (64, 256, 1024)
+
+
+async def _measure(
+    url: Optional[str], endpoint: str, size: int, requests: int, concurrency: int, warmup: int
+) -> Dict[str, Any]:
+    """Run one workload against a server, or the in-process app if url is None."""
+    specs = build_workload([(endpoint, 1.0)], [(size, 1.0)], requests, target_size=64)
+    if url is None:
+        # Imported here so that --spawn runs do not load the app
+        from api.api import app  # pylint: disable=import-outside-toplevel
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://ingest")
+    else:
+        limits = httpx.Limits(max_connections=concurrency)
+        client = httpx.AsyncClient(base_url=url, limits=limits, timeout=120.0)
+    async with client:
+        stats = await run_load(client, specs, concurrency=concurrency, warmup=warmup)
+    return stats.summary()
+
+
+def run_comparison(
+    endpoints: Sequence[str] = ENDPOINTS,
+    sizes: Sequence[int] = SIZES,
+    url: Optional[str] = None,
+    requests: int = 200,
+    concurrency: int = 8,
+    warmup: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    Measure each endpoint with multipart and raw-body uploads.
+
+    Args:
+        endpoints: Multipart endpoints, out of ENDPOINTS
+        sizes: Image widths
+        url: Base URL of a running server (default: the in-process app)
+        requests: Requests per measurement
+        concurrency: Requests in flight
+        warmup: Unrecorded requests sent first
+
+    Returns:
+        One result per (endpoint, size), with a summary per upload kind
+    """
+    results = []
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Endpoint must be one of {', '.join(ENDPOINTS)}")
+        for size in sizes:
+            result = {"endpoint": endpoint, "size": size}
+            for kind, target in (("multipart", endpoint), ("raw", f"{endpoint}/raw")):
+                summary = asyncio.run(_measure(url, target, size, requests, concurrency, warmup))
+                result[kind] = {
+                    "errors": summary["errors"],
+                    "throughput_rps": summary["throughput_rps"],
+                    "latency_ms": summary["latency_ms"],
+                }
+            results.append(result)
+    return results
+
+
+def format_results(results: Sequence[Dict[str, Any]]) -> str:
+    """Format the comparison as a table, with the raw variant's throughput speedup."""
+    lines = [
+        f"{'endpoint':<20} {'size':>5} {'multipart rps':>13} {'raw rps':>9}"
+        f" {'multipart p50':>13} {'raw p50':>9} {'errors':>6} {'speedup':>8}"
+    ]
+    for result in results:
+        multipart, raw = result["multipart"], result["raw"]
+        base = multipart["throughput_rps"]
+        speedup = raw["throughput_rps"] / base if base else float("nan")
+        lines.append(
+            f"{result['endpoint']:<20} {result['size']:>5} {base:>13.1f}"
+            f" {raw['throughput_rps']:>9.1f} {multipart['latency_ms']['p50']:>13.2f}"
+            f" {raw['latency_ms']['p50']:>9.2f} {multipart['errors'] + raw['errors']:>6}"
+            f" {speedup:>7.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the ingestion benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark multipart vs raw-body uploads")
+    parser.add_argument("--spawn", action="store_true", help="Start a uvicorn server to test")
+    parser.add_argument(
+        "--endpoints", nargs="+", default=list(ENDPOINTS), help="Multipart endpoints to compare"
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="Image widths")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Requests per run")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--warmup", type=int, default=10, help="Unrecorded warm-up requests")
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    options = (args.endpoints, args.sizes)
+    load = (args.requests, args.concurrency, args.warmup)
+    if args.spawn:
+        with spawn_server() as url:
+            results = run_comparison(*options, url, *load)
+    else:
+        results = run_comparison(*options, None, *load)
+    write_results(args.output, {"results": results}, format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
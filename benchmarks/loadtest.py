@@ -0,0 +1,555 @@
+"""End-to-end load test for the image API.
+
+Requests are sent to /predict, /resize, /preprocess and /classify_and_resize, or
+to their /raw variants, which take the image as the body and the form fields as
+query parameters.
+The target is the in-process ASGI app (through httpx, the default), a server
+started with --spawn, or any running server given by --url. The report covers
+throughput and p50/p95/p99/max latency, overall and per endpoint. With
+--baseline, the run fails when it regresses past a stored result.
+
+Workloads are either generated (endpoint and image-size mixes with weights) or
+replayed from a JSONL trace with one request per line, e.g.:
+
+    {"endpoint": "/resize", "size": 1024, "form": {"width": 256, "height": 256}}
+    {"endpoint": "/predict", "size": 256, "at": 0.5}
+
+"at" (seconds from the start) replays requests on their recorded schedule; lines
+without it are sent as fast as the concurrency allows.
+
+Usage:
+    python -m benchmarks.loadtest --requests 500 --concurrency 16 --sizes 256:3 2048:1
+    python -m benchmarks.loadtest --spawn --trace trace.jsonl --output run.json
+    python -m benchmarks.loadtest --baseline run.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+from benchmarks.classifier import synthetic_image
+
+ENDPOINTS = ("/predict", "/resize", "/preprocess", "/classify_and_resize")
+
+# Raw-body variants of ENDPOINTS (not part of the default workload)
+RAW_ENDPOINTS = tuple(f"{endpoint}/raw" for endpoint in ENDPOINTS)
+
+# Endpoints that need a target size in their form fields
+_SIZED_ENDPOINTS = (
+    "/resize",
+    "/classify_and_resize",
+    "/resize/raw",
+    "/classify_and_resize/raw",
+)
+
+# Latency summary percentiles reported and checked against the baseline
+PERCENTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+class RequestSpec(NamedTuple):
+    """One request of a workload."""
+
+    endpoint: str
+    size: int
+    form: Dict[str, Any]
+    query: Dict[str, Any]
+    at: Optional[float] = None
+
+
+def parse_weighted(values: Sequence[str], cast=str) -> List[Tuple[Any, float]]:
+    """
+    Parse "value" or "value:weight" items into (value, weight) pairs.
+
+    Args:
+        values: Items such as "256:3" or "/predict"
+        cast: Type of the value part
+
+    Returns:
+        List of (value, weight) tuples
+    """
+    pairs = []
+    for item in values:
+        value, _, weight = item.rpartition(":") if ":" in item else (item, "", "1")
+        weight = float(weight)
+        if weight <= 0:
+            raise ValueError(f"Weight must be positive: {item}")
+        pairs.append((cast(value), weight))
+    return pairs
+
+
+def build_workload(
+    endpoints: Sequence[Tuple[str, float]],
+    sizes: Sequence[Tuple[int, float]],
+    count: int,
+    target_size: int = 224,
+    seed: int = 0,
+) -> List[RequestSpec]:
+    """
+    Generate a random workload from weighted endpoint and image-size mixes.
+
+    Args:
+        endpoints: (endpoint, weight) pairs
+        sizes: (image width, weight) pairs
+        count: Number of requests
+        target_size: Width and height sent to /resize and /classify_and_resize
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        List of RequestSpec
+    """
+    for endpoint, _ in endpoints:
+        if endpoint not in ENDPOINTS + RAW_ENDPOINTS:
+            raise ValueError(f"Endpoint must be one of {', '.join(ENDPOINTS + RAW_ENDPOINTS)}")
+
+    rng = random.Random(seed)
+    names, endpoint_weights = zip(*endpoints)
+    widths, size_weights = zip(*sizes)
+    specs = []
+    for _ in range(count):
+        endpoint = rng.choices(names, endpoint_weights)[0]
+        form = {"width": target_size, "height": target_size} if endpoint in _SIZED_ENDPOINTS else {}
+        specs.append(RequestSpec(endpoint, rng.choices(widths, size_weights)[0], form, {}))
+    return specs
+
+
+def load_trace(path: str, default_size: int = 512) -> List[RequestSpec]:
+    """
+    Load a JSONL request trace.
+
+    Each line is an object with "endpoint" and optional "size" (image width),
+    "form" (form fields), "query" (query parameters) and "at" (seconds from start).
+
+    Args:
+        path: Trace file path
+        default_size: Image width for lines without "size"
+
+    Returns:
+        List of RequestSpec, sorted by "at" when present
+    """
+    specs = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            endpoint = record.get("endpoint")
+            if endpoint not in ENDPOINTS + RAW_ENDPOINTS:
+                raise ValueError(
+                    f"{path}:{number}: endpoint must be one of "
+                    f"{', '.join(ENDPOINTS + RAW_ENDPOINTS)}"
+                )
+            form = dict(record.get("form", {}))
+            if endpoint in _SIZED_ENDPOINTS:
+                form.setdefault("width", 224)
+                form.setdefault("height", 224)
+            specs.append(
+                RequestSpec(
+                    endpoint,
+                    int(record.get("size", default_size)),
+                    form,
+                    dict(record.get("query", {})),
+                    record.get("at"),
+                )
+            )
+    if any(spec.at is not None for spec in specs):
+        specs.sort(key=lambda spec: spec.at or 0.0)
+    return specs
+
+
+def make_images(sizes: Sequence[int], quality: int = 90) -> Dict[int, bytes]:
+    """Encode one synthetic RGB JPEG per image width."""
+    images = {}
+    for size in sorted(set(sizes)):
+        buffer = io.BytesIO()
+        synthetic_image(size, "RGB").save(buffer, format="JPEG", quality=quality)
+        images[size] = buffer.getvalue()
+    return images
+
+
+def summarize_latencies(samples: Sequence[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) as mean/percentiles/max in milliseconds."""
+    if not samples:
+        return {"mean": 0.0, **{name: 0.0 for name in PERCENTILES}, "max": 0.0}
+    ordered = sorted(samples)
+    summary = {"mean": 1000 * sum(ordered) / len(ordered)}
+    for name, fraction in PERCENTILES.items():
+        summary[name] = 1000 * ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+    summary["max"] = 1000 * ordered[-1]
+    return summary
+
+
+class LoadStats:
+    """Collect per-request results of a load test run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = self.started
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, int] = {}
+
+    def add(self, endpoint: str, latency: float, status: Optional[int]) -> None:
+        """Record one finished request (status None for transport errors)."""
+        self.latencies.setdefault(endpoint, []).append(latency)
+        self.errors.setdefault(endpoint, 0)
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+        key = str(status) if status is not None else "error"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        """Get throughput and latency statistics, overall and per endpoint."""
+        elapsed = self.finished - self.started
+        samples = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "requests": len(samples),
+            "errors": sum(self.errors.values()),
+            "statuses": dict(sorted(self.statuses.items())),
+            "duration_s": elapsed,
+            "throughput_rps": len(samples) / elapsed if elapsed > 0 else 0.0,
+            "latency_ms": summarize_latencies(samples),
+            "endpoints": {
+                endpoint: {
+                    "requests": len(latencies),
+                    "errors": self.errors[endpoint],
+                    "latency_ms": summarize_latencies(latencies),
+                }
+                for endpoint, latencies in sorted(self.latencies.items())
+            },
+        }
+
+
+async def _send(
+    client: httpx.AsyncClient, spec: RequestSpec, images: Dict[int, bytes], headers: Dict
+) -> Optional[int]:
+    """Send one request and return its status code (None on transport errors)."""
+    form = {key: str(value) for key, value in spec.form.items()}
+    if spec.endpoint in RAW_ENDPOINTS:
+        # The image is the body, and the form fields go into the query string
+        body = {"content": images[spec.size], "params": {**spec.query, **form}}
+        headers = {**headers, "Content-Type": "application/octet-stream"}
+    else:
+        files = {"file": (f"image-{spec.size}.jpg", images[spec.size], "image/jpeg")}
+        body = {"files": files, "data": form, "params": spec.query}
+    try:
+        response = await client.post(spec.endpoint, headers=headers, **body)
+        await response.aread()
+        return response.status_code
+    except httpx.HTTPError:
+        return None
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    specs: Sequence[RequestSpec],
+    concurrency: int = 8,
+    use_cache: bool = False,
+    warmup: int = 0,
+    duration: Optional[float] = None,
+) -> LoadStats:
+    """
+    Send a workload with bounded concurrency.
+
+    Requests with an "at" time start at that offset from the start of the run
+    (open loop). Other requests start as soon as a slot is free (closed loop).
+
+    Args:
+        client: httpx client pointed at the API
+        specs: Workload
+        concurrency: Maximum requests in flight
+        use_cache: Let the API serve results from its cache (off by default, since
+            repeated synthetic images would only measure cache hits)
+        warmup: Number of requests sent (and not recorded) before the run
+        duration: If set, keep cycling through the workload for this many seconds
+
+    Returns:
+        LoadStats: The recorded results
+    """
+    if concurrency <= 0:
+        raise ValueError("Concurrency must be a positive integer")
+    if not specs:
+        raise ValueError("Workload is empty")
+
+    images = make_images(spec.size for spec in specs)
+    headers = {} if use_cache else {"Cache-Control": "no-cache"}
+
+    for spec in specs[:warmup]:
+        await _send(client, spec, images, headers)
+
+    stats = LoadStats()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def issue(spec: RequestSpec) -> None:
+        # The caller holds a slot of the semaphore, released when the request is done
+        try:
+            started = time.perf_counter()
+            status = await _send(client, spec, images, headers)
+            stats.add(spec.endpoint, time.perf_counter() - started, status)
+        finally:
+            semaphore.release()
+
+    async def queue(spec: RequestSpec) -> None:
+        await semaphore.acquire()
+        await issue(spec)
+
+    def elapsed() -> float:
+        return time.perf_counter() - stats.started
+
+    def schedule() -> Iterator[Tuple[float, RequestSpec]]:
+        # Yield each spec with the start of its pass through the workload, so that
+        # scheduled requests keep their spacing when a trace is replayed repeatedly
+        if duration is None:
+            yield from ((0.0, spec) for spec in specs)
+            return
+        while elapsed() < duration:
+            start = elapsed()
+            yield from ((start, spec) for spec in specs)
+
+    tasks = set()
+    for start, spec in schedule():
+        if spec.at is not None:
+            # Open loop: send at the scheduled time, queueing for a slot if all are busy
+            delay = start + spec.at - elapsed()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if duration is not None and elapsed() >= duration:
+                break
+            task = asyncio.ensure_future(queue(spec))
+        else:
+            # Closed loop: wait for a free slot before creating the next task
+            await semaphore.acquire()
+            if duration is not None and elapsed() >= duration:
+                semaphore.release()
+                break
+            task = asyncio.ensure_future(issue(spec))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return stats
+
+
+def check_regression(
+    summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2
+) -> List[str]:
+    """
+    Compare a run against a baseline run.
+
+    A run regresses when its throughput drops, or its p50/p95/p99 latency (overall
+    or for an endpoint in both runs) rises, by more than the tolerance. The error
+    rate may not rise either.
+
+    Args:
+        summary: LoadStats.summary() of the new run
+        baseline: LoadStats.summary() of the baseline run
+        tolerance: Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        List of regression messages (empty if the run passes)
+    """
+    failures = []
+    if summary["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        failures.append(
+            f"throughput {summary['throughput_rps']:.1f} rps is below baseline "
+            f"{baseline['throughput_rps']:.1f} rps"
+        )
+
+    def error_rate(result):
+        return result["errors"] / result["requests"] if result["requests"] else 0.0
+
+    if error_rate(summary) > error_rate(baseline):
+        failures.append(
+            f"error rate {error_rate(summary):.1%} is above baseline {error_rate(baseline):.1%}"
+        )
+
+    scopes = [("overall", summary["latency_ms"], baseline["latency_ms"])]
+    for endpoint, result in summary["endpoints"].items():
+        if endpoint in baseline.get("endpoints", {}):
+            scopes.append(
+                (endpoint, result["latency_ms"], baseline["endpoints"][endpoint]["latency_ms"])
+            )
+    for scope, latency, base in scopes:
+        for name in PERCENTILES:
+            if base[name] > 0 and latency[name] > base[name] * (1 + tolerance):
+                failures.append(
+                    f"{scope} {name} {latency[name]:.2f} ms is above baseline {base[name]:.2f} ms"
+                )
+    return failures
+
+
+def _free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def spawn_server(
+    port: Optional[int] = None, timeout: float = 30.0, workers: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Start the API in a subprocess and wait until it is healthy.
+
+    Args:
+        port: Port to bind (default: a free port)
+        timeout: Seconds to wait for /health
+        workers: Serve with this many pre-forked workers (api.serve) instead of a
+            single uvicorn process
+
+    Yields:
+        str: Base URL of the server
+    """
+    port = port or _free_port()
+    url = f"http://127.0.0.1:{port}"
+    if workers is None:
+        command = [sys.executable, "-m", "uvicorn", "api.api:app", "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "api.serve", "--host", "127.0.0.1", "--port", str(port)]
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command + ["--log-level", "warning"])
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server did not become healthy within {timeout}s")
+            time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _run_against(url: Optional[str], specs, args) -> LoadStats:
+    """Run the load test against a URL, or against the in-process app if url is None."""
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if url is None:
+        # Imported here so that --url/--spawn runs do not load the app
+        from api.api import app  # pylint: disable=import-outside-toplevel
+
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+    else:
+        client = httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout)
+    async with client:
+        return await run_load(
+            client,
+            specs,
+            concurrency=args.concurrency,
+            use_cache=args.use_cache,
+            warmup=args.warmup,
+            duration=args.duration,
+        )
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Format a run summary as a small text table."""
+    lines = [
+        f"{summary['requests']} requests ({summary['errors']} errors) in "
+        f"{summary['duration_s']:.2f}s: {summary['throughput_rps']:.1f} req/s",
+        f"{'endpoint':<22} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9}"
+        f" {'p99 ms':>9} {'max ms':>9}",
+    ]
+    rows = list(summary["endpoints"].items()) + [("overall", summary)]
+    for name, result in rows:
+        latency = result["latency_ms"]
+        lines.append(
+            f"{name:<22} {result['requests']:>8} {result['errors']:>6} {latency['p50']:>9.2f}"
+            f" {latency['p95']:>9.2f} {latency['p99']:>9.2f} {latency['max']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description="Load test the image API")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running server")
+    target.add_argument("--spawn", action="store_true", help="Start a uvicorn server to test")
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=list(ENDPOINTS),
+        help="Endpoints with optional weights, e.g. /predict:3 /resize:1 /resize/raw:1",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["256:3", "1024:1"],
+        help="Image widths with optional weights, e.g. 256:3 2048:1",
+    )
+    parser.add_argument("--target-size", type=int, default=224, help="Resize target size")
+    parser.add_argument("--trace", help="Replay requests from a JSONL trace instead")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Number of requests")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded warm-up requests")
+    parser.add_argument("--seed", type=int, default=0, help="Workload random seed")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout (s)")
+    parser.add_argument(
+        "--use-cache", action="store_true", help="Allow the API to answer from its result cache"
+    )
+    parser.add_argument("--output", "-o", help="Write the summary to this JSON file")
+    parser.add_argument("--baseline", help="Fail if the run regresses past this JSON summary")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed regression (default: 0.2)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        specs = load_trace(args.trace)
+    else:
+        specs = build_workload(
+            parse_weighted(args.endpoints),
+            parse_weighted(args.sizes, int),
+            args.requests,
+            args.target_size,
+            args.seed,
+        )
+
+    if args.spawn:
+        with spawn_server() as url:
+            stats = asyncio.run(_run_against(url, specs, args))
+    else:
+        stats = asyncio.run(_run_against(args.url, specs, args))
+
+    summary = stats.summary()
+    print(format_summary(summary))
+    # Read the baseline first, so that it can be the same file as the output
+    failures = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = check_regression(summary, json.load(f), args.tolerance)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.output}")
+
+    for failure in failures:
+        print(f"Regression: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Speed/quality trade-off of the resize profiles (see logic.classifier.resize_image).
+
+Each case decodes an encoded synthetic image and resizes it with each profile in
+RESIZE_PROFILES, the way the API and CLI run it. The report gives the latency, the
+speedup over the last profile ("quality" by default), and the PSNR against a
+single full-resolution LANCZOS resample with no draft decode or integer reduction.
+
+Usage:
+    python -m benchmarks.resize
+    python -m benchmarks.resize --cases 4096:224 4096:1024 512:1024 --output resize.json
+"""
+
+import argparse
+import io
+import sys
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+from benchmarks.classifier import (
+    _percentiles_ms,
+    add_output_argument,
+    encode_synthetic,
+    synthetic_image,
+    time_operation,
+    write_results,
+)
+from logic.classifier import RESIZE_PROFILES, resize_image
+
+# (source width, target width) pairs, 4:3 aspect: large, medium and mild downscales,
+# and a 2x upscale
+CASES = ((4096, 224), (4096, 1024), (2048, 1536), (512, 1024))
+
+
+def psnr(image: Image.Image, reference: Image.Image) -> float:
+    """
+    Peak signal-to-noise ratio of an image against a reference, in dB.
+
+    Returns:
+        float: PSNR (infinity for identical images)
+    """
+    difference = np.asarray(image, dtype=np.float64) - np.asarray(reference, dtype=np.float64)
+    mse = float(np.mean(difference**2))
+    return float("inf") if mse == 0 else 10 * np.log10(255.0**2 / mse)
+
+
+def _size(width: int) -> Tuple[int, int]:
+    return width, max(1, width * 3 // 4)
+
+
+def _encode(image: Image.Image, image_format: str) -> bytes:
+    data = encode_synthetic(image, image_format)
+    if data is None:
+        raise ValueError(f"Cannot encode {image.mode} as {image_format}")
+    return data
+
+
+def _inputs(source: int, target: int, image_format: str) -> Tuple[bytes, Image.Image]:
+    """Get the encoded input and the reference image for a case."""
+    data = _encode(synthetic_image(source, "RGB"), image_format)
+    decoded = Image.open(io.BytesIO(data)).convert("RGB")
+    return data, decoded.resize(_size(target), Image.Resampling.LANCZOS)
+
+
+def iter_results(
+    cases: Sequence[Tuple[int, int]] = CASES,
+    profiles: Sequence[str] = RESIZE_PROFILES,
+    image_format: str = "JPEG",
+    min_time: float = 0.5,
+    min_iterations: int = 5,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Time each profile on each case and measure its PSNR.
+
+    Args:
+        cases: (source width, target width) pairs
+        profiles: Profile names from RESIZE_PROFILES
+        image_format: Format the inputs are encoded in
+        min_time: Minimum seconds to time each profile
+        min_iterations: Minimum calls per profile
+
+    Yields:
+        dict: One result per (case, profile)
+    """
+    for source, target in cases:
+        data, reference = _inputs(source, target, image_format)
+        width, height = _size(target)
+        for profile in profiles:
+
+            def run(encoded: bytes, width=width, height=height, profile=profile) -> Image.Image:
+                image = Image.open(io.BytesIO(encoded))
+                return resize_image(image, width, height, profile=profile).convert("RGB")
+
+            samples = time_operation(run, data, min_time, min_iterations)
+            yield {
+                "source": source,
+                "target": target,
+                "scale": round(source / target, 2),
+                "profile": profile,
+                "latency_ms": _percentiles_ms(samples),
+                "psnr_db": round(psnr(run(data), reference), 2),
+            }
+
+
+def format_row(result: Dict[str, Any], base: Optional[Dict[str, Any]] = None) -> str:
+    """Format one result as a table row, with its speedup over a base result."""
+    p50 = result["latency_ms"]["p50"]
+    speedup = base["latency_ms"]["p50"] / p50 if base and p50 else 1.0
+    return (
+        f"{result['source']:>6} {result['target']:>6} {result['scale']:>6.2f}"
+        f" {result['profile']:<9} {p50:>9.2f} {speedup:>7.2f}x {result['psnr_db']:>8.2f}"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the resize profile benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark resize profiles: speed vs PSNR")
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        default=[f"{source}:{target}" for source, target in CASES],
+        help="SOURCE:TARGET widths (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profiles", nargs="+", choices=RESIZE_PROFILES, default=RESIZE_PROFILES, help="Profiles"
+    )
+    parser.add_argument("--format", default="JPEG", type=str.upper, help="Input image format")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per profile")
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    cases = [tuple(int(value) for value in case.split(":")) for case in args.cases]
+    print(
+        f"{'source':>6} {'target':>6} {'scale':>6} {'profile':<9} {'p50 ms':>9}"
+        f" {'speedup':>8} {'PSNR dB':>8}"
+    )
+    results = list(iter_results(cases, args.profiles, args.format, args.min_time))
+    bases = {(result["source"], result["target"]): result for result in results}
+    for result in results:
+        print(format_row(result, bases[result["source"], result["target"]]))
+
+    write_results(args.output, {"results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
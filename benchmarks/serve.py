@@ -0,0 +1,118 @@
+"""Throughput scaling of the pre-fork server with its number of workers.
+
+For each worker count, the API is started with ``python -m api.serve --workers N``
+and the same load-test workload (see benchmarks.loadtest) is sent to it. The
+report shows throughput, p50/p99 latency, and the speedup over the first worker
+count. CPU-bound endpoints should scale close to linearly up to the number of
+cores.
+
+Usage:
+    python -m benchmarks.serve --workers 1 2 4 --requests 400 --concurrency 32
+    python -m benchmarks.serve --endpoints /resize --sizes 2048 --output serve.json
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from benchmarks.classifier import add_output_argument, write_results
+from benchmarks.loadtest import (
+    ENDPOINTS,
+    build_workload,
+    parse_weighted,
+    run_load,
+    spawn_server,
+)
+
+
+async def _measure(url: str, specs, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Run one workload against a server and summarize it."""
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120.0) as client:
+        stats = await run_load(client, specs, concurrency=concurrency, warmup=warmup)
+    return stats.summary()
+
+
+def run_scaling(
+    worker_counts: Sequence[int],
+    specs,
+    concurrency: int = 32,
+    warmup: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    Measure throughput for each worker count.
+
+    Args:
+        worker_counts: Worker counts to start the server with
+        specs: Load-test workload (see benchmarks.loadtest.build_workload)
+        concurrency: Requests in flight
+        warmup: Unrecorded requests sent first, so every worker has warmed up
+
+    Returns:
+        One result per worker count: workers, throughput, latency and errors
+    """
+    results = []
+    for workers in worker_counts:
+        with spawn_server(workers=workers) as url:
+            summary = asyncio.run(_measure(url, specs, concurrency, warmup))
+        results.append(
+            {
+                "workers": workers,
+                "requests": summary["requests"],
+                "errors": summary["errors"],
+                "throughput_rps": summary["throughput_rps"],
+                "latency_ms": summary["latency_ms"],
+            }
+        )
+    return results
+
+
+def format_results(results: Sequence[Dict[str, Any]]) -> str:
+    """Format scaling results as a table, with the speedup over the first row."""
+    lines = [
+        f"{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>6} {'speedup':>8}"
+    ]
+    base = results[0]["throughput_rps"] if results else 0.0
+    for result in results:
+        latency = result["latency_ms"]
+        speedup = result["throughput_rps"] / base if base else float("nan")
+        lines.append(
+            f"{result['workers']:>7} {result['throughput_rps']:>9.1f} {latency['p50']:>9.2f}"
+            f" {latency['p99']:>9.2f} {result['errors']:>6} {speedup:>7.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the scaling benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark api.serve throughput per worker count")
+    parser.add_argument(
+        "--workers", nargs="+", type=int, default=[1, 2, 4], help="Worker counts (default: 1 2 4)"
+    )
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=["/resize"],
+        help=f"Endpoints with optional weights, out of {', '.join(ENDPOINTS)}",
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", default=["1024"], help="Image widths with optional weights"
+    )
+    parser.add_argument("--requests", "-n", type=int, default=400, help="Requests per run")
+    parser.add_argument("--concurrency", "-c", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--warmup", type=int, default=20, help="Unrecorded warm-up requests")
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    specs = build_workload(
+        parse_weighted(args.endpoints), parse_weighted(args.sizes, int), args.requests
+    )
+    results = run_scaling(args.workers, specs, args.concurrency, args.warmup)
+    write_results(args.output, {"results": results}, format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
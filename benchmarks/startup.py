@@ -0,0 +1,174 @@
+"""Startup time of the CLI.
+
+Each run starts a fresh interpreter with ``-X importtime`` and imports cli.cli.
+The import time is the smallest of several runs, since that run was least
+disturbed by other load. The report lists the slowest imports of that run and
+any heavy modules (numpy, PIL, logic.classifier) that were loaded, which should
+be none. It also gives the wall-clock time of ``python -m cli.cli --help``. With
+--budget-ms the exit status is 1 if the import takes longer than the budget.
+tests/test_startup.py enforces IMPORT_BUDGET_MS the same way.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20 --budget-ms 50 --output startup.json
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.classifier import add_output_argument, write_results
+
+# Module whose import time is measured, and the command that is timed end to end
+MODULE = "cli.cli"
+COMMAND = ("-m", "cli.cli", "--help")
+
+# Modules that only the commands that need them may import
+HEAVY_MODULES = ("numpy", "PIL", "logic.classifier")
+
+# Budget for importing cli.cli (about 100ms when it imported numpy and PIL eagerly)
+IMPORT_BUDGET_MS = 60.0
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _clean_env() -> Dict[str, str]:
+    """Get an environment without coverage hooks, which would slow down imports."""
+    return {name: value for name, value in os.environ.items() if not name.startswith("COV_CORE_")}
+
+
+def parse_importtime(report: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse the output of ``python -X importtime``.
+
+    Args:
+        report: stderr of the interpreter
+
+    Returns:
+        dict mapping module name to (self ms, cumulative ms)
+    """
+    modules = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules[fields[2].strip()] = (int(fields[0]) / 1000, int(fields[1]) / 1000)
+    return modules
+
+
+def _import_once(module: str) -> Tuple[Dict[str, Tuple[float, float]], List[str]]:
+    """Import a module in a fresh interpreter, returning its import times and heavy modules."""
+    code = (
+        f"import sys; import {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=_clean_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr), result.stdout.split()
+
+
+def measure_import(module: str = MODULE, repeat: int = 5, top: int = 10) -> Dict[str, Any]:
+    """
+    Measure the import time of a module in fresh interpreters.
+
+    Args:
+        module: Module to import
+        repeat: Number of interpreters to start
+        top: Number of slowest imports (by their own time) to report
+
+    Returns:
+        dict with the minimum and median import time, the slowest imports of the
+        fastest run, and the heavy modules that were loaded
+    """
+    runs = [_import_once(module) for _ in range(repeat)]
+    times = [modules[module][1] for modules, _ in runs]
+    fastest, heavy = runs[times.index(min(times))]
+    slowest = sorted(fastest.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        "module": module,
+        "import_ms": round(min(times), 2),
+        "import_ms_median": round(statistics.median(times), 2),
+        "heavy_modules": heavy,
+        "slowest": [{"module": name, "self_ms": round(own, 2)} for name, (own, _) in slowest],
+    }
+
+
+def measure_command(args: Sequence[str] = COMMAND, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Measure the wall-clock time of running the interpreter with some arguments.
+
+    Returns:
+        dict with the command and its minimum and median time in milliseconds
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            cwd=ROOT,
+            env=_clean_env(),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "command": " ".join(["python", *args]),
+        "wall_ms": round(min(times), 2),
+        "wall_ms_median": round(statistics.median(times), 2),
+    }
+
+
+def format_report(imports: Dict[str, Any], command: Dict[str, Any]) -> str:
+    """Format startup measurements as text."""
+    lines = [
+        f"import {imports['module']}: {imports['import_ms']:.1f}ms "
+        f"(median {imports['import_ms_median']:.1f}ms)",
+        f"{command['command']}: {command['wall_ms']:.1f}ms "
+        f"(median {command['wall_ms_median']:.1f}ms)",
+        f"heavy modules loaded: {', '.join(imports['heavy_modules']) or 'none'}",
+        "slowest imports (self time):",
+    ]
+    lines += [f"  {entry['self_ms']:>7.2f}ms  {entry['module']}" for entry in imports["slowest"]]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the startup benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time")
+    parser.add_argument("--repeat", "-n", type=int, default=10, help="Interpreters per measurement")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help=f"Fail if importing {MODULE} takes longer (e.g. {IMPORT_BUDGET_MS:g})",
+    )
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+
+    imports = measure_import(repeat=args.repeat)
+    command = measure_command(repeat=args.repeat)
+    print(format_report(imports, command))
+
+    write_results(args.output, {"import": imports, "command": command})
+
+    if args.budget_ms is not None and imports["import_ms"] > args.budget_ms:
+        print(f"Over budget: {imports['import_ms']:.1f}ms > {args.budget_ms:g}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""Parallel batch processing helpers for the CLI.
+
+Inputs can be directories (walked recursively), glob patterns or file lists. The
+work is spread over a process pool, and outputs mirror the input tree in an output
+directory. Each task catches its own errors, so one bad file never aborts a run.
+"""
+
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+from logic.classifier import (
+    DEFAULT_RESIZE_PROFILE,
+    convert_to_rgb,
+    normalize_image,
+    predict_class,
+    preprocess_image,
+    resize_image,
+)
+
+# File extensions picked up when walking directories
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+# Result of one task: (input path, success, message)
+TaskResult = Tuple[str, bool, str]
+
+
+def _glob_base(pattern: str) -> Path:
+    """Get the longest leading part of a glob pattern that has no wildcards."""
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+
+def iter_image_files(directory: Path) -> Iterator[Path]:
+    """
+    Walk a directory tree and yield image files in a stable order.
+
+    Args:
+        directory: Root directory
+
+    Yields:
+        Path: Image file paths
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if Path(name).suffix.lower() in IMAGE_EXTENSIONS:
+                yield Path(root) / name
+
+
+def collect_inputs(inputs: Iterable[str], file_list: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Expand directories, globs and file lists into input files.
+
+    Each file is paired with its path relative to the input it came from. This
+    relative path is used to mirror the input tree in the output directory.
+    Files given directly or in the file list are taken relative to the deepest
+    directory that holds all of them, so a/img.jpg and b/img.jpg stay apart.
+
+    Args:
+        inputs: Directories, glob patterns or file paths
+        file_list: Optional text file with one path per line ("-" for stdin)
+
+    Returns:
+        List of (path, relative path) tuples
+    """
+    items: List[Tuple[str, Optional[str]]] = []
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            items.extend(
+                (str(file), str(file.relative_to(path))) for file in iter_image_files(path)
+            )
+        elif glob.has_magic(entry):
+            base = _glob_base(entry)
+            for match in sorted(glob.glob(entry, recursive=True)):
+                if Path(match).is_file():
+                    items.append((match, str(Path(match).relative_to(base))))
+        else:
+            items.append((entry, None))
+
+    if file_list is not None:
+        if file_list == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            lines = Path(file_list).read_text(encoding="utf-8").splitlines()
+        items.extend((line.strip(), None) for line in lines if line.strip())
+
+    # Single files: relative to their common parent directory
+    files = [os.path.abspath(path) for path, relpath in items if relpath is None]
+    if files:
+        base = os.path.commonpath([os.path.dirname(file) for file in files])
+    return [
+        (path, relpath if relpath is not None else os.path.relpath(os.path.abspath(path), base))
+        for path, relpath in items
+    ]
+
+
+def find_collisions(items: Iterable[Tuple[str, str]]) -> List[str]:
+    """
+    Find relative paths shared by several inputs, whose outputs would overwrite each other.
+
+    Args:
+        items: (path, relative path) tuples from collect_inputs
+
+    Returns:
+        Sorted list of the relative paths that occur more than once
+    """
+    counts: Dict[str, int] = {}
+    for _, relpath in items:
+        counts[relpath] = counts.get(relpath, 0) + 1
+    return sorted(relpath for relpath, count in counts.items() if count > 1)
+
+
+def _output_path(output_dir: str, relpath: str) -> Path:
+    """Get the mirrored output path for an input, creating its parent directory."""
+    output_path = Path(output_dir) / relpath
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    return output_path
+
+
+# Task functions run in worker processes, so they must stay module-level (picklable).
+
+
+def predict_task(item: Tuple[str, str]) -> TaskResult:
+    """Predict the class of one image."""
+    path, _ = item
+    try:
+        with Image.open(path) as image:
+            return path, True, predict_class(image)
+    except Exception as e:  # pylint: disable=broad-except
+        return path, False, str(e)
+
+
+def info_task(item: Tuple[str, str]) -> TaskResult:
+    """Get the size and mode of one image."""
+    path, _ = item
+    try:
+        with Image.open(path) as image:
+            width, height, mode = normalize_image(image)
+        return path, True, f"{width}x{height} {mode}"
+    except Exception as e:  # pylint: disable=broad-except
+        return path, False, str(e)
+
+
+def resize_task(
+    item: Tuple[str, str],
+    width: int,
+    height: int,
+    reducing_gap: float,
+    output_dir: str,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> TaskResult:
+    """Resize one image into the output directory."""
+    path, relpath = item
+    try:
+        with Image.open(path) as image:
+            resized = resize_image(image, width, height, reducing_gap, profile)
+        output_path = _output_path(output_dir, relpath)
+        resized.save(output_path)
+        return path, True, str(output_path)
+    except Exception as e:  # pylint: disable=broad-except
+        return path, False, str(e)
+
+
+def preprocess_task(
+    item: Tuple[str, str],
+    width: int,
+    height: int,
+    reducing_gap: float,
+    output_dir: str,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> TaskResult:
+    """Preprocess one image into the output directory."""
+    path, relpath = item
+    try:
+        with Image.open(path) as image:
+            preprocessed = preprocess_image(image, width, height, reducing_gap, profile)
+        output_path = _output_path(output_dir, relpath)
+        preprocessed.save(output_path)
+        return path, True, str(output_path)
+    except Exception as e:  # pylint: disable=broad-except
+        return path, False, str(e)
+
+
+def to_rgb_task(item: Tuple[str, str], output_dir: str) -> TaskResult:
+    """Convert one image to RGB into the output directory."""
+    path, relpath = item
+    try:
+        with Image.open(path) as image:
+            rgb_image = convert_to_rgb(image)
+            output_path = _output_path(output_dir, relpath)
+            rgb_image.save(output_path)
+        return path, True, str(output_path)
+    except Exception as e:  # pylint: disable=broad-except
+        return path, False, str(e)
+
+
+def run_batch(
+    task: Callable[..., TaskResult],
+    items: List[Tuple[str, str]],
+    jobs: int = 1,
+    **options,
+) -> Iterator[TaskResult]:
+    """
+    Run a task over many inputs, in order, on a process pool.
+
+    Args:
+        task: Task function called as task(item, **options)
+        items: (path, relative path) tuples from collect_inputs
+        jobs: Number of worker processes; 1 runs in the current process
+        **options: Keyword arguments passed to the task
+
+    Yields:
+        TaskResult: (path, success, message) for each input, in input order
+    """
+    if jobs <= 0:
+        raise ValueError("Jobs must be a positive integer")
+
+    func = partial(task, **options) if options else task
+    if jobs == 1 or len(items) <= 1:
+        yield from map(func, items)
+        return
+
+    # Larger chunks amortize inter-process overhead; keep several per worker for balance
+    chunksize = max(1, min(64, len(items) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(func, items, chunksize=chunksize)
+
+
+class Throughput:
+    """Track processed/failed counts and the rate of a batch run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.failed = 0
+
+    def add(self, success: bool) -> None:
+        """Record one finished input."""
+        self.processed += 1
+        if not success:
+            self.failed += 1
+
+    def summary(self) -> str:
+        """Get a one-line summary of the run."""
+        elapsed = time.perf_counter() - self.started
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        return (
+            f"Processed {self.processed} files ({self.failed} failed) "
+            f"in {elapsed:.2f}s ({rate:.1f} files/s)"
+        )
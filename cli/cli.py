@@ -1,18 +1,39 @@
 #!/usr/bin/env python3
-"""Command Line Interface for image classification."""
+"""Command Line Interface for image classification.
 
+numpy, PIL and logic.classifier take most of the CLI's startup time, so they are
+only imported inside the commands that use them. `--help`, and commands that fail
+argument validation, never load them (see benchmarks/startup.py).
+"""
+
+# pylint: disable=import-outside-toplevel
+import json
+import os
+import sys
 import click
-from PIL import Image
 from pathlib import Path
-from logic.classifier import (
-    predict_class,
-    resize_image,
-    preprocess_image,
-    convert_to_rgb,
-    normalize_image,
+from logic.defaults import (
+    DEFAULT_FIT,
+    DEFAULT_REDUCING_GAP,
+    DEFAULT_RESIZE_PROFILE,
+    FIT_MODES,
+    IMAGE_FORMATS,
+    RESIZE_PROFILES,
+    TENSOR_DTYPES,
 )
 
 
+def resize_profile_option(func):
+    """Add the --profile option to a command."""
+    return click.option(
+        "--profile",
+        type=click.Choice(RESIZE_PROFILES),
+        default=DEFAULT_RESIZE_PROFILE,
+        show_default=True,
+        help="Resize speed/quality profile (resampling filter and reduction strategy)",
+    )(func)
+
+
 @click.group()
 def cli():
     """Image Classification CLI - A tool for image preprocessing and classification."""
@@ -27,6 +48,9 @@ def predict(image_path):
 
     IMAGE_PATH: Path to the image file
     """
+    from PIL import Image
+    from logic.classifier import predict_class
+
     try:
         image = Image.open(image_path)
         predicted_class = predict_class(image)
@@ -41,7 +65,13 @@ def predict(image_path):
 @click.argument("width", type=int)
 @click.argument("height", type=int)
 @click.argument("output_path", type=click.Path())
-def resize(image_path, width, height, output_path):
+@click.option(
+    "--reducing-gap",
+    default=DEFAULT_REDUCING_GAP,
+    help=f"Two-step downscaling quality knob, 0 disables (default: {DEFAULT_REDUCING_GAP})",
+)
+@resize_profile_option
+def resize(image_path, width, height, output_path, reducing_gap, profile):
     """
     Resize an image to specified dimensions.
 
@@ -50,9 +80,12 @@ def resize(image_path, width, height, output_path):
     HEIGHT: Target height in pixels
     OUTPUT_PATH: Path to save the resized image
     """
+    from PIL import Image
+    from logic.classifier import resize_image
+
     try:
         image = Image.open(image_path)
-        resized = resize_image(image, width, height)
+        resized = resize_image(image, width, height, reducing_gap, profile)
         resized.save(output_path)
         click.echo(f"Image resized to {width}x{height} and saved to {output_path}")
     except Exception as e:
@@ -60,21 +93,105 @@ def resize(image_path, width, height, output_path):
         raise click.Abort()
 
 
+@cli.command()
+@click.argument("image_path", type=click.Path(exists=True))
+@click.argument("output_dir", type=click.Path(file_okay=False))
+@click.argument("sizes", nargs=-1, required=True)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(IMAGE_FORMATS, case_sensitive=False),
+    default=None,
+    help="Output format (default: that of IMAGE_PATH's extension)",
+)
+@click.option(
+    "--reducing-gap",
+    default=DEFAULT_REDUCING_GAP,
+    help=f"Two-step downscaling quality knob, 0 disables (default: {DEFAULT_REDUCING_GAP})",
+)
+@resize_profile_option
+def thumbnails(image_path, output_dir, sizes, output_format, reducing_gap, profile):
+    """
+    Resize an image to several sizes from one decode.
+
+    Each size is resampled from the next larger one. The outputs are saved as
+    OUTPUT_DIR/<name>_<width>x<height>.<extension>.
+
+    IMAGE_PATH: Path to the input image file
+    OUTPUT_DIR: Directory to save the resized images in
+    SIZES: WIDTHxHEIGHT, or N to scale the longer side to N pixels (e.g. 512 256 128 64)
+    """
+    from PIL import Image
+    from logic.classifier import parse_size, resize_cascade
+
+    try:
+        source = Path(image_path)
+        suffix = f".{output_format.lower()}" if output_format else source.suffix
+        if suffix == ".jpeg":
+            suffix = ".jpg"
+        image = Image.open(image_path)
+        targets = [parse_size(spec, image.size) for spec in sizes]
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        for (width, height), thumbnail in zip(
+            targets, resize_cascade(image, targets, reducing_gap, profile)
+        ):
+            output_path = Path(output_dir) / f"{source.stem}_{width}x{height}{suffix}"
+            thumbnail.save(output_path)
+            click.echo(f"Image resized to {width}x{height} and saved to {output_path}")
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        raise click.Abort()
+
+
 @cli.command()
 @click.argument("image_path", type=click.Path(exists=True))
 @click.argument("output_path", type=click.Path())
 @click.option("--width", default=224, help="Target width (default: 224)")
 @click.option("--height", default=224, help="Target height (default: 224)")
-def preprocess(image_path, output_path, width, height):
+@click.option(
+    "--reducing-gap",
+    default=DEFAULT_REDUCING_GAP,
+    help=f"Two-step downscaling quality knob, 0 disables (default: {DEFAULT_REDUCING_GAP})",
+)
+@click.option(
+    "--dtype",
+    type=click.Choice(TENSOR_DTYPES),
+    default="float32",
+    help="Tensor dtype for .npy output: float32 (normalized NCHW) or uint8 (NHWC)",
+)
+@resize_profile_option
+@click.option(
+    "--fit",
+    type=click.Choice(FIT_MODES),
+    default=DEFAULT_FIT,
+    show_default=True,
+    help="How to fit the aspect ratio: squash, center crop (cover) or letterbox (contain)",
+)
+def preprocess(image_path, output_path, width, height, reducing_gap, dtype, profile, fit):
     """
     Preprocess an image (convert to RGB and resize).
 
     IMAGE_PATH: Path to the input image file
-    OUTPUT_PATH: Path to save the preprocessed image
+    OUTPUT_PATH: Path to save the preprocessed image; a .npy path saves a
+    batch-of-one model input tensor instead
     """
+    import numpy as np
+    from PIL import Image
+    from logic.classifier import images_to_tensor, preprocess_image
+
     try:
         image = Image.open(image_path)
-        preprocessed = preprocess_image(image, width, height)
+        if Path(output_path).suffix.lower() == ".npy":
+            tensor = images_to_tensor(
+                [image], width, height, dtype, reducing_gap=reducing_gap, profile=profile, fit=fit
+            )
+            np.save(output_path, tensor)
+            click.echo(
+                f"Image preprocessed ({dtype} tensor {tuple(tensor.shape)}) "
+                f"and saved to {output_path}"
+            )
+            return
+        preprocessed = preprocess_image(image, width, height, reducing_gap, profile, fit)
         preprocessed.save(output_path)
         click.echo(f"Image preprocessed (RGB, {width}x{height}) and saved to {output_path}")
     except Exception as e:
@@ -82,6 +199,43 @@ def preprocess(image_path, output_path, width, height):
         raise click.Abort()
 
 
+@cli.command()
+@click.argument("image_path", type=click.Path(exists=True))
+@click.argument("output_path", type=click.Path())
+@click.argument("spec")
+@click.option("--explain", is_flag=True, help="Print the compiled plan")
+def pipeline(image_path, output_path, spec, explain):
+    """
+    Run a declarative preprocessing pipeline on an image.
+
+    IMAGE_PATH: Path to the input image file
+    OUTPUT_PATH: Path to save the processed image
+    SPEC: JSON list of ops, or @path of a file holding one, e.g.
+    '[{"op": "rgb"}, {"op": "resize_shorter", "size": 256}, {"op": "center_crop", "size": 224}]'
+    """
+    from PIL import Image
+    from logic.pipeline import compile_pipeline
+
+    try:
+        if spec.startswith("@"):
+            with open(spec[1:], encoding="utf-8") as f:
+                spec = f.read()
+        image = Image.open(image_path)
+        plan = compile_pipeline(spec, image.size, image.mode)
+        if explain:
+            for step in plan.describe() or ["(no-op)"]:
+                click.echo(f"  {step}")
+        processed = plan.run(image)
+        processed.save(output_path)
+        width, height = processed.size
+        click.echo(
+            f"Image processed ({processed.mode}, {width}x{height}) and saved to {output_path}"
+        )
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        raise click.Abort()
+
+
 @cli.command()
 @click.argument("image_path", type=click.Path(exists=True))
 @click.argument("output_path", type=click.Path())
@@ -92,6 +246,9 @@ def to_rgb(image_path, output_path):
     IMAGE_PATH: Path to the input image file
     OUTPUT_PATH: Path to save the RGB image
     """
+    from PIL import Image
+    from logic.classifier import convert_to_rgb
+
     try:
         image = Image.open(image_path)
         rgb_image = convert_to_rgb(image)
@@ -110,6 +267,9 @@ def info(image_path):
 
     IMAGE_PATH: Path to the image file
     """
+    from PIL import Image
+    from logic.classifier import normalize_image
+
     try:
         image = Image.open(image_path)
         width, height, mode = normalize_image(image)
@@ -121,5 +281,205 @@ def info(image_path):
         raise click.Abort()
 
 
+@cli.command()
+@click.argument("inputs", nargs=-1, required=True)
+@click.option("--jobs", "-j", default=32, help="Number of threads (default: 32)")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(allow_dash=True),
+    default="-",
+    help="JSONL output file (default: stdout)",
+)
+@click.option("--summary/--no-summary", default=True, help="Print an aggregate summary to stderr")
+def scan(inputs, jobs, output, summary):
+    """
+    Scan image metadata over large datasets without decoding pixels.
+
+    Writes one JSON record per image (path, format, width, height, mode, bytes,
+    mtime), in input order. Then prints a summary with mode and format
+    histograms and size percentiles.
+
+    INPUTS: Directories, glob patterns or image paths
+    """
+    if jobs <= 0:
+        click.echo("Error: Jobs must be a positive integer", err=True)
+        raise click.Abort()
+
+    from cli import scan as scan_jobs
+
+    stats = scan_jobs.ScanSummary()
+    with click.open_file(output, "w") as stream:
+        for record in scan_jobs.scan(scan_jobs.iter_scan_paths(inputs), jobs):
+            stream.write(json.dumps(record) + "\n")
+            stats.add(record)
+
+    if summary:
+        click.echo(json.dumps(stats.to_dict(), indent=2), err=True)
+
+
+@cli.group()
+def batch():
+    """
+    Process many images in parallel.
+
+    Each command takes directories (walked recursively), glob patterns or image
+    paths, plus an optional --file-list. Outputs mirror the input tree in
+    --output-dir. Failed files are reported without aborting the run.
+    """
+    pass
+
+
+def batch_inputs(func):
+    """Add the shared batch arguments and options to a command."""
+    func = click.option(
+        "--jobs",
+        "-j",
+        default=os.cpu_count() or 1,
+        show_default="CPU count",
+        help="Number of worker processes",
+    )(func)
+    func = click.option(
+        "--file-list",
+        type=click.Path(allow_dash=True),
+        help="Text file with one image path per line ('-' for stdin)",
+    )(func)
+    return click.argument("inputs", nargs=-1)(func)
+
+
+def _run_batch_command(task, inputs, file_list, jobs, echo_results=False, **options):
+    """
+    Run a batch task with a progress bar, per-file errors and a throughput summary.
+
+    task is the name of a task function in cli.batch, which is imported here.
+    """
+    from cli import batch as batch_jobs
+
+    items = batch_jobs.collect_inputs(inputs, file_list)
+    if not items:
+        click.echo("Error: No input images found", err=True)
+        raise click.Abort()
+    if jobs <= 0:
+        click.echo("Error: Jobs must be a positive integer", err=True)
+        raise click.Abort()
+    collisions = batch_jobs.find_collisions(items) if options.get("output_dir") else []
+    if collisions:
+        click.echo(
+            f"Error: Several inputs map to the same output file: {', '.join(collisions)}",
+            err=True,
+        )
+        raise click.Abort()
+
+    throughput = batch_jobs.Throughput()
+    results = batch_jobs.run_batch(getattr(batch_jobs, task), items, jobs, **options)
+    with click.progressbar(
+        results, length=len(items), label="Processing", file=sys.stderr
+    ) as progress:
+        for path, success, message in progress:
+            throughput.add(success)
+            if not success:
+                click.echo(f"Error: {path}: {message}", err=True)
+            elif echo_results:
+                click.echo(f"{path}: {message}")
+
+    click.echo(throughput.summary(), err=True)
+    if throughput.failed:
+        raise SystemExit(1)
+
+
+@batch.command("predict")
+@batch_inputs
+def batch_predict(inputs, file_list, jobs):
+    """
+    Predict the class of many images.
+
+    INPUTS: Directories, glob patterns or image paths
+    """
+    _run_batch_command("predict_task", inputs, file_list, jobs, echo_results=True)
+
+
+@batch.command("info")
+@batch_inputs
+def batch_info(inputs, file_list, jobs):
+    """
+    Get size and mode information about many images.
+
+    INPUTS: Directories, glob patterns or image paths
+    """
+    _run_batch_command("info_task", inputs, file_list, jobs, echo_results=True)
+
+
+@batch.command("resize")
+@batch_inputs
+@click.option("--output-dir", "-o", required=True, type=click.Path(), help="Output directory")
+@click.option("--width", type=int, required=True, help="Target width in pixels")
+@click.option("--height", type=int, required=True, help="Target height in pixels")
+@click.option(
+    "--reducing-gap",
+    default=DEFAULT_REDUCING_GAP,
+    help=f"Two-step downscaling quality knob, 0 disables (default: {DEFAULT_REDUCING_GAP})",
+)
+@resize_profile_option
+def batch_resize(inputs, file_list, jobs, output_dir, width, height, reducing_gap, profile):
+    """
+    Resize many images to specified dimensions.
+
+    INPUTS: Directories, glob patterns or image paths
+    """
+    _run_batch_command(
+        "resize_task",
+        inputs,
+        file_list,
+        jobs,
+        width=width,
+        height=height,
+        reducing_gap=reducing_gap,
+        output_dir=output_dir,
+        profile=profile,
+    )
+
+
+@batch.command("preprocess")
+@batch_inputs
+@click.option("--output-dir", "-o", required=True, type=click.Path(), help="Output directory")
+@click.option("--width", default=224, help="Target width (default: 224)")
+@click.option("--height", default=224, help="Target height (default: 224)")
+@click.option(
+    "--reducing-gap",
+    default=DEFAULT_REDUCING_GAP,
+    help=f"Two-step downscaling quality knob, 0 disables (default: {DEFAULT_REDUCING_GAP})",
+)
+@resize_profile_option
+def batch_preprocess(inputs, file_list, jobs, output_dir, width, height, reducing_gap, profile):
+    """
+    Preprocess many images (convert to RGB and resize).
+
+    INPUTS: Directories, glob patterns or image paths
+    """
+    _run_batch_command(
+        "preprocess_task",
+        inputs,
+        file_list,
+        jobs,
+        width=width,
+        height=height,
+        reducing_gap=reducing_gap,
+        output_dir=output_dir,
+        profile=profile,
+    )
+
+
+@batch.command("to-rgb")
+@batch_inputs
+@click.option("--output-dir", "-o", required=True, type=click.Path(), help="Output directory")
+def batch_to_rgb(inputs, file_list, jobs, output_dir):
+    """
+    Convert many images to RGB mode.
+
+    INPUTS: Directories, glob patterns or image paths
+    """
+    _run_batch_command("to_rgb_task", inputs, file_list, jobs, output_dir=output_dir)
+
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,185 @@
+"""Fast metadata scanner for large image datasets.
+
+Files are probed on a thread pool and only their headers are read, never their
+pixels. Records stream out in input order through a bounded window of in-flight
+probes. Summary statistics use fixed-size reservoirs, so memory use stays flat
+no matter how many files are scanned.
+"""
+
+import glob
+import os
+import random
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from PIL import Image
+from cli.batch import iter_image_files
+from logic.classifier import normalize_image
+
+# Number of samples kept per statistic for percentile estimates
+RESERVOIR_SIZE = 10000
+
+
+def iter_scan_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """
+    Lazily expand directories and glob patterns into file paths.
+
+    Args:
+        inputs: Directories, glob patterns or file paths
+
+    Yields:
+        str: File paths
+    """
+    for entry in inputs:
+        if Path(entry).is_dir():
+            for path in iter_image_files(Path(entry)):
+                yield str(path)
+        elif glob.has_magic(entry):
+            for match in glob.iglob(entry, recursive=True):
+                if os.path.isfile(match):
+                    yield match
+        else:
+            yield entry
+
+
+def probe_file(path: str) -> Dict[str, Any]:
+    """
+    Read an image file's header and file metadata.
+
+    Args:
+        path: Image file path
+
+    Returns:
+        dict with path, format, width, height, mode, bytes and mtime, or with path
+        and error if the file could not be read
+    """
+    try:
+        stat = os.stat(path)
+        with Image.open(path) as image:
+            width, height, mode = normalize_image(image)
+            image_format = image.format
+        return {
+            "path": path,
+            "format": image_format,
+            "width": width,
+            "height": height,
+            "mode": mode,
+            "bytes": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+    except Exception as e:  # pylint: disable=broad-except
+        return {"path": path, "error": str(e)}
+
+
+def scan(paths: Iterable[str], jobs: int = 32) -> Iterator[Dict[str, Any]]:
+    """
+    Probe files on a thread pool, yielding records in input order.
+
+    At most a few probes per thread are in flight at once, so memory use does not
+    grow with the number of files.
+
+    Args:
+        paths: File paths (may be a lazy iterator)
+        jobs: Number of threads
+
+    Yields:
+        dict: One record per file (see probe_file)
+    """
+    if jobs <= 0:
+        raise ValueError("Jobs must be a positive integer")
+
+    window = jobs * 4
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="scan") as executor:
+        pending = deque()
+        for path in paths:
+            pending.append(executor.submit(probe_file, path))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class Reservoir:
+    """Fixed-size uniform sample of a stream, for approximate percentiles."""
+
+    def __init__(self, size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.size = size
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.samples: List[float] = []
+        self._random = random.Random(seed)
+
+    def add(self, value: float) -> None:
+        """Add one value to the stream."""
+        self.count += 1
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = self._random.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+    def percentiles(self) -> Dict[str, Any]:
+        """Get min, p50, p90, p99 and max (exact min/max, sampled percentiles)."""
+        ordered = sorted(self.samples)
+
+        def pick(fraction):
+            if not ordered:
+                return None
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+        return {
+            "min": self.minimum,
+            "p50": pick(0.50),
+            "p90": pick(0.90),
+            "p99": pick(0.99),
+            "max": self.maximum,
+        }
+
+
+class ScanSummary:
+    """Aggregate statistics over scan records."""
+
+    def __init__(self):
+        self.files = 0
+        self.errors = 0
+        self.total_bytes = 0
+        self.modes = Counter()
+        self.formats = Counter()
+        self.widths = Reservoir(seed=1)
+        self.heights = Reservoir(seed=2)
+        self.megapixels = Reservoir(seed=3)
+        self.sizes = Reservoir(seed=4)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Add one scan record."""
+        self.files += 1
+        if "error" in record:
+            self.errors += 1
+            return
+        self.total_bytes += record["bytes"]
+        self.modes[record["mode"]] += 1
+        self.formats[record["format"]] += 1
+        self.widths.add(record["width"])
+        self.heights.add(record["height"])
+        self.megapixels.add(record["width"] * record["height"] / 1e6)
+        self.sizes.add(record["bytes"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the summary as a JSON-serializable dict."""
+        return {
+            "files": self.files,
+            "errors": self.errors,
+            "total_bytes": self.total_bytes,
+            "modes": dict(self.modes.most_common()),
+            "formats": dict(self.formats.most_common()),
+            "width": self.widths.percentiles(),
+            "height": self.heights.percentiles(),
+            "megapixels": self.megapixels.percentiles(),
+            "bytes": self.sizes.percentiles(),
+        }
@@ -0,0 +1 @@
+"""Client package for the image classification API."""
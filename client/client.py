@@ -0,0 +1,483 @@
+"""Python client for the image classification API.
+
+ImageClient (blocking) and AsyncImageClient (asyncio) keep one httpx connection
+pool each, so consecutive requests reuse keep-alive connections. Before upload,
+images are downscaled to just cover the model input size and encoded once. A
+photo of several megabytes is then sent as a few kilobytes. Results are cached by
+the hash of the prepared upload, and identical requests that are in flight at the
+same time share one API call. Connection errors and 429/502/503/504 responses
+(e.g. while a free-tier deployment cold-starts) are retried with exponential
+backoff. With hash_lookup, the API's result cache is asked for the hash of the
+upload first, and the image is only uploaded if the API has no result for it.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import httpx
+from PIL import Image
+
+# Model input size of the API (MODEL_INPUT_SIZE in api.api)
+MODEL_INPUT_SIZE = (224, 224)
+
+# Formats that are uploaded as they are when no downscale is needed
+UPLOAD_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# JPEG quality used when an image has to be re-encoded for upload
+UPLOAD_QUALITY = 90
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CONCURRENCY = 8
+
+# Responses worth retrying: rate limiting and an unavailable (e.g. starting) server
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+ImageInput = Union[str, "os.PathLike[str]", bytes, Image.Image]
+
+
+class APIError(Exception):
+    """An error response from the API."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class PreparedImage(NamedTuple):
+    """An image ready for upload."""
+
+    data: bytes
+    filename: str
+    media_type: str
+    digest: str
+
+
+def prepare_image(
+    image: ImageInput,
+    size: Optional[Tuple[int, int]] = MODEL_INPUT_SIZE,
+    quality: int = UPLOAD_QUALITY,
+) -> PreparedImage:
+    """
+    Downscale and encode an image for upload.
+
+    Images larger than ``size`` are downscaled, keeping their aspect ratio, until
+    they just cover it; the API resizes them to the exact model input size. JPEG
+    files are decoded at reduced size (draft mode). Encoded JPEG, PNG or WebP files
+    that need no downscale are sent unchanged.
+
+    Args:
+        image: File path, encoded image bytes or PIL Image object
+        size: Size the upload must cover, or None to send the full resolution
+        quality: JPEG quality for re-encoded images
+
+    Returns:
+        PreparedImage: (encoded bytes, filename, media type, SHA-256 hex digest)
+    """
+    raw = None
+    filename = "image"
+    if isinstance(image, Image.Image):
+        source = image
+    else:
+        if isinstance(image, bytes):
+            raw = image
+        else:
+            filename = os.path.basename(os.fspath(image))
+            with open(image, "rb") as f:
+                raw = f.read()
+        source = Image.open(io.BytesIO(raw))
+
+    width, height = source.size
+    scale = max(size[0] / width, size[1] / height) if size else 1.0
+    if scale >= 1.0 and raw is not None and source.format in UPLOAD_FORMATS:
+        data, media_type = raw, UPLOAD_FORMATS[source.format]
+    else:
+        if scale < 1.0:
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+            source.draft("RGB", target)
+            source = source.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        if source.mode not in ("RGB", "L"):
+            source = source.convert("RGB")
+        buffer = io.BytesIO()
+        source.save(buffer, format="JPEG", quality=quality)
+        data, media_type = buffer.getvalue(), "image/jpeg"
+        filename = os.path.splitext(filename)[0] + ".jpg"
+
+    return PreparedImage(data, filename, media_type, hashlib.sha256(data).hexdigest())
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Get the delay requested by a Retry-After header in seconds, if any."""
+    if response is None:
+        return None
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _check(response: httpx.Response) -> httpx.Response:
+    """Raise APIError for an error response."""
+    if response.status_code >= 400:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise APIError(response.status_code, detail)
+    return response
+
+
+class _ClientBase:
+    """Configuration, upload preparation, retry delays and the result cache."""
+
+    def __init__(
+        self,
+        retries: int,
+        backoff: float,
+        downscale: Optional[Tuple[int, int]],
+        cache_size: int,
+        hash_lookup: bool,
+    ):
+        if retries < 0:
+            raise ValueError("Retries must not be negative")
+        self.retries = retries
+        self.backoff = backoff
+        self.downscale = downscale
+        self.cache_size = cache_size
+        self.hash_lookup = hash_lookup
+        self._cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prepare(self, image: ImageInput) -> PreparedImage:
+        return prepare_image(image, self.downscale)
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Backoff before retry number attempt + 1: exponential with jitter, or Retry-After."""
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, MAX_BACKOFF)
+        return min(self.backoff * 2**attempt, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+    def _should_retry(self, attempt: int, response: Optional[httpx.Response]) -> bool:
+        if attempt >= self.retries:
+            return False
+        return response is None or response.status_code in RETRY_STATUSES
+
+    def _cache_get(self, key: Tuple[str, str]) -> Any:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _cache_set(self, key: Tuple[str, str], value: Any) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        """Forget all cached results."""
+        with self._lock:
+            self._cache.clear()
+
+
+class ImageClient(_ClientBase):
+    """Blocking client for the image classification API (thread-safe)."""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        downscale: Optional[Tuple[int, int]] = MODEL_INPUT_SIZE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        max_connections: int = DEFAULT_CONCURRENCY,
+        http_client: Optional[httpx.Client] = None,
+        hash_lookup: bool = False,
+    ):
+        """
+        Args:
+            base_url: URL of the API
+            timeout: Timeout per attempt in seconds
+            retries: Number of retries for connection errors and 429/502/503/504
+            backoff: Delay before the first retry in seconds, doubled for each retry
+            downscale: Size uploads are downscaled to cover, or None to send them
+                at full resolution (default: the model input size)
+            cache_size: Maximum number of cached results (0 disables the cache)
+            max_connections: Size of the connection pool
+            http_client: httpx client to send requests with, instead of a new pool
+            hash_lookup: Ask the API for a cached result by the hash of the upload
+                first, and upload the image only if there is none (one extra
+                request per miss, no upload per hit)
+        """
+        super().__init__(retries, backoff, downscale, cache_size, hash_lookup)
+        self._owns_http = http_client is None
+        self._http = http_client or httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        if self._owns_http:
+            self._http.close()
+
+    def __enter__(self) -> "ImageClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """Send a request, retrying connection errors and retryable statuses."""
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self._http.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+            if response is not None and not self._should_retry(attempt, response):
+                return _check(response)
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def _dedup(self, key: Tuple[str, str], call) -> Any:
+        """Get a result from the cache, from an identical call in flight, or by calling."""
+        result = self._cache_get(key)
+        if result is not None:
+            return result
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._cache_set(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def health(self) -> Dict[str, Any]:
+        """Get the API health status (retried while the API starts up)."""
+        return self._request("GET", "/health").json()
+
+    def predict(self, image: ImageInput) -> str:
+        """
+        Predict the class of an image.
+
+        Args:
+            image: File path, encoded image bytes or PIL Image object
+
+        Returns:
+            str: Predicted class
+        """
+        prepared = self._prepare(image)
+
+        def call():
+            if self.hash_lookup:
+                try:
+                    response = self._request("GET", f"/predict/by-hash/{prepared.digest}")
+                    return response.json()["predicted_class"]
+                except APIError as e:
+                    if e.status_code != 404:
+                        raise
+            files = {"file": (prepared.filename, prepared.data, prepared.media_type)}
+            return self._request("POST", "/predict", files=files).json()["predicted_class"]
+
+        return self._dedup(("predict", prepared.digest), call)
+
+    def predict_many(
+        self,
+        images: Iterable[ImageInput],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        return_exceptions: bool = False,
+    ) -> List[Union[str, BaseException]]:
+        """
+        Predict the classes of several images, at most max_concurrency at a time.
+
+        Args:
+            images: Images to classify
+            max_concurrency: Maximum number of requests in flight
+            return_exceptions: Return exceptions in place of failed predictions
+                instead of raising the first one
+
+        Returns:
+            list: Predicted classes (or exceptions), in input order
+        """
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [executor.submit(self.predict, image) for image in images]
+        results = []
+        for future in futures:
+            error = future.exception()
+            if error is not None and not return_exceptions:
+                raise error
+            results.append(error if error is not None else future.result())
+        return results
+
+
+class AsyncImageClient(_ClientBase):
+    """Asyncio client for the image classification API."""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        downscale: Optional[Tuple[int, int]] = MODEL_INPUT_SIZE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        max_connections: int = DEFAULT_CONCURRENCY,
+        http_client: Optional[httpx.AsyncClient] = None,
+        hash_lookup: bool = False,
+    ):
+        """Same arguments as ImageClient, with an httpx.AsyncClient for http_client."""
+        super().__init__(retries, backoff, downscale, cache_size, hash_lookup)
+        self._owns_http = http_client is None
+        self._http = http_client or httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._owns_http:
+            await self._http.aclose()
+
+    async def __aenter__(self) -> "AsyncImageClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """Send a request, retrying connection errors and retryable statuses."""
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await self._http.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+            if response is not None and not self._should_retry(attempt, response):
+                return _check(response)
+            await asyncio.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    async def _dedup(self, key: Tuple[str, str], call) -> Any:
+        """Get a result from the cache, from an identical call in flight, or by calling."""
+        result = self._cache_get(key)
+        if result is not None:
+            return result
+        future = self._inflight.get(key)
+        if future is not None:
+            # Shielded, so a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(future)
+
+        future = self._inflight[key] = asyncio.ensure_future(call())
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        self._cache_set(key, result)
+        return result
+
+    async def health(self) -> Dict[str, Any]:
+        """Get the API health status (retried while the API starts up)."""
+        return (await self._request("GET", "/health")).json()
+
+    async def predict(self, image: ImageInput) -> str:
+        """
+        Predict the class of an image.
+
+        The image is downscaled in a thread, off the event loop.
+
+        Args:
+            image: File path, encoded image bytes or PIL Image object
+
+        Returns:
+            str: Predicted class
+        """
+        prepared = await asyncio.get_running_loop().run_in_executor(None, self._prepare, image)
+
+        async def call():
+            if self.hash_lookup:
+                try:
+                    response = await self._request("GET", f"/predict/by-hash/{prepared.digest}")
+                    return response.json()["predicted_class"]
+                except APIError as e:
+                    if e.status_code != 404:
+                        raise
+            files = {"file": (prepared.filename, prepared.data, prepared.media_type)}
+            response = await self._request("POST", "/predict", files=files)
+            return response.json()["predicted_class"]
+
+        return await self._dedup(("predict", prepared.digest), call)
+
+    async def predict_many(
+        self,
+        images: Iterable[ImageInput],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        return_exceptions: bool = False,
+    ) -> List[Union[str, BaseException]]:
+        """
+        Predict the classes of several images, at most max_concurrency at a time.
+
+        Args:
+            images: Images to classify
+            max_concurrency: Maximum number of requests in flight
+            return_exceptions: Return exceptions in place of failed predictions
+                instead of raising the first one
+
+        Returns:
+            list: Predicted classes (or exceptions), in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def bounded(image):
+            async with semaphore:
+                return await self.predict(image)
+
+        return await asyncio.gather(
+            *(bounded(image) for image in images), return_exceptions=return_exceptions
+        )
@@ -0,0 +1,235 @@
+"""Dynamic micro-batching of concurrent requests.
+
+A MicroBatcher queues items submitted by concurrent callers. It runs them as one
+batch in the worker pool when max_batch_size items are waiting, or when the oldest
+item has waited max_wait seconds. Each caller then gets its own result back. With
+a real model this amortizes per-call overhead over many requests, and costs each
+request at most max_wait of extra latency.
+
+Cancelling a waiting caller drops its item from the next batch. Cancelling a
+caller whose batch is already running just discards its result.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from logic.executor import WorkerPool, _percentile, get_pool
+from logic.timing import current_recorder, recording
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT = 0.005
+
+# Number of recent queueing delays kept for percentile reporting
+_SAMPLE_WINDOW = 1024
+
+# Called after each batch with (batch size, queueing delay of each item in seconds)
+BatchObserver = Callable[[int, List[float]], None]
+
+
+class _Entry:
+    """One queued item and the future its caller is waiting on."""
+
+    __slots__ = ("item", "future", "enqueued")
+
+    def __init__(self, item: Any, future: asyncio.Future):
+        self.item = item
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Coalesce concurrent calls into batches for a function that takes a list of items."""
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        pool: Optional[WorkerPool] = None,
+        observer: Optional[BatchObserver] = None,
+    ):
+        """
+        Args:
+            fn: Batch function called as fn(items) in the worker pool; it must return
+                one result per item, in order (and be picklable for process pools)
+            max_batch_size: Flush as soon as this many items are waiting
+            max_wait: Flush when the oldest item has waited this many seconds
+            pool: Worker pool to run batches in (default: the default pool)
+            observer: Optional callback run after each batch, e.g. to export metrics
+        """
+        if max_batch_size <= 0:
+            raise ValueError("Max batch size must be a positive integer")
+        if max_wait < 0:
+            raise ValueError("Max wait must not be negative")
+
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pool = pool
+        self.observer = observer
+        self._pending: List[_Entry] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._cancelled = 0
+        self._failed = 0
+        self._sizes = Counter()
+        self._delays = deque(maxlen=_SAMPLE_WINDOW)
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait for its result from the next batch.
+
+        If a stage recorder is active, the time spent waiting for the batch is
+        recorded as a "batch_wait" stage, and the batch's own stages are merged in.
+
+        Args:
+            item: Item to process
+
+        Returns:
+            The batch function's result for this item
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._pending:
+                raise RuntimeError("MicroBatcher cannot be shared between event loops")
+            self._loop = loop
+
+        entry = _Entry(item, loop.create_future())
+        self._pending.append(entry)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        result, flushed, stages = await entry.future
+        recorder = current_recorder()
+        if recorder is not None:
+            recorder.add_stage("batch_wait", flushed - entry.enqueued)
+            recorder.merge(stages)
+        return result
+
+    def _flush(self) -> None:
+        """Start a batch with every waiting item that has not been cancelled."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        entries, self._pending = self._pending, []
+
+        live = [entry for entry in entries if not entry.future.cancelled()]
+        with self._lock:
+            self._cancelled += len(entries) - len(live)
+        if live:
+            # Keep a reference, so the running batch is not garbage collected
+            task = self._loop.create_task(self._run_batch(live))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, entries: List[_Entry]) -> None:
+        """Run one batch in the worker pool and hand each caller its result."""
+        flushed = time.perf_counter()
+        delays = [flushed - entry.enqueued for entry in entries]
+        self._record(delays)
+
+        pool = self.pool or get_pool()
+        try:
+            # The batch's stages are collected separately and shared with every caller
+            with recording() as stages:
+                results = await pool.run(self.fn, [entry.item for entry in entries])
+            if len(results) != len(entries):
+                raise ValueError(
+                    f"Batch function returned {len(results)} results for {len(entries)} items"
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            with self._lock:
+                self._failed += len(entries)
+            for entry in entries:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+            return
+
+        for entry, result in zip(entries, results):
+            # Callers cancelled while the batch ran just miss their result
+            if not entry.future.done():
+                entry.future.set_result((result, flushed, stages))
+            else:
+                with self._lock:
+                    self._cancelled += 1
+
+    def _record(self, delays: List[float]) -> None:
+        """Record the size and queueing delays of one batch."""
+        with self._lock:
+            self._batches += 1
+            self._items += len(delays)
+            self._sizes[len(delays)] += 1
+            self._delays.extend(delays)
+            self._delay_total += sum(delays)
+            self._delay_max = max(self._delay_max, *delays)
+        if self.observer is not None:
+            self.observer(len(delays), delays)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the batching statistics.
+
+        Returns:
+            dict with the configuration, counters, batch-size distribution and
+            queueing delays in ms
+        """
+        with self._lock:
+            delays = list(self._delays)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": 1000 * self.max_wait,
+                "pending": len(self._pending),
+                "batches": self._batches,
+                "items": self._items,
+                "cancelled": self._cancelled,
+                "failed": self._failed,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_sizes": {str(size): n for size, n in sorted(self._sizes.items())},
+                "queue_delay_ms": {
+                    "mean": 1000 * self._delay_total / self._items if self._items else 0.0,
+                    "p50": 1000 * _percentile(delays, 0.50),
+                    "p99": 1000 * _percentile(delays, 0.99),
+                    "max": 1000 * self._delay_max,
+                },
+            }
+
+
+def batcher_from_env(
+    fn: Callable[[List[Any]], Sequence[Any]],
+    prefix: str = "PREDICT_BATCH",
+    observer: Optional[BatchObserver] = None,
+) -> MicroBatcher:
+    """
+    Create a batcher configured from environment variables.
+
+    ``<prefix>_MAX_SIZE`` sets the maximum batch size (default: 32; 1 disables
+    coalescing), and ``<prefix>_MAX_WAIT_MS`` the maximum wait in ms (default: 5).
+
+    Args:
+        fn: Batch function
+        prefix: Environment variable prefix (default: "PREDICT_BATCH")
+        observer: Optional callback run after each batch
+
+    Returns:
+        MicroBatcher: The batcher
+    """
+    max_size = os.environ.get(f"{prefix}_MAX_SIZE", "").strip()
+    max_wait = os.environ.get(f"{prefix}_MAX_WAIT_MS", "").strip()
+    return MicroBatcher(
+        fn,
+        int(max_size) if max_size else DEFAULT_MAX_BATCH_SIZE,
+        float(max_wait) / 1000 if max_wait else DEFAULT_MAX_WAIT,
+        observer=observer,
+    )
@@ -0,0 +1,238 @@
+"""Content-addressed result cache with LRU eviction and a TTL.
+
+Results are keyed by a hash of the input bytes plus the operation and its
+parameters, so a repeated upload of the same image with the same parameters is
+served without decoding it again. The cache has no FastAPI dependency, so the
+API, the CLI and the logic module can all use it.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 3600.0
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Hash input bytes for use in cache keys.
+
+    SHA-256 runs at several GB/s when the CPU has SHA extensions, which is faster
+    than the other hashlib algorithms.
+
+    Args:
+        data: Bytes-like object to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(op: str, digest: str, *params: Hashable) -> Tuple[Hashable, ...]:
+    """
+    Build a cache key from an operation name, a content digest and parameters.
+
+    Args:
+        op: Operation name (e.g. "resize")
+        digest: Content hash of the input (see content_hash)
+        *params: Operation parameters (e.g. width and height)
+
+    Returns:
+        tuple: Cache key
+    """
+    return (op, digest) + params
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by a cached value, in bytes.
+
+    Buffers count their length, and tuples, lists and dicts the sum of their
+    members plus the container itself. Other objects (str, numbers, None) count
+    their shallow size, so nothing is serialized.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimate_size(key) + _estimate_size(item) for key, item in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by total size and entry count, with a TTL."""
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        if max_bytes < 0 or max_entries < 0:
+            raise ValueError("Cache limits must be non-negative integers")
+        if ttl <= 0:
+            raise ValueError("Cache TTL must be positive")
+
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache can hold any entries."""
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a key, refreshing its LRU position.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None on a miss or if the entry expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """
+        Store a value, evicting least recently used entries to stay within limits.
+
+        Values larger than the whole cache are not stored.
+
+        Args:
+            key: Cache key
+            value: Value to store (should not be mutated afterwards)
+            size: Size of the value in bytes (default: estimated)
+        """
+        if size is None:
+            size = _estimate_size(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for a key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key
+            compute: Function called with no arguments on a miss
+
+        Returns:
+            The cached or newly computed value
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the cache statistics.
+
+        Returns:
+            dict with limits, current usage and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    """
+    Get the shared result cache, creating it from the environment on first use.
+
+    The limits are read from RESULT_CACHE_MAX_BYTES (0 disables the cache),
+    RESULT_CACHE_MAX_ENTRIES and RESULT_CACHE_TTL (seconds).
+
+    Returns:
+        ResultCache: The shared cache
+    """
+    global _cache  # pylint: disable=global-statement
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                ttl=float(os.environ.get("RESULT_CACHE_TTL", DEFAULT_TTL)),
+                max_entries=int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _cache
+
+
+def reset_cache() -> None:
+    """Drop the shared cache so that the next get_cache() call re-reads the environment."""
+    global _cache  # pylint: disable=global-statement
+    with _cache_lock:
+        _cache = None
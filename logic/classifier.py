@@ -1,9 +1,21 @@
 """Image classification and preprocessing logic."""
 
+import io
+import math
 import random
-from typing import Tuple
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
 from PIL import Image
-
+from logic.defaults import (
+    DEFAULT_FIT,
+    DEFAULT_QUALITY,
+    DEFAULT_REDUCING_GAP,
+    DEFAULT_RESIZE_PROFILE,
+    FIT_MODES,
+    IMAGE_FORMATS,
+    RESIZE_PROFILES,
+    TENSOR_DTYPES,
+)
 
 # Define available class names for classification
 CLASS_NAMES = [
@@ -19,6 +31,41 @@ CLASS_NAMES = [
     "ship",
 ]
 
+# Tensor normalization (see images_to_tensor); mean/std are the usual ImageNet values
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class ResizeProfile(NamedTuple):
+    """How a resize profile resamples (see resize_image)."""
+
+    downscale: Image.Resampling
+    upscale: Image.Resampling
+    max_reducing_gap: Optional[float]
+
+
+# Filters and the largest reducing gap per profile, for the names in RESIZE_PROFILES.
+# Upscales have no aliasing to filter out, so they use a shorter, cheaper kernel.
+RESIZE_PROFILE_SETTINGS = {
+    "fast": ResizeProfile(Image.Resampling.BILINEAR, Image.Resampling.BILINEAR, 1.0),
+    "balanced": ResizeProfile(Image.Resampling.BICUBIC, Image.Resampling.BILINEAR, 2.0),
+    "quality": ResizeProfile(Image.Resampling.LANCZOS, Image.Resampling.BICUBIC, None),
+}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image exceeds the configured size limits."""
+
+
+class ImageProbe(NamedTuple):
+    """Header information about an image, read without decoding pixels."""
+
+    format: Optional[str]
+    width: int
+    height: int
+    mode: str
+    frames: int
+
 
 def predict_class(image: Image.Image) -> str:
     """
@@ -40,14 +87,119 @@ def predict_class(image: Image.Image) -> str:
     return predicted_class
 
 
-def resize_image(image: Image.Image, width: int, height: int) -> Image.Image:
+def _validate_reducing_gap(reducing_gap: Optional[float]) -> Optional[float]:
+    """Check a reducing gap value, mapping 0 to None (disabled)."""
+    if not reducing_gap:
+        return None
+    if reducing_gap < 1.0:
+        raise ValueError("Reducing gap must be at least 1.0 (or 0 to disable)")
+    return reducing_gap
+
+
+def plan_resize(
+    size: Tuple[int, int],
+    width: int,
+    height: int,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> Tuple[Image.Resampling, Optional[float]]:
+    """
+    Choose the resampling filter and reducing gap for a resize.
+
+    Upscales (neither side shrinks) use the profile's upscale filter in one pass.
+    Downscales use its downscale filter after an integer-factor reduction, with the
+    reducing gap capped at the profile's maximum: a lower gap reduces further
+    before the (more expensive) filter runs.
+
+    Args:
+        size: Current (width, height) of the image
+        width: Target width in pixels
+        height: Target height in pixels
+        reducing_gap: Requested reducing gap; None or 0 disables the reduction
+            (default: DEFAULT_REDUCING_GAP)
+        profile: One of RESIZE_PROFILES (default: DEFAULT_RESIZE_PROFILE)
+
+    Returns:
+        Tuple containing (resampling filter, reducing gap or None)
+    """
+    if profile not in RESIZE_PROFILE_SETTINGS:
+        raise ValueError(f"Resize profile must be one of {', '.join(RESIZE_PROFILES)}")
+    settings = RESIZE_PROFILE_SETTINGS[profile]
+    reducing_gap = _validate_reducing_gap(reducing_gap)
+    if width >= size[0] and height >= size[1]:
+        return settings.upscale, None
+    if reducing_gap is not None and settings.max_reducing_gap is not None:
+        reducing_gap = min(reducing_gap, settings.max_reducing_gap)
+    return settings.downscale, reducing_gap
+
+
+def draft_image(
+    image: Image.Image,
+    width: int,
+    height: int,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Plan a reduced-size decode for an image that will be downscaled.
+
+    For JPEG images that are not decoded yet, this configures draft mode, so the
+    decoder scales the image by 1/2, 1/4 or 1/8 in the DCT domain. The decoded image
+    stays at least ``reducing_gap`` times larger than the target size. Other formats
+    and already-decoded images are left unchanged. Note that draft mode changes
+    ``image.size`` in place.
+
+    Args:
+        image: PIL Image object to plan the decode for
+        width: Target width in pixels
+        height: Target height in pixels
+        reducing_gap: Minimum ratio between decoded and target size; None or 0 disables
+            (default: DEFAULT_REDUCING_GAP)
+
+    Returns:
+        The source box in decoded-image coordinates, or None if no draft was applied
+    """
+    if not isinstance(image, Image.Image):
+        raise ValueError("Input must be a PIL Image object")
+
+    reducing_gap = _validate_reducing_gap(reducing_gap)
+    if reducing_gap is None or not getattr(image, "tile", None):
+        return None
+
+    result = image.draft(None, (int(width * reducing_gap), int(height * reducing_gap)))
+    if result is None:
+        return None
+    return result[1]
+
+
+def resize_image(
+    image: Image.Image,
+    width: int,
+    height: int,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> Image.Image:
     """
     Resize an image to the specified dimensions.
 
+    Large downscales run in two steps. First the image is reduced by an integer
+    factor (JPEG draft mode or ``Image.reduce``), staying at least ``reducing_gap``
+    times larger than the target. Then it is resampled with the profile's filter.
+    The profile trades quality for speed (see plan_resize):
+
+    - "fast": BILINEAR, reducing as far as the target size (gap 1.0)
+    - "balanced": BICUBIC, with a gap of at most 2.0
+    - "quality": LANCZOS, with the requested gap
+
+    Upscales skip the reduction and use a cheaper filter: BILINEAR for "fast" and
+    "balanced", BICUBIC for "quality".
+
     Args:
         image: PIL Image object to resize
         width: Target width in pixels
         height: Target height in pixels
+        reducing_gap: Quality knob for the first step; larger is closer to a full
+            resample, None or 0 disables it (default: DEFAULT_REDUCING_GAP)
+        profile: One of RESIZE_PROFILES (default: DEFAULT_RESIZE_PROFILE)
 
     Returns:
         Image.Image: Resized PIL Image object
@@ -58,10 +210,211 @@ def resize_image(image: Image.Image, width: int, height: int) -> Image.Image:
     if width <= 0 or height <= 0:
         raise ValueError("Width and height must be positive integers")
 
-    resized_image = image.resize((width, height), Image.Resampling.LANCZOS)
+    resample, reducing_gap = plan_resize(image.size, width, height, reducing_gap, profile)
+    box = draft_image(image, width, height, reducing_gap)
+    resized_image = image.resize((width, height), resample, box=box, reducing_gap=reducing_gap)
     return resized_image
 
 
+def fit_box(
+    size: Tuple[int, int], width: int, height: int, fit: str = DEFAULT_FIT
+) -> Tuple[Tuple[float, float, float, float], Tuple[int, int], Tuple[int, int]]:
+    """
+    Plan how an image is fitted to a target size.
+
+    - "stretch": the whole image is resized to the target size
+    - "cover": the centered source region with the target's aspect ratio is resized
+      to the target size (a center crop, done in the same resample)
+    - "contain": the whole image is resized to fit inside the target size, keeping
+      its aspect ratio, and centered on a padded canvas
+
+    Args:
+        size: Source (width, height)
+        width: Target width in pixels
+        height: Target height in pixels
+        fit: One of FIT_MODES (default: DEFAULT_FIT)
+
+    Returns:
+        Tuple containing (source box, resized (width, height), paste offset)
+    """
+    if fit not in FIT_MODES:
+        raise ValueError(f"Fit must be one of {', '.join(FIT_MODES)}")
+    source_width, source_height = size
+    full = (0.0, 0.0, float(source_width), float(source_height))
+    if fit == "stretch":
+        return full, (width, height), (0, 0)
+    if fit == "cover":
+        scale = max(width / source_width, height / source_height)
+        box_width, box_height = width / scale, height / scale
+        left, top = (source_width - box_width) / 2, (source_height - box_height) / 2
+        return (left, top, left + box_width, top + box_height), (width, height), (0, 0)
+    scale = min(width / source_width, height / source_height)
+    resized = (
+        min(width, max(1, round(source_width * scale))),
+        min(height, max(1, round(source_height * scale))),
+    )
+    return full, resized, ((width - resized[0]) // 2, (height - resized[1]) // 2)
+
+
+def fit_scaled_size(
+    size: Tuple[int, int], width: int, height: int, fit: str = DEFAULT_FIT
+) -> Tuple[int, int]:
+    """
+    Get the size the whole image is scaled to when it is fitted to a target size.
+
+    This is the size to plan a reduced-size decode for (see draft_image): with
+    "cover", the whole image is scaled past the target size before it is cropped.
+    """
+    box, resized, _ = fit_box(size, width, height, fit)
+    return (
+        math.ceil(resized[0] * size[0] / (box[2] - box[0])),
+        math.ceil(resized[1] * size[1] / (box[3] - box[1])),
+    )
+
+
+def fit_image(
+    image: Image.Image,
+    width: int,
+    height: int,
+    fit: str = DEFAULT_FIT,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> Image.Image:
+    """
+    Resize an image to the specified dimensions with a fit mode (see fit_box).
+
+    Every mode costs one resample, over only the source region it needs: "cover"
+    passes its crop as the box of the resize, and "contain" pastes the resized
+    image onto a black canvas. Large JPEG downscales are draft-decoded, as in
+    resize_image.
+
+    Args:
+        image: PIL Image object to resize
+        width: Target width in pixels
+        height: Target height in pixels
+        fit: One of FIT_MODES (default: DEFAULT_FIT)
+        reducing_gap: Quality knob for two-step downscaling, see resize_image
+            (default: DEFAULT_REDUCING_GAP)
+        profile: Resize speed/quality profile, see resize_image
+            (default: DEFAULT_RESIZE_PROFILE)
+
+    Returns:
+        Image.Image: Resized PIL Image object, in the mode of the input
+    """
+    if not isinstance(image, Image.Image):
+        raise ValueError("Input must be a PIL Image object")
+
+    if width <= 0 or height <= 0:
+        raise ValueError("Width and height must be positive integers")
+
+    if fit == "stretch":
+        return resize_image(image, width, height, reducing_gap, profile)
+
+    box, resized_size, offset = fit_box(image.size, width, height, fit)
+    resample, reducing_gap = plan_resize(
+        (box[2] - box[0], box[3] - box[1]), *resized_size, reducing_gap, profile
+    )
+    original_size = image.size
+    draft = draft_image(image, *fit_scaled_size(original_size, width, height, fit), reducing_gap)
+    if draft is not None:
+        scale_x, scale_y = draft[2] / original_size[0], draft[3] / original_size[1]
+        box = (box[0] * scale_x, box[1] * scale_y, box[2] * scale_x, box[3] * scale_y)
+    resized = image.resize(resized_size, resample, box=box, reducing_gap=reducing_gap)
+    if resized_size == (width, height):
+        return resized
+
+    canvas = Image.new(resized.mode, (width, height))
+    canvas.paste(resized, offset)
+    return canvas
+
+
+def parse_size(spec: str, size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Resolve a target size spec against a source size.
+
+    Args:
+        spec: "WIDTHxHEIGHT" for an exact size, or "N" to scale the longer side to N
+            pixels, keeping the aspect ratio
+        size: Source (width, height)
+
+    Returns:
+        Target (width, height)
+    """
+    try:
+        values = [int(value) for value in spec.lower().split("x")]
+    except ValueError:
+        values = []
+    if len(values) not in (1, 2) or min(values) <= 0:
+        raise ValueError(f"Size must be WIDTHxHEIGHT or a positive integer, not {spec!r}")
+    if len(values) == 2:
+        return values[0], values[1]
+    scale = values[0] / max(size)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def resize_cascade(
+    image: Image.Image,
+    sizes: Sequence[Tuple[int, int]],
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+) -> List[Image.Image]:
+    """
+    Resize an image to several sizes from one decode.
+
+    The sizes are produced largest first. Each one is resampled from the smallest
+    result produced so far that covers it, so only the largest sizes read the
+    source. Large JPEGs are draft-decoded once, at the scale the largest size
+    needs, as in resize_image.
+
+    Args:
+        image: PIL Image object to resize
+        sizes: Target (width, height) pairs
+        reducing_gap: Quality knob for two-step downscaling, see resize_image
+            (default: DEFAULT_REDUCING_GAP)
+        profile: Resize speed/quality profile, see resize_image
+            (default: DEFAULT_RESIZE_PROFILE)
+
+    Returns:
+        list: Resized PIL Image objects, in the order of sizes
+    """
+    if not isinstance(image, Image.Image):
+        raise ValueError("Input must be a PIL Image object")
+    if not sizes:
+        raise ValueError("At least one size is required")
+    if any(width <= 0 or height <= 0 for width, height in sizes):
+        raise ValueError("Width and height must be positive integers")
+
+    # One reduced-size decode, large enough for every size
+    _, draft_gap = plan_resize(
+        image.size,
+        max(width for width, _ in sizes),
+        max(height for _, height in sizes),
+        reducing_gap,
+        profile,
+    )
+    box = draft_image(
+        image,
+        max(width for width, _ in sizes),
+        max(height for _, height in sizes),
+        draft_gap,
+    )
+
+    results = {}
+    for size in sorted(set(sizes), key=lambda size: size[0] * size[1], reverse=True):
+        covering = [
+            result
+            for result in results.values()
+            if result.width >= size[0] and result.height >= size[1]
+        ]
+        if covering:
+            source = min(covering, key=lambda result: result.width * result.height)
+            results[size] = resize_image(source, *size, reducing_gap, profile)
+            continue
+        resample, gap = plan_resize(image.size, *size, reducing_gap, profile)
+        results[size] = image.resize(size, resample, box=box, reducing_gap=gap)
+    return [results[size] for size in sizes]
+
+
 def convert_to_rgb(image: Image.Image) -> Image.Image:
     """
     Convert an image to RGB mode.
@@ -96,16 +449,71 @@ def normalize_image(image: Image.Image) -> Tuple[int, int, str]:
     return image.size[0], image.size[1], image.mode
 
 
+def probe_image(image: Image.Image) -> ImageProbe:
+    """
+    Get header information about an image without decoding its pixels.
+
+    This relies on Image.open being lazy: for an image that was just opened, only
+    the file header has been read.
+
+    Args:
+        image: PIL Image object to probe
+
+    Returns:
+        ImageProbe: (format, width, height, mode, frames)
+    """
+    width, height, mode = normalize_image(image)
+    return ImageProbe(image.format, width, height, mode, getattr(image, "n_frames", 1))
+
+
+def check_image_limits(
+    probe: ImageProbe,
+    max_pixels: Optional[int] = None,
+    max_dimension: Optional[int] = None,
+) -> None:
+    """
+    Check probed image dimensions against size limits before decoding.
+
+    Args:
+        probe: Result of probe_image
+        max_pixels: Maximum width * height (default: no limit)
+        max_dimension: Maximum width or height (default: no limit)
+
+    Raises:
+        ImageTooLargeError: If the image exceeds a limit
+    """
+    if max_dimension is not None and max(probe.width, probe.height) > max_dimension:
+        raise ImageTooLargeError(
+            f"Image dimensions {probe.width}x{probe.height} exceed the limit of "
+            f"{max_dimension} pixels per side"
+        )
+    if max_pixels is not None and probe.width * probe.height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image size {probe.width}x{probe.height} exceeds the limit of {max_pixels} pixels"
+        )
+
+
 def preprocess_image(
-    image: Image.Image, target_width: int = 224, target_height: int = 224
+    image: Image.Image,
+    target_width: int = 224,
+    target_height: int = 224,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+    fit: str = DEFAULT_FIT,
 ) -> Image.Image:
     """
-    Preprocess an image: convert to RGB and resize.
+    Preprocess an image: convert to RGB and resize with a fit mode.
 
     Args:
         image: PIL Image object to preprocess
         target_width: Target width (default: 224)
         target_height: Target height (default: 224)
+        reducing_gap: Quality knob for two-step downscaling, see resize_image
+            (default: DEFAULT_REDUCING_GAP)
+        profile: Resize speed/quality profile, see resize_image
+            (default: DEFAULT_RESIZE_PROFILE)
+        fit: "stretch" to squash to the target size, "cover" to center crop, or
+            "contain" to letterbox, see fit_box (default: DEFAULT_FIT)
 
     Returns:
         Image.Image: Preprocessed PIL Image object
@@ -113,10 +521,241 @@ def preprocess_image(
     if not isinstance(image, Image.Image):
         raise ValueError("Input must be a PIL Image object")
 
+    if target_width <= 0 or target_height <= 0:
+        raise ValueError("Width and height must be positive integers")
+
+    # Plan a reduced-size decode before the RGB conversion forces a full one
+    box, resized_size, _ = fit_box(image.size, target_width, target_height, fit)
+    _, draft_gap = plan_resize(
+        (box[2] - box[0], box[3] - box[1]), *resized_size, reducing_gap, profile
+    )
+    draft_image(image, *fit_scaled_size(image.size, target_width, target_height, fit), draft_gap)
+
     # Convert to RGB
     rgb_image = convert_to_rgb(image)
 
     # Resize to target dimensions
-    preprocessed_image = resize_image(rgb_image, target_width, target_height)
+    preprocessed_image = fit_image(
+        rgb_image, target_width, target_height, fit, reducing_gap, profile
+    )
 
     return preprocessed_image
+
+
+def encode_image(
+    image: Image.Image, image_format: str = "JPEG", quality: int = DEFAULT_QUALITY
+) -> bytes:
+    """
+    Encode an image to compressed bytes.
+
+    Args:
+        image: PIL Image object to encode
+        image_format: One of IMAGE_FORMATS, case-insensitive (default: "JPEG")
+        quality: Lossy compression quality from 1 to 100, ignored for PNG
+            (default: DEFAULT_QUALITY)
+
+    Returns:
+        bytes: Encoded image
+    """
+    if not isinstance(image, Image.Image):
+        raise ValueError("Input must be a PIL Image object")
+
+    image_format = image_format.upper()
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Format must be one of {', '.join(IMAGE_FORMATS)}")
+
+    if not 1 <= quality <= 100:
+        raise ValueError("Quality must be between 1 and 100")
+
+    if image_format == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+        image = convert_to_rgb(image)
+
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        image.save(buffer, format=image_format)
+    else:
+        image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def _iter_preprocessed(
+    images: Sequence[Image.Image],
+    target_width: int,
+    target_height: int,
+    reducing_gap: Optional[float],
+    profile: str,
+    fit: str,
+):
+    """Yield each image preprocessed as an (height, width, 3) uint8 array."""
+    for image in images:
+        if not isinstance(image, Image.Image):
+            raise ValueError("Input must be a PIL Image object")
+        if image.mode != "RGB" or image.size != (target_width, target_height):
+            image = preprocess_image(image, target_width, target_height, reducing_gap, profile, fit)
+        yield np.asarray(image)
+
+
+def _check_output_array(out: np.ndarray, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """Check that a preallocated output array matches the expected shape and dtype."""
+    if not isinstance(out, np.ndarray) or out.shape != shape or out.dtype != dtype:
+        raise ValueError(f"Output array must have shape {shape} and dtype {np.dtype(dtype)}")
+    return out
+
+
+def images_to_batch(
+    images: Sequence[Image.Image],
+    target_width: int = 224,
+    target_height: int = 224,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    out: Optional[np.ndarray] = None,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+    fit: str = DEFAULT_FIT,
+) -> np.ndarray:
+    """
+    Preprocess images and stack them into a single array.
+
+    Images that are already RGB at the target size are copied in without resampling.
+
+    Args:
+        images: Sequence of PIL Image objects
+        target_width: Target width (default: 224)
+        target_height: Target height (default: 224)
+        reducing_gap: Quality knob for two-step downscaling, see resize_image
+            (default: DEFAULT_REDUCING_GAP)
+        out: Optional preallocated array to write into
+        profile: Resize speed/quality profile, see resize_image
+            (default: DEFAULT_RESIZE_PROFILE)
+        fit: Fit mode, see preprocess_image (default: DEFAULT_FIT)
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, target_height, target_width, 3)
+    """
+    shape = (len(images), target_height, target_width, 3)
+    if out is None:
+        batch = np.empty(shape, dtype=np.uint8)
+    else:
+        batch = _check_output_array(out, shape, np.uint8)
+
+    for index, pixels in enumerate(
+        _iter_preprocessed(images, target_width, target_height, reducing_gap, profile, fit)
+    ):
+        batch[index] = pixels
+    return batch
+
+
+def images_to_tensor(
+    images: Sequence[Image.Image],
+    target_width: int = 224,
+    target_height: int = 224,
+    dtype: str = "float32",
+    mean: Sequence[float] = IMAGENET_MEAN,
+    std: Sequence[float] = IMAGENET_STD,
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+    out: Optional[np.ndarray] = None,
+    profile: str = DEFAULT_RESIZE_PROFILE,
+    fit: str = DEFAULT_FIT,
+) -> np.ndarray:
+    """
+    Preprocess images into a model input tensor.
+
+    With dtype "float32", each image is resized and converted to RGB. It is then
+    scaled to [0, 1], normalized with the per-channel mean and std, and written in
+    CHW order straight into its slot of the batch array. Scaling and normalization
+    are fused into one multiply-add, with no intermediate arrays. With dtype
+    "uint8", the raw pixels are returned in NHWC order (see images_to_batch).
+
+    Args:
+        images: Sequence of PIL Image objects
+        target_width: Target width (default: 224)
+        target_height: Target height (default: 224)
+        dtype: "float32" (normalized NCHW) or "uint8" (raw NHWC) (default: "float32")
+        mean: Per-channel mean on the [0, 1] scale (default: IMAGENET_MEAN)
+        std: Per-channel standard deviation on the [0, 1] scale (default: IMAGENET_STD)
+        reducing_gap: Quality knob for two-step downscaling, see resize_image
+            (default: DEFAULT_REDUCING_GAP)
+        out: Optional preallocated array to write into
+        profile: Resize speed/quality profile, see resize_image
+            (default: DEFAULT_RESIZE_PROFILE)
+        fit: Fit mode, see preprocess_image (default: DEFAULT_FIT)
+
+    Returns:
+        np.ndarray: float32 array of shape (N, 3, height, width), or uint8 array
+        of shape (N, height, width, 3)
+    """
+    if dtype not in TENSOR_DTYPES:
+        raise ValueError(f"Tensor dtype must be one of {', '.join(TENSOR_DTYPES)}")
+    if dtype == "uint8":
+        return images_to_batch(images, target_width, target_height, reducing_gap, out, profile, fit)
+
+    if len(mean) != 3 or len(std) != 3 or any(value <= 0 for value in std):
+        raise ValueError("Mean and std must have 3 values, and std must be positive")
+
+    shape = (len(images), 3, target_height, target_width)
+    if out is None:
+        tensor = np.empty(shape, dtype=np.float32)
+    else:
+        tensor = _check_output_array(out, shape, np.float32)
+
+    # (pixel / 255 - mean) / std == pixel * scale + offset
+    scale = (1.0 / (255.0 * np.asarray(std, dtype=np.float32)))[:, None, None]
+    offset = (-np.asarray(mean, dtype=np.float32) / np.asarray(std, dtype=np.float32))[
+        :, None, None
+    ]
+    for index, pixels in enumerate(
+        _iter_preprocessed(images, target_width, target_height, reducing_gap, profile, fit)
+    ):
+        np.multiply(pixels.transpose(2, 0, 1), scale, out=tensor[index])
+        tensor[index] += offset
+    return tensor
+
+
+def tensor_to_npy(tensor: np.ndarray) -> bytes:
+    """
+    Serialize an array in NumPy .npy format.
+
+    Args:
+        tensor: Array to serialize
+
+    Returns:
+        bytes: .npy file contents
+    """
+    if not isinstance(tensor, np.ndarray):
+        raise ValueError("Input must be a NumPy array")
+
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, tensor, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def predict_array(batch: np.ndarray) -> List[str]:
+    """
+    Predict the class of every image in a stacked array.
+
+    In this initial version, each class is randomly chosen from available classes.
+
+    Args:
+        batch: Array of shape (N, height, width, channels)
+
+    Returns:
+        List[str]: Predicted class name for each image, in order
+    """
+    if not isinstance(batch, np.ndarray) or batch.ndim != 4:
+        raise ValueError("Batch must be an array of shape (N, height, width, channels)")
+
+    # For now, randomly select a class for each image
+    return [random.choice(CLASS_NAMES) for _ in range(batch.shape[0])]
+
+
+def predict_batch(images: Sequence[Image.Image]) -> List[str]:
+    """
+    Predict the class of several images at once.
+
+    Args:
+        images: Sequence of PIL Image objects to classify
+
+    Returns:
+        List[str]: Predicted class name for each image, in order
+    """
+    if not images:
+        return []
+    return predict_array(images_to_batch(images))
@@ -0,0 +1,24 @@
+"""Default settings of logic.classifier.
+
+Kept free of numpy and PIL imports, so that front ends such as the CLI can build
+their options without paying for loading the image stack.
+"""
+
+# Default quality knob for two-step downscaling (see draft_image). With a gap of 3.0
+# or more the result can't be told apart from a full LANCZOS resample in most cases.
+DEFAULT_REDUCING_GAP = 3.0
+
+# Speed/quality tiers of resize_image, from cheapest to best (see logic.classifier)
+RESIZE_PROFILES = ("fast", "balanced", "quality")
+DEFAULT_RESIZE_PROFILE = "quality"
+
+# How preprocess_image fits images to the target size: squash, center crop or letterbox
+FIT_MODES = ("stretch", "cover", "contain")
+DEFAULT_FIT = "stretch"
+
+# Output formats supported by encode_image
+IMAGE_FORMATS = ("JPEG", "PNG", "WEBP")
+DEFAULT_QUALITY = 85
+
+# Tensor output dtypes supported by images_to_tensor
+TENSOR_DTYPES = ("float32", "uint8")
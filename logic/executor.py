@@ -0,0 +1,286 @@
+"""Pluggable execution layer for CPU-bound image work.
+
+Decoding and resampling with PIL holds the CPU for a long time, so the API runs this
+work in a worker pool instead of on the event loop. The pool is a thread pool by
+default (PIL releases the GIL while decoding and resampling). A process pool is also
+available. Use the ``IMAGE_EXECUTOR_KIND`` and ``IMAGE_EXECUTOR_WORKERS`` environment
+variables or :func:`configure_pool` to choose one.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from logic.timing import StageRecorder, current_recorder, recording
+
+EXECUTOR_KINDS = ("thread", "process")
+DEFAULT_POOL = "default"
+
+# Number of recent samples kept for percentile reporting
+_SAMPLE_WINDOW = 1024
+
+
+def _timed_call(
+    fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]
+) -> Tuple[float, float, bool, Any, StageRecorder]:
+    """
+    Run a function in a worker and record when it started and finished.
+
+    This function is module-level so that process pools can pickle it. Exceptions are
+    returned instead of raised, so the wait time is still recorded for failed calls.
+    Stages timed by the function (see logic.timing) are returned to the caller.
+
+    Returns:
+        Tuple containing (started, finished, ok, result_or_exception, stages)
+    """
+    started = time.monotonic()
+    with recording() as stages:
+        try:
+            result = fn(*args, **kwargs)
+            return started, time.monotonic(), True, result, stages
+        except Exception as e:  # pylint: disable=broad-except
+            return started, time.monotonic(), False, e, stages
+
+
+def _percentile(samples, fraction: float) -> float:
+    """Return the given percentile (0-1) of a sequence of samples, or 0.0 if empty."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def default_workers(kind: str) -> int:
+    """
+    Get the default pool size for an executor kind.
+
+    Args:
+        kind: Executor kind ("thread" or "process")
+
+    Returns:
+        int: Number of workers
+    """
+    cpus = os.cpu_count() or 1
+    if kind == "process":
+        return cpus
+    return min(32, cpus + 4)
+
+
+class WorkerPool:
+    """A named thread or process pool with queue-depth and wait-time statistics."""
+
+    def __init__(self, name: str, kind: str = "thread", max_workers: Optional[int] = None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Executor kind must be one of {', '.join(EXECUTOR_KINDS)}")
+        if max_workers is not None and max_workers <= 0:
+            raise ValueError("Executor workers must be a positive integer")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or default_workers(kind)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._wait_max = 0.0
+        self._waits = deque(maxlen=_SAMPLE_WINDOW)
+        self._runs = deque(maxlen=_SAMPLE_WINDOW)
+
+    @property
+    def executor(self) -> Executor:
+        """Get the underlying executor, creating it on first use."""
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=f"pool-{self.name}"
+                    )
+            return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a function in the pool without blocking the event loop.
+
+        If a stage recorder is active in the caller's context, the pool wait is
+        recorded as a "queue" stage and the function's own stages are merged in.
+
+        Args:
+            fn: Function to call (must be picklable for process pools)
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The function's return value
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        with self._lock:
+            self._pending += 1
+            self._submitted += 1
+        try:
+            started, finished, ok, result, stages = await loop.run_in_executor(
+                self.executor, _timed_call, fn, args, kwargs
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        wait = max(0.0, started - submitted)
+        self._record(wait, finished - started, ok)
+        recorder = current_recorder()
+        if recorder is not None:
+            recorder.add_stage("queue", wait)
+            recorder.merge(stages)
+        if not ok:
+            raise result
+        return result
+
+    def _record(self, wait: float, run: float, ok: bool) -> None:
+        """Record the timing of one finished call."""
+        with self._lock:
+            if ok:
+                self._completed += 1
+            else:
+                self._failed += 1
+            self._wait_total += wait
+            self._run_total += run
+            self._wait_max = max(self._wait_max, wait)
+            self._waits.append(wait)
+            self._runs.append(run)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the pool statistics.
+
+        Returns:
+            dict with pool configuration, queue depth, counters and timings in ms
+        """
+        with self._lock:
+            finished = self._completed + self._failed
+            waits = list(self._waits)
+            runs = list(self._runs)
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "in_flight": min(self._pending, self.max_workers),
+                "queue_depth": max(0, self._pending - self.max_workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "wait_ms": {
+                    "mean": 1000 * self._wait_total / finished if finished else 0.0,
+                    "p50": 1000 * _percentile(waits, 0.50),
+                    "p99": 1000 * _percentile(waits, 0.99),
+                    "max": 1000 * self._wait_max,
+                },
+                "run_ms": {
+                    "mean": 1000 * self._run_total / finished if finished else 0.0,
+                    "p50": 1000 * _percentile(runs, 0.50),
+                    "p99": 1000 * _percentile(runs, 0.99),
+                },
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the underlying executor, if it was created."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_pools: Dict[str, WorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_from_env(name: str) -> WorkerPool:
+    """Create a pool configured from the IMAGE_EXECUTOR_* environment variables."""
+    kind = os.environ.get("IMAGE_EXECUTOR_KIND", "thread").strip().lower()
+    workers = os.environ.get("IMAGE_EXECUTOR_WORKERS", "").strip()
+    return WorkerPool(name, kind, int(workers) if workers else None)
+
+
+def get_pool(name: str = DEFAULT_POOL) -> WorkerPool:
+    """
+    Get a named pool, creating it from the environment on first use.
+
+    Args:
+        name: Pool name (default: "default")
+
+    Returns:
+        WorkerPool: The pool
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = _pool_from_env(name)
+        return pool
+
+
+def configure_pool(
+    kind: str = "thread", max_workers: Optional[int] = None, name: str = DEFAULT_POOL
+) -> WorkerPool:
+    """
+    Replace a named pool with a new configuration.
+
+    Args:
+        kind: Executor kind ("thread" or "process")
+        max_workers: Pool size (default: depends on the kind)
+        name: Pool name (default: "default")
+
+    Returns:
+        WorkerPool: The new pool
+    """
+    pool = WorkerPool(name, kind, max_workers)
+    with _pools_lock:
+        old = _pools.get(name)
+        _pools[name] = pool
+    if old is not None:
+        old.shutdown(wait=False)
+    return pool
+
+
+async def run_in_pool(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a function in the default pool.
+
+    Args:
+        fn: Function to call
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        The function's return value
+    """
+    return await get_pool().run(fn, *args, **kwargs)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get statistics for every pool that has been created.
+
+    Returns:
+        dict mapping pool name to its statistics
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    """Shut down all pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
@@ -0,0 +1,170 @@
+"""Incremental decoding of images that arrive in chunks.
+
+IncrementalImageDecoder takes the bytes of an upload as they arrive. Once the
+header is complete, the image is checked against the size limits, so an oversized
+image is rejected before the rest of it is received or any pixel memory is
+allocated. After that, pixels are decoded chunk by chunk, and decoding finishes
+shortly after the last byte arrives:
+
+- JPEG is decoded incrementally with PIL's JPEG decoder. When a target size is
+  given, draft mode (DCT scaling) is still applied, as in resize_image.
+- Formats that PIL's ``ImageFile.Parser`` can decode incrementally (BMP, GIF,
+  uncompressed TIFF, PPM, ...) go through the parser.
+- Everything else (PNG, WebP, ...) is buffered and returned as bytes, to be
+  decoded lazily as usual.
+"""
+
+import io
+from typing import Optional, Tuple, Union
+
+from PIL import Image, ImageFile, UnidentifiedImageError
+from logic.classifier import (
+    DEFAULT_REDUCING_GAP,
+    ImageProbe,
+    check_image_limits,
+    draft_image,
+    probe_image,
+)
+
+# Give up on parsing the header incrementally after this many bytes, and decode
+# the whole upload at the end instead
+MAX_HEADER_BYTES = 1024 * 1024
+
+
+class IncrementalImageDecoder:
+    """Decode an image from chunks of bytes as they arrive (feed/close interface)."""
+
+    def __init__(
+        self,
+        target_size: Optional[Tuple[int, int]] = None,
+        reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+        max_pixels: Optional[int] = None,
+        max_dimension: Optional[int] = None,
+    ):
+        """
+        Args:
+            target_size: Size the image will be downscaled to, used to plan a
+                reduced-size JPEG decode (default: decode at full size)
+            reducing_gap: Quality knob for the reduced-size decode, see draft_image
+            max_pixels: Maximum width * height (default: no limit)
+            max_dimension: Maximum width or height (default: no limit)
+        """
+        self.target_size = target_size
+        self.reducing_gap = reducing_gap
+        self.max_pixels = max_pixels
+        self.max_dimension = max_dimension
+        self.probe: Optional[ImageProbe] = None
+        self.bytes_received = 0
+        self._header: Optional[bytearray] = bytearray()
+        self._chunks: Optional[list] = None
+        self._parser: Optional[ImageFile.Parser] = None
+        self._image: Optional[Image.Image] = None
+        self._decoder = None
+        self._pending = b""
+        self._finished = False
+
+    @property
+    def mode(self) -> str:
+        """How the image is being decoded: "header", "jpeg", "parser" or "buffer"."""
+        if self._header is not None:
+            return "header"
+        if self._image is not None:
+            return "jpeg"
+        return "parser" if self._parser is not None else "buffer"
+
+    def feed(self, data: bytes) -> None:
+        """
+        Feed the next chunk of the upload.
+
+        Raises:
+            ImageTooLargeError: If the header shows that the image exceeds the limits
+            OSError: If the image data cannot be decoded
+        """
+        self.bytes_received += len(data)
+        if self._header is not None:
+            self._header += data
+            self._try_header()
+        elif self._decoder is not None:
+            self._decode(data)
+        elif self._parser is not None:
+            self._parser.feed(bytes(data))
+        elif self._chunks is not None:
+            self._chunks.append(bytes(data))
+
+    def _try_header(self) -> None:
+        """Parse the header once enough bytes have arrived, and pick a decoding strategy."""
+        try:
+            image = Image.open(io.BytesIO(self._header))
+        except Exception:  # pylint: disable=broad-except
+            # Not enough data yet (or not an image; close() reports that)
+            if len(self._header) > MAX_HEADER_BYTES:
+                self._chunks = [bytes(self._header)]
+                self._header = None
+            return
+
+        self.probe = probe_image(image)
+        check_image_limits(self.probe, self.max_pixels, self.max_dimension)
+
+        data, self._header = bytes(self._header), None
+        if image.format == "JPEG" and len(image.tile) == 1:
+            self._start_jpeg(image, data)
+        elif len(image.tile) == 1 and not (
+            hasattr(image, "load_read") or hasattr(image, "load_seek")
+        ):
+            self._parser = ImageFile.Parser()
+            self._parser.feed(data)
+        else:
+            self._chunks = [data]
+
+    def _start_jpeg(self, image: Image.Image, data: bytes) -> None:
+        """Set up PIL's JPEG decoder on the image, like ImageFile.Parser does."""
+        if self.target_size is not None:
+            draft_image(image, *self.target_size, self.reducing_gap)
+        image.load_prepare()
+        codec, extents, offset, args = image.tile[0]
+        image.tile = []
+        # pylint: disable=protected-access
+        self._decoder = Image._getdecoder(image.mode, codec, args, image.decoderconfig)
+        self._decoder.setimage(image.im, extents)
+        self._image = image
+        self._decode(data[offset:])
+
+    def _decode(self, data: bytes) -> None:
+        """Run the JPEG decoder over the unconsumed bytes."""
+        if self._finished:
+            return
+        self._pending = self._pending + data if self._pending else bytes(data)
+        consumed, error = self._decoder.decode(self._pending)
+        if consumed < 0:
+            # End of image (trailing bytes are ignored)
+            self._pending = b""
+            self._finished = True
+            self._decoder = None
+            if error < 0:
+                raise OSError(f"Decoder error {error} while decoding image")
+            return
+        self._pending = self._pending[consumed:]
+
+    def close(self) -> Union[Image.Image, bytes]:
+        """
+        Finish decoding after the last chunk.
+
+        Returns:
+            The decoded image, or the raw upload bytes if the format can't be
+            decoded incrementally (the caller decodes those as usual)
+
+        Raises:
+            OSError: If the upload is not a complete image
+        """
+        if self._header is not None:
+            raise UnidentifiedImageError("cannot identify image file")
+        if self._chunks is not None:
+            return b"".join(self._chunks)
+        if self._parser is not None:
+            return self._parser.close()
+
+        if not self._finished:
+            self._decode(b"")
+        if not self._finished:
+            raise OSError("image file is truncated")
+        return self._image
@@ -0,0 +1,443 @@
+"""Declarative image preprocessing pipelines.
+
+A pipeline spec is a list of ops, for example::
+
+    [{"op": "rgb"}, {"op": "resize_shorter", "size": 256}, {"op": "center_crop", "size": 224}]
+
+compile_pipeline turns a spec into a PipelinePlan for a given source size and mode,
+before any pixels are decoded:
+
+- All geometry ops (resizes and crops) collapse into one step. Crops become the
+  source box of a single resample (``Image.resize(box=...)``), so the pixels that
+  are cropped away are never resampled. A plan without resizes is a plain crop.
+- Mode conversions run after the resample when it shrinks the image, so they touch
+  fewer pixels. For upscales they run first if they drop bands. Palette and
+  bilevel sources are always converted first, since PIL can only resample them
+  with NEAREST. Sources with an alpha band keep the conversions where the spec
+  puts them, before or after the resizes: PIL resamples them premultiplied by
+  alpha, so converting first (dropping alpha) and converting last give different
+  colours.
+- Conversions to the mode the image already has are dropped.
+- JPEG sources are decoded at a reduced scale (draft mode) when the resample
+  shrinks them enough, as in resize_image.
+
+Ops:
+
+- ``rgb``: convert to RGB
+- ``convert``: convert to ``mode`` (one of PIPELINE_MODES)
+- ``resize``: resize to ``width`` x ``height``
+- ``resize_shorter``: resize so the shorter side is ``size``, keeping the aspect
+- ``resize_longer``: resize so the longer side is ``size``, keeping the aspect
+- ``crop``: crop ``width`` x ``height`` at ``left``, ``top``
+- ``center_crop``: crop ``size`` x ``size`` (or ``width`` x ``height``) from the center
+
+Resize ops take an optional ``profile`` (see resize_image) and ``reducing_gap``.
+Since they merge into one resample, the last values given apply.
+"""
+
+import json
+import math
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+from logic.classifier import (
+    DEFAULT_REDUCING_GAP,
+    DEFAULT_RESIZE_PROFILE,
+    RESIZE_PROFILES,
+    plan_resize,
+)
+
+# Modes the convert op accepts
+PIPELINE_MODES = ("L", "LA", "RGB", "RGBA", "CMYK")
+
+# Maximum number of ops in a spec
+MAX_PIPELINE_OPS = 32
+
+# Source modes that must be converted before resampling (PIL resamples them with NEAREST)
+_CONVERT_FIRST_MODES = ("1", "P", "PA")
+
+# Source modes with an alpha band, which PIL resamples premultiplied
+_ALPHA_MODES = ("LA", "RGBA")
+
+# Required and optional parameters of each op
+_OP_PARAMS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "rgb": ((), ()),
+    "convert": (("mode",), ()),
+    "resize": (("width", "height"), ("profile", "reducing_gap")),
+    "resize_shorter": (("size",), ("profile", "reducing_gap")),
+    "resize_longer": (("size",), ("profile", "reducing_gap")),
+    "crop": (("left", "top", "width", "height"), ()),
+    "center_crop": ((), ("size", "width", "height")),
+}
+
+PIPELINE_OPS = tuple(_OP_PARAMS)
+
+Box = Tuple[float, float, float, float]
+
+
+class PipelineError(ValueError):
+    """Raised for invalid pipeline specs."""
+
+
+def _check_int(op: Dict[str, Any], name: str, minimum: int = 1) -> int:
+    value = op[name]
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        qualifier = "a positive integer" if minimum == 1 else f"an integer >= {minimum}"
+        raise PipelineError(f"{op['op']}: {name} must be {qualifier}")
+    return value
+
+
+def _check_convert(op: Dict[str, Any]) -> None:
+    if op["mode"] not in PIPELINE_MODES:
+        raise PipelineError(f"convert: mode must be one of {', '.join(PIPELINE_MODES)}")
+
+
+def _check_center_crop(op: Dict[str, Any]) -> None:
+    both = "width" in op and "height" in op
+    either = "width" in op or "height" in op
+    if ("size" in op and either) or ("size" not in op and not both):
+        raise PipelineError("center_crop: give either size, or width and height")
+
+
+def _check_resize_options(op: Dict[str, Any]) -> None:
+    if "profile" in op and op["profile"] not in RESIZE_PROFILES:
+        raise PipelineError(f"{op['op']}: profile must be one of {', '.join(RESIZE_PROFILES)}")
+    gap = op.get("reducing_gap", 0)
+    if isinstance(gap, bool) or not isinstance(gap, (int, float)) or 0 < gap < 1:
+        raise PipelineError(f"{op['op']}: reducing_gap must be at least 1.0 (or 0 to disable)")
+
+
+# Checks of each op beyond its parameter names and integer values
+_OP_CHECKS = {
+    "convert": _check_convert,
+    "center_crop": _check_center_crop,
+    "resize": _check_resize_options,
+    "resize_shorter": _check_resize_options,
+    "resize_longer": _check_resize_options,
+}
+
+
+def _parse_op(entry: Any) -> Dict[str, Any]:
+    """Validate one op of a spec."""
+    if not isinstance(entry, Mapping) or entry.get("op") not in _OP_PARAMS:
+        raise PipelineError(f"Each op must be an object with op one of {', '.join(PIPELINE_OPS)}")
+    op = dict(entry)
+    required, optional = _OP_PARAMS[op["op"]]
+    missing = [name for name in required if name not in op]
+    unknown = set(op) - {"op", *required, *optional}
+    if missing:
+        raise PipelineError(f"{op['op']}: missing {', '.join(missing)}")
+    if unknown:
+        raise PipelineError(f"{op['op']}: unknown parameters {', '.join(sorted(unknown))}")
+
+    for name in ("width", "height", "size"):
+        if name in op:
+            _check_int(op, name)
+    for name in ("left", "top"):
+        if name in op:
+            _check_int(op, name, 0)
+    check = _OP_CHECKS.get(op["op"])
+    if check is not None:
+        check(op)
+    return op
+
+
+def parse_pipeline(spec: Union[str, Sequence[Mapping[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Parse and validate a pipeline spec.
+
+    Args:
+        spec: List of op dicts, or its JSON text
+
+    Returns:
+        list of validated op dicts
+
+    Raises:
+        PipelineError: If the spec is malformed
+    """
+    if isinstance(spec, (str, bytes)):
+        try:
+            spec = json.loads(spec)
+        except ValueError as e:
+            raise PipelineError(f"Pipeline spec is not valid JSON: {e}") from e
+    if not isinstance(spec, list) or not spec:
+        raise PipelineError("Pipeline spec must be a non-empty list of ops")
+    if len(spec) > MAX_PIPELINE_OPS:
+        raise PipelineError(f"Pipeline spec has more than {MAX_PIPELINE_OPS} ops")
+    return [_parse_op(entry) for entry in spec]
+
+
+class Convert(NamedTuple):
+    """Convert to another mode (skipped at run time if the image already has it)."""
+
+    mode: str
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        return image if image.mode == self.mode else image.convert(self.mode)
+
+    def describe(self) -> str:
+        return f"convert to {self.mode}"
+
+
+class Crop(NamedTuple):
+    """Crop an integer box, without resampling."""
+
+    box: Tuple[int, int, int, int]
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        return image.crop(self.box)
+
+    def describe(self) -> str:
+        left, top, right, bottom = self.box
+        return f"crop {right - left}x{bottom - top} at ({left}, {top})"
+
+
+class Resample(NamedTuple):
+    """Resample a source box to the output size in one pass."""
+
+    size: Tuple[int, int]
+    box: Box
+    resample: Image.Resampling
+    reducing_gap: Optional[float]
+
+    def apply(self, image: Image.Image, scale: Tuple[float, float] = (1.0, 1.0)) -> Image.Image:
+        box = (
+            self.box[0] * scale[0],
+            self.box[1] * scale[1],
+            self.box[2] * scale[0],
+            self.box[3] * scale[1],
+        )
+        return image.resize(self.size, self.resample, box=box, reducing_gap=self.reducing_gap)
+
+    def describe(self) -> str:
+        left, top, right, bottom = self.box
+        gap = f", reducing gap {self.reducing_gap:g}" if self.reducing_gap else ""
+        return (
+            f"resample {right - left:g}x{bottom - top:g} at ({left:g}, {top:g}) to "
+            f"{self.size[0]}x{self.size[1]} ({self.resample.name}{gap})"
+        )
+
+
+Step = Union[Convert, Crop, Resample]
+
+
+class PipelinePlan(NamedTuple):
+    """Compiled pipeline for one source size and mode (see compile_pipeline)."""
+
+    steps: Tuple[Step, ...]
+    source_size: Tuple[int, int]
+    source_mode: str
+    size: Tuple[int, int]
+    mode: str
+
+    def describe(self) -> List[str]:
+        """Describe the steps of the plan."""
+        return [step.describe() for step in self.steps]
+
+    def _draft(self, image: Image.Image) -> Tuple[float, float]:
+        """Decode a JPEG at a reduced scale if the resample allows it; return the scale."""
+        resample = next((step for step in self.steps if isinstance(step, Resample)), None)
+        if resample is None or not resample.reducing_gap or not getattr(image, "tile", None):
+            return 1.0, 1.0
+        left, top, right, bottom = resample.box
+        gap = resample.reducing_gap
+        width, height = image.size
+        requested = (
+            math.ceil(width * gap * resample.size[0] / (right - left)),
+            math.ceil(height * gap * resample.size[1] / (bottom - top)),
+        )
+        if requested[0] >= width or requested[1] >= height:
+            return 1.0, 1.0
+        result = image.draft(None, requested)
+        if result is None:
+            return 1.0, 1.0
+        box = result[1]
+        return box[2] / width, box[3] / height
+
+    def run(self, image: Image.Image) -> Image.Image:
+        """
+        Run the plan on an image of its source size and mode.
+
+        Args:
+            image: PIL Image object, ideally just opened (so it can be draft-decoded)
+
+        Returns:
+            Image.Image: The processed image
+        """
+        if not isinstance(image, Image.Image):
+            raise ValueError("Input must be a PIL Image object")
+        if (image.size, image.mode) != (self.source_size, self.source_mode):
+            raise ValueError("Image does not match the size and mode the plan was compiled for")
+
+        scale = self._draft(image)
+        for step in self.steps:
+            image = step.apply(image, scale) if isinstance(step, Resample) else step.apply(image)
+        return image
+
+
+def _resized(size: Tuple[int, int], target: int, side) -> Tuple[int, int]:
+    """Scale a size so that side(width, height) becomes target."""
+    scale = target / side(size)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _crop_rect(op: Dict[str, Any], size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """Get the (left, top, width, height) of a crop op on an image of the given size."""
+    if op["op"] == "crop":
+        return op["left"], op["top"], op["width"], op["height"]
+    width, height = op.get("width", op.get("size")), op.get("height", op.get("size"))
+    return (size[0] - width) // 2, (size[1] - height) // 2, width, height
+
+
+class _Geometry:
+    """The size after the geometry ops so far, and the source box it maps to."""
+
+    def __init__(self, size: Tuple[int, int]):
+        self.source_size = tuple(size)
+        self.size = tuple(size)
+        self.box: Box = (0.0, 0.0, float(size[0]), float(size[1]))
+        self.profile = DEFAULT_RESIZE_PROFILE
+        self.reducing_gap = DEFAULT_REDUCING_GAP
+        self.resized = False
+
+    def apply(self, op: Dict[str, Any]) -> None:
+        """Apply a resize or crop op."""
+        if op["op"].startswith("resize"):
+            self._resize(op)
+        else:
+            self._crop(op)
+
+    def _resize(self, op: Dict[str, Any]) -> None:
+        # Resizes only change the size: the box still maps to the same source pixels
+        self.resized = True
+        self.profile = op.get("profile", self.profile)
+        self.reducing_gap = op.get("reducing_gap", self.reducing_gap)
+        if op["op"] == "resize":
+            self.size = (op["width"], op["height"])
+        else:
+            side = min if op["op"] == "resize_shorter" else max
+            self.size = _resized(self.size, op["size"], side)
+
+    def _crop(self, op: Dict[str, Any]) -> None:
+        # Crops are in current coordinates, and narrow the source box
+        left, top, width, height = _crop_rect(op, self.size)
+        if left < 0 or top < 0 or left + width > self.size[0] or top + height > self.size[1]:
+            raise PipelineError(
+                f"{op['op']}: {width}x{height} at ({left}, {top}) is outside the "
+                f"{self.size[0]}x{self.size[1]} image"
+            )
+        scale_x = (self.box[2] - self.box[0]) / self.size[0]
+        scale_y = (self.box[3] - self.box[1]) / self.size[1]
+        self.box = (
+            self.box[0] + left * scale_x,
+            self.box[1] + top * scale_y,
+            self.box[0] + (left + width) * scale_x,
+            self.box[1] + (top + height) * scale_y,
+        )
+        self.size = (width, height)
+
+    @property
+    def box_size(self) -> Tuple[float, float]:
+        return self.box[2] - self.box[0], self.box[3] - self.box[1]
+
+    def steps(self) -> List[Step]:
+        """Get the one geometry step: nothing, a crop, or a resample of the source box."""
+        box_size = self.box_size
+        if box_size == self.size and all(float(value).is_integer() for value in self.box):
+            if self.size == self.source_size:
+                return []
+            return [Crop(tuple(int(value) for value in self.box))]
+        resample, gap = plan_resize(
+            (math.ceil(box_size[0]), math.ceil(box_size[1])),
+            self.size[0],
+            self.size[1],
+            self.reducing_gap,
+            self.profile,
+        )
+        return [Resample(self.size, self.box, resample, gap)]
+
+
+def _place_conversions(
+    conversions: Sequence[Tuple[str, bool]], geometry: _Geometry, mode: str
+) -> Tuple[List[Step], str]:
+    """
+    Put the conversions around the geometry step, dropping those that are no-ops.
+
+    Args:
+        conversions: Target modes, and whether a resize comes before them in the spec
+        geometry: Geometry of the whole pipeline
+        mode: Source mode
+
+    Returns:
+        The plan steps, and the output mode
+    """
+    steps = geometry.steps()
+    # Resampling premultiplies alpha, so for alpha sources conversions stay on the
+    # side of the resizes that the spec puts them
+    spec_order = mode in _ALPHA_MODES and any(isinstance(step, Resample) for step in steps)
+
+    # Drop conversions to the mode the image already has at that point
+    before: List[Step] = []
+    after: List[Step] = []
+    mode_now = mode
+    for target, after_resize in conversions:
+        if target != mode_now:
+            (after if spec_order and after_resize else before).append(Convert(target))
+            mode_now = target
+
+    if spec_order:
+        return before + steps + after, mode_now
+    # Convert after shrinking, before enlarging if it drops bands
+    box_size = geometry.box_size
+    shrinks = geometry.size[0] * geometry.size[1] <= box_size[0] * box_size[1]
+    fewer_bands = Image.getmodebands(mode_now) < Image.getmodebands(mode)
+    if mode in _CONVERT_FIRST_MODES or (not shrinks and fewer_bands):
+        return before + steps, mode_now
+    return steps + before, mode_now
+
+
+def compile_pipeline(
+    spec: Union[str, Sequence[Mapping[str, Any]]],
+    size: Tuple[int, int],
+    mode: str,
+) -> PipelinePlan:
+    """
+    Compile a pipeline spec into a plan for a source image.
+
+    Args:
+        spec: Pipeline spec (see parse_pipeline)
+        size: Source (width, height), e.g. from probe_image
+        mode: Source mode
+
+    Returns:
+        PipelinePlan: Plan whose run() applies the pipeline
+
+    Raises:
+        PipelineError: If the spec is malformed or a crop falls outside the image
+    """
+    geometry = _Geometry(size)
+    conversions: List[Tuple[str, bool]] = []
+    for op in parse_pipeline(spec):
+        if op["op"] in ("rgb", "convert"):
+            conversions.append((op.get("mode", "RGB"), geometry.resized))
+        else:
+            geometry.apply(op)
+
+    steps, output_mode = _place_conversions(conversions, geometry, mode)
+    return PipelinePlan(tuple(steps), tuple(size), mode, geometry.size, output_mode)
+
+
+def run_pipeline(image: Image.Image, spec: Union[str, Sequence[Mapping[str, Any]]]) -> Image.Image:
+    """
+    Compile a pipeline spec for an image and run it.
+
+    Args:
+        image: PIL Image object, ideally just opened (so it can be draft-decoded)
+        spec: Pipeline spec (see parse_pipeline)
+
+    Returns:
+        Image.Image: The processed image
+    """
+    if not isinstance(image, Image.Image):
+        raise ValueError("Input must be a PIL Image object")
+    return compile_pipeline(spec, image.size, image.mode).run(image)
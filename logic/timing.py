@@ -0,0 +1,104 @@
+"""Lightweight per-request stage timing.
+
+Code marks stages with ``with stage("decode"):`` and bumps counters with
+``count("decoded_pixels", n)``. These go to the StageRecorder active in the current
+context, or are skipped (at the cost of one context variable lookup) when nothing
+is recording. Worker pool calls record into their own recorder. That recorder is
+returned to the caller and merged there, so this also works with process pools.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class StageRecorder:
+    """Collects (stage, seconds) timings and named counters for one unit of work."""
+
+    __slots__ = ("stages", "counts")
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.counts: Dict[str, int] = {}
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        """Record the duration of one stage."""
+        self.stages.append((name, seconds))
+
+    def add_count(self, name: str, value: int) -> None:
+        """Add to a named counter."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, other: "StageRecorder") -> None:
+        """Add the stages and counters of another recorder to this one."""
+        self.stages.extend(other.stages)
+        for name, value in other.counts.items():
+            self.add_count(name, value)
+
+    def totals(self) -> Dict[str, float]:
+        """Get the total seconds per stage name, in order of first appearance."""
+        totals: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+
+_recorder: contextvars.ContextVar = contextvars.ContextVar("stage_recorder", default=None)
+
+
+def current_recorder() -> Optional[StageRecorder]:
+    """Get the recorder active in the current context, if any."""
+    return _recorder.get()
+
+
+@contextmanager
+def recording(recorder: Optional[StageRecorder] = None) -> Iterator[StageRecorder]:
+    """
+    Make a recorder active for the duration of a block.
+
+    Args:
+        recorder: Recorder to activate (default: a new one)
+
+    Yields:
+        StageRecorder: The active recorder
+    """
+    recorder = recorder if recorder is not None else StageRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block as a named stage in the active recorder.
+
+    Args:
+        name: Stage name (e.g. "decode")
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_stage(name, time.perf_counter() - started)
+
+
+def count(name: str, value: int) -> None:
+    """
+    Add to a named counter in the active recorder.
+
+    Args:
+        name: Counter name (e.g. "decoded_pixels")
+        value: Amount to add
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.add_count(name, value)
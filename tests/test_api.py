@@ -1,10 +1,20 @@
 """Tests for the API module."""
 
+import hashlib
+import json
+import time
 import pytest
 from fastapi.testclient import TestClient
+from api import api as api_module
 from api.api import app
+from logic.cache import ResultCache
 from PIL import Image
+import gzip
 import io
+import zlib
+import numpy as np
+import tarfile
+import zipfile
 
 
 @pytest.fixture
@@ -37,6 +47,50 @@ def test_health_endpoint(client):
     assert response.json() == {"status": "healthy"}
 
 
+def _wait_until_ready(client, timeout=20.0):
+    """Poll /ready until the warm-up has finished."""
+    deadline = time.monotonic() + timeout
+    response = client.get("/ready")
+    while response.json()["status"] == "starting" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get("/ready")
+    return response
+
+
+def test_ready_endpoint_flips_after_warm_up(monkeypatch):
+    """Test that /ready is 503 until the startup warm-up has run, unlike /health."""
+    monkeypatch.setattr(api_module, "readiness", api_module.Readiness())
+    client = TestClient(app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting"}
+    assert client.get("/health").status_code == 200
+
+    with TestClient(app) as started:
+        response = _wait_until_ready(started)
+    assert response.status_code == 200
+    status = response.json()
+    assert status["status"] == "ready"
+    assert status["warmup_ms"] > 0
+    for phase in ("plugins", "template", "open", "resize", "predict"):
+        assert phase in status["phases_ms"]
+
+
+def test_ready_endpoint_reports_failed_warm_up(monkeypatch):
+    """Test that a failed warm-up keeps /ready at 503."""
+
+    def fail():
+        raise RuntimeError("no model")
+
+    monkeypatch.setattr(api_module, "readiness", api_module.Readiness())
+    monkeypatch.setattr(api_module, "_warm_up_jobs", fail)
+    with TestClient(app) as client:
+        response = _wait_until_ready(client)
+    assert response.status_code == 503
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "no model"
+
+
 def test_predict_endpoint_success(client, sample_image_bytes):
     """Test predict endpoint with valid image."""
     files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
@@ -62,6 +116,63 @@ def test_predict_endpoint_invalid_file(client):
     assert response.status_code == 400
 
 
+def test_predict_batch_endpoint_success(client, sample_image_bytes):
+    """Test batch predict endpoint with several images."""
+    contents = sample_image_bytes.getvalue()
+    files = [
+        ("files", ("a.jpg", contents, "image/jpeg")),
+        ("files", ("b.txt", b"not an image", "text/plain")),
+        ("files", ("c.jpg", contents, "image/jpeg")),
+    ]
+    response = client.post("/predict_batch", files=files)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 3
+    assert [item["filename"] for item in data["results"]] == ["a.jpg", "b.txt", "c.jpg"]
+    assert [item["success"] for item in data["results"]] == [True, False, True]
+    assert "predicted_class" in data["results"][0]
+    assert "error" in data["results"][1]
+
+
+def test_predict_batch_endpoint_with_zip(client, sample_image_bytes):
+    """Test batch predict endpoint with a zip archive."""
+    archive_bytes = io.BytesIO()
+    with zipfile.ZipFile(archive_bytes, "w") as archive:
+        archive.writestr("one.jpg", sample_image_bytes.getvalue())
+        archive.writestr("two.jpg", sample_image_bytes.getvalue())
+    files = [("files", ("images.zip", archive_bytes.getvalue(), "application/zip"))]
+    response = client.post("/predict_batch", files=files)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["filename"] for item in results] == ["images.zip/one.jpg", "images.zip/two.jpg"]
+    assert all(item["success"] for item in results)
+
+
+def test_predict_batch_endpoint_with_tar(client, sample_image_bytes):
+    """Test batch predict endpoint with a tar archive."""
+    contents = sample_image_bytes.getvalue()
+    archive_bytes = io.BytesIO()
+    with tarfile.open(fileobj=archive_bytes, mode="w:gz") as archive:
+        info = tarfile.TarInfo("one.jpg")
+        info.size = len(contents)
+        archive.addfile(info, io.BytesIO(contents))
+    files = [("files", ("images.tar.gz", archive_bytes.getvalue(), "application/gzip"))]
+    response = client.post("/predict_batch", files=files)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["filename"] == "images.tar.gz/one.jpg"
+    assert results[0]["success"] is True
+
+
+def test_predict_batch_endpoint_no_files(client):
+    """Test batch predict endpoint without files."""
+    response = client.post("/predict_batch")
+    assert response.status_code == 422
+
+
 def test_resize_endpoint_success(client, sample_image_bytes):
     """Test resize endpoint with valid inputs."""
     files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
@@ -75,6 +186,49 @@ def test_resize_endpoint_success(client, sample_image_bytes):
     assert result["new_size"]["height"] == 50
 
 
+def test_resize_endpoint_returns_image(client, sample_image_bytes):
+    """Test resize endpoint streaming back the resized image."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "40"}
+    response = client.post("/resize?return=image&format=png", files=files, data=data)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["X-Original-Width"] == "100"
+    assert int(response.headers["content-length"]) == len(response.content)
+    resized = Image.open(io.BytesIO(response.content))
+    assert resized.format == "PNG"
+    assert resized.size == (50, 40)
+
+
+def test_resize_endpoint_returns_image_from_accept_header(client, sample_image_bytes):
+    """Test resize endpoint negotiating the image format from Accept."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "40"}
+    headers = {"Accept": "image/webp,*/*;q=0.8"}
+    response = client.post("/resize", files=files, data=data, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).format == "WEBP"
+
+
+def test_resize_endpoint_invalid_format(client, sample_image_bytes):
+    """Test resize endpoint with an unsupported output format."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "40"}
+    response = client.post("/resize?format=bmp", files=files, data=data)
+    assert response.status_code == 400
+
+
+def test_resize_endpoint_invalid_quality(client, sample_image_bytes):
+    """Test resize endpoint with an out-of-range quality."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "40"}
+    response = client.post("/resize?return=image&quality=101", files=files, data=data)
+    assert response.status_code == 400
+
+
 def test_resize_endpoint_missing_dimensions(client, sample_image_bytes):
     """Test resize endpoint without dimensions."""
     files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
@@ -123,6 +277,333 @@ def test_preprocess_endpoint_with_custom_dimensions(client, sample_image_bytes):
     assert result["new_size"]["height"] == 128
 
 
+def test_preprocess_endpoint_with_reducing_gap(client, sample_image_bytes):
+    """Test preprocess endpoint with a custom reducing gap."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "32", "height": "32", "reducing_gap": "2.0"}
+    response = client.post("/preprocess", files=files, data=data)
+
+    assert response.status_code == 200
+    assert response.json()["original_size"]["width"] == 100
+
+
+def test_resize_endpoint_with_profile(client, sample_image_bytes):
+    """Test resize and preprocess endpoints with a resize profile."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "40", "profile": "fast"}
+    response = client.post("/resize?return=image&format=png", files=files, data=data)
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).size == (50, 40)
+
+    sample_image_bytes.seek(0)
+    data = {"width": "300", "height": "300", "profile": "balanced"}
+    response = client.post("/preprocess?return=tensor", files=files, data=data)
+    assert response.status_code == 200
+    assert np.load(io.BytesIO(response.content)).shape == (1, 3, 300, 300)
+
+
+def test_resize_endpoint_invalid_profile(client, sample_image_bytes):
+    """Test resize and preprocess endpoints with an unknown profile."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    for endpoint in ("/resize", "/preprocess"):
+        response = client.post(
+            endpoint, files=files, data={"width": "50", "height": "50", "profile": "best"}
+        )
+        assert response.status_code == 400
+        assert "fast, balanced, quality" in response.json()["detail"]
+
+
+def test_preprocess_endpoint_with_fit(client):
+    """Test the preprocess endpoint letterboxing and center cropping a wide image."""
+    image = Image.new("RGB", (200, 100), "red")
+    image.paste("blue", (100, 0, 200, 100))
+    img_bytes = io.BytesIO()
+    image.save(img_bytes, format="PNG")
+    files = {"file": ("wide.png", img_bytes.getvalue(), "image/png")}
+
+    data = {"width": "40", "height": "40", "fit": "contain"}
+    response = client.post("/preprocess?return=image&format=png", files=files, data=data)
+    assert response.status_code == 200
+    contain = Image.open(io.BytesIO(response.content))
+    assert contain.size == (40, 40)
+    assert contain.getpixel((20, 2)) == (0, 0, 0)
+
+    data = {"width": "40", "height": "40", "fit": "cover"}
+    response = client.post("/preprocess?return=tensor&dtype=uint8", files=files, data=data)
+    assert response.status_code == 200
+    tensor = np.load(io.BytesIO(response.content))
+    assert tensor.shape == (1, 40, 40, 3)
+    assert tensor[0, 20, 0].tolist() == [255, 0, 0]
+    assert tensor[0, 20, 39].tolist() == [0, 0, 255]
+
+
+def test_fit_endpoints_invalid_fit(client, sample_image_bytes):
+    """Test preprocess and classify_and_resize with an unknown fit mode."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    for endpoint in ("/preprocess", "/classify_and_resize"):
+        response = client.post(
+            endpoint, files=files, data={"width": "50", "height": "50", "fit": "fill"}
+        )
+        assert response.status_code == 400
+        assert "stretch, cover, contain" in response.json()["detail"]
+
+
+def test_thumbnails_endpoint_zip(client, sample_image_bytes):
+    """Test the thumbnails endpoint returning a zip archive of every size."""
+    files = {"file": ("cat.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"sizes": "64, 32x16,50"}
+    response = client.post("/thumbnails?format=png", files=files, data=data)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["x-original-width"] == "100"
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["cat_64x64.png", "cat_32x16.png", "cat_50x50.png"]
+        thumbnail = Image.open(io.BytesIO(archive.read("cat_32x16.png")))
+        assert thumbnail.format == "PNG"
+        assert thumbnail.size == (32, 16)
+
+
+def test_thumbnails_endpoint_multipart(client, sample_image_bytes):
+    """Test the thumbnails endpoint returning a multipart/mixed body."""
+    files = {"file": ("cat.jpg", sample_image_bytes, "image/jpeg")}
+    response = client.post(
+        "/thumbnails", files=files, data={"sizes": "40,20"}, headers={"Accept": "multipart/mixed"}
+    )
+    assert response.status_code == 200
+    media_type, boundary = response.headers["content-type"].split("; boundary=")
+    assert media_type == "multipart/mixed"
+
+    parts = response.content.split(f"--{boundary}".encode())
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    sizes = []
+    for part in parts[1:-1]:
+        headers, body = part.strip(b"\r\n").split(b"\r\n\r\n", 1)
+        assert b"Content-Type: image/jpeg" in headers
+        sizes.append(Image.open(io.BytesIO(body)).size)
+    assert sizes == [(40, 40), (20, 20)]
+
+
+@pytest.mark.parametrize(
+    "sizes, query, detail",
+    [
+        ("", "", "Sizes must list"),
+        (",".join(["8"] * 17), "", "Sizes must list"),
+        ("64,big", "", "Size must be"),
+        ("64", "?return=tar", "Return must be"),
+        ("64", "?format=gif", "Format must be"),
+    ],
+)
+def test_thumbnails_endpoint_invalid(client, sample_image_bytes, sizes, query, detail):
+    """Test the thumbnails endpoint with invalid sizes and options."""
+    files = {"file": ("cat.jpg", sample_image_bytes, "image/jpeg")}
+    response = client.post(f"/thumbnails{query}", files=files, data={"sizes": sizes})
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+RAW_HEADERS = {"Content-Type": "application/octet-stream"}
+
+
+def test_raw_endpoints_match_multipart(client, sample_image_bytes):
+    """Test that each /raw variant answers like its multipart endpoint."""
+    image = sample_image_bytes.getvalue()
+    cases = [
+        ("/predict", {}),
+        ("/resize", {"width": "40", "height": "30"}),
+        ("/preprocess", {"width": "32", "height": "32", "fit": "cover"}),
+        ("/classify_and_resize", {"width": "40", "height": "30"}),
+    ]
+    for endpoint, params in cases:
+        files = {"file": ("test.jpg", image, "image/jpeg")}
+        multipart = client.post(endpoint, files=files, data=params)
+        raw = client.post(
+            f"{endpoint}/raw",
+            params={**params, "filename": "test.jpg"},
+            content=image,
+            headers={**RAW_HEADERS, "Cache-Control": "no-cache"},
+        )
+        assert raw.status_code == multipart.status_code == 200
+        # Predictions are random, so only their presence is compared
+        raw_result, multipart_result = raw.json(), multipart.json()
+        assert (raw_result.pop("predicted_class", None) is None) == (
+            multipart_result.pop("predicted_class", None) is None
+        )
+        assert raw_result == multipart_result
+
+
+def test_raw_endpoints_with_content_encoding(client, sample_image_bytes):
+    """Test raw bodies sent with gzip and deflate Content-Encoding."""
+    image = sample_image_bytes.getvalue()
+    headers = {**RAW_HEADERS, "Content-Encoding": "gzip"}
+    response = client.post(
+        "/resize/raw?width=20&height=10&return=image&format=png",
+        content=gzip.compress(image),
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).size == (20, 10)
+
+    headers = {**RAW_HEADERS, "Content-Encoding": "deflate"}
+    response = client.post("/predict/raw", content=zlib.compress(image), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["filename"] is None
+
+    response = client.post("/preprocess/raw?return=tensor", content=image, headers=headers)
+    assert response.status_code == 400
+    assert "Invalid deflate body" in response.json()["detail"]
+
+
+def test_raw_endpoints_share_the_result_cache(client, sample_image_bytes):
+    """Test that a raw upload hits the cache entry of the same multipart upload."""
+    api_module.get_cache().clear()
+    image = sample_image_bytes.getvalue()
+    files = {"file": ("test.jpg", image, "image/jpeg")}
+    assert client.post("/predict", files=files).headers["X-Cache"] == "MISS"
+    headers = {**RAW_HEADERS, "Content-Encoding": "gzip"}
+    response = client.post("/predict/raw", content=gzip.compress(image), headers=headers)
+    assert response.headers["X-Cache"] == "HIT"
+
+
+@pytest.mark.parametrize("endpoint", ["/predict/raw", "/resize/raw?width=8&height=8"])
+def test_raw_endpoints_errors(client, endpoint):
+    """Test raw endpoints with an empty body, an unsupported coding, and a non-image."""
+    response = client.post(endpoint, content=b"", headers=RAW_HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Request body is empty"
+
+    headers = {**RAW_HEADERS, "Content-Encoding": "br"}
+    assert client.post(endpoint, content=b"x", headers=headers).status_code == 415
+    assert client.post(endpoint, content=b"not an image", headers=RAW_HEADERS).status_code == 400
+
+
+def test_raw_endpoint_validates_query_parameters(client, sample_image_bytes):
+    """Test that raw endpoints take their parameters from the query string."""
+    image = sample_image_bytes.getvalue()
+    assert client.post("/resize/raw?width=8", content=image).status_code == 422
+    response = client.post("/preprocess/raw?fit=fill", content=image)
+    assert response.status_code == 400
+
+
+def test_pipeline_endpoint(client, sample_image_bytes):
+    """Test running a pipeline spec, as JSON with the plan or as an image."""
+    spec = json.dumps(
+        [{"op": "convert", "mode": "L"}, {"op": "resize_shorter", "size": 40}]
+        + [{"op": "center_crop", "size": 32}]
+    )
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    response = client.post("/pipeline", files=files, data={"spec": spec})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["new_size"] == {"width": 32, "height": 32, "mode": "L"}
+    assert result["original_size"]["mode"] == "RGB"
+    assert result["plan"][0].startswith("resample 80x80 at (10, 10) to 32x32")
+    assert result["plan"][1] == "convert to L"
+
+    sample_image_bytes.seek(0)
+    response = client.post("/pipeline?format=png", files=files, data={"spec": spec})
+    assert response.status_code == 200
+    image = Image.open(io.BytesIO(response.content))
+    assert (image.size, image.mode) == ((32, 32), "L")
+
+
+def test_pipeline_endpoint_errors(client, sample_image_bytes, monkeypatch):
+    """Test invalid specs, crops outside the image and oversized outputs."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    response = client.post("/pipeline", files=files, data={"spec": '[{"op": "blur"}]'})
+    assert response.status_code == 400
+    assert "op one of" in response.json()["detail"]
+
+    spec = json.dumps([{"op": "center_crop", "size": 200}])
+    response = client.post("/pipeline", files=files, data={"spec": spec})
+    assert response.status_code == 400
+    assert "outside the 100x100 image" in response.json()["detail"]
+
+    monkeypatch.setattr(api_module.limits, "MAX_IMAGE_DIMENSION", 1000)
+    spec = json.dumps([{"op": "resize", "width": 2000, "height": 10}])
+    response = client.post("/pipeline", files=files, data={"spec": spec})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("endpoint", ["/resize", "/preprocess", "/classify_and_resize"])
+@pytest.mark.parametrize("width,height", [(60000, 10), (4000, 4000)])
+def test_oversized_target_sizes_are_rejected(
+    client, sample_image_bytes, monkeypatch, endpoint, width, height
+):
+    """Test that target sizes over the image limits get 413 before anything is allocated."""
+    monkeypatch.setattr(api_module.limits, "MAX_IMAGE_PIXELS", 10_000_000)
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": width, "height": height}
+    response = client.post(endpoint, files=files, data=data)
+    assert response.status_code == 413
+    assert "exceed" in response.json()["detail"]
+
+    raw = client.post(
+        f"{endpoint}/raw", content=sample_image_bytes.getvalue(), params=data, headers=RAW_HEADERS
+    )
+    assert raw.status_code == 413
+
+
+def test_resize_endpoint_invalid_reducing_gap(client, sample_image_bytes):
+    """Test resize endpoint with a reducing gap below 1.0."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "50", "reducing_gap": "0.5"}
+    response = client.post("/resize", files=files, data=data)
+    assert response.status_code == 400
+
+
+def test_preprocess_endpoint_returns_image(client, sample_image_bytes):
+    """Test preprocess endpoint streaming back the preprocessed image."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    response = client.post("/preprocess?return=image&quality=70", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    preprocessed = Image.open(io.BytesIO(response.content))
+    assert preprocessed.size == (224, 224)
+    assert preprocessed.mode == "RGB"
+
+
+def test_preprocess_endpoint_returns_tensor(client, sample_image_bytes):
+    """Test preprocess endpoint returning a .npy tensor."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "32", "height": "16"}
+    response = client.post("/preprocess?return=tensor", files=files, data=data)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-npy"
+    tensor = np.load(io.BytesIO(response.content))
+    assert tensor.shape == (1, 3, 16, 32)
+    assert tensor.dtype == np.float32
+
+
+def test_preprocess_endpoint_returns_uint8_tensor_from_accept_header(client, sample_image_bytes):
+    """Test preprocess endpoint negotiating a uint8 tensor from Accept."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    headers = {"Accept": "application/x-npy"}
+    response = client.post("/preprocess?dtype=uint8", files=files, headers=headers)
+
+    assert response.status_code == 200
+    tensor = np.load(io.BytesIO(response.content))
+    assert tensor.shape == (1, 224, 224, 3)
+    assert tensor.dtype == np.uint8
+
+
+def test_resize_endpoint_rejects_tensor_return(client, sample_image_bytes):
+    """Test that resize endpoint does not offer tensor output."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "50", "height": "40"}
+    response = client.post("/resize?return=tensor", files=files, data=data)
+    assert response.status_code == 400
+
+
+def test_preprocess_endpoint_invalid_return(client, sample_image_bytes):
+    """Test preprocess endpoint with an unknown return type."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    response = client.post("/preprocess?return=xml", files=files)
+    assert response.status_code == 400
+
+
 def test_preprocess_endpoint_invalid_dimensions(client, sample_image_bytes):
     """Test preprocess endpoint with invalid dimensions."""
     files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
@@ -145,6 +626,18 @@ def test_classify_and_resize_endpoint_success(client, sample_image_bytes):
     assert result["new_size"]["height"] == 64
 
 
+@pytest.mark.parametrize("fit", ["cover", "contain"])
+def test_classify_and_resize_endpoint_with_fit(client, sample_image_bytes, fit):
+    """Test classify_and_resize endpoint with a fit mode."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    data = {"width": "64", "height": "32", "fit": fit}
+    response = client.post("/classify_and_resize", files=files, data=data)
+
+    assert response.status_code == 200
+    assert "predicted_class" in response.json()
+    assert response.json()["new_size"] == {"width": 64, "height": 32}
+
+
 def test_classify_and_resize_endpoint_missing_dimensions(client, sample_image_bytes):
     """Test classify_and_resize endpoint without dimensions."""
     files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
@@ -174,3 +667,177 @@ def test_grayscale_image_conversion(client):
     assert response.status_code == 200
     result = response.json()
     assert result["new_size"]["mode"] == "RGB"
+
+
+def _unique_image_bytes(color):
+    """Create PNG bytes that no other test uploads."""
+    image = Image.new("RGB", (40, 30), color=color)
+    img_bytes = io.BytesIO()
+    image.save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
+def test_predict_endpoint_uses_cache(client):
+    """Test that a repeated upload is served from the result cache."""
+    contents = _unique_image_bytes((1, 2, 3))
+    first = client.post("/predict", files={"file": ("a.png", contents, "image/png")})
+    second = client.post("/predict", files={"file": ("b.png", contents, "image/png")})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json()["predicted_class"] == first.json()["predicted_class"]
+    assert second.json()["filename"] == "b.png"
+
+
+def test_resize_endpoint_cache_keyed_by_parameters(client):
+    """Test that different parameters do not share cache entries."""
+    contents = _unique_image_bytes((4, 5, 6))
+    files = {"file": ("a.png", contents, "image/png")}
+    first = client.post("/resize", files=files, data={"width": "10", "height": "10"})
+    second = client.post("/resize", files=files, data={"width": "20", "height": "10"})
+    third = client.post("/resize", files=files, data={"width": "10", "height": "10"})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "MISS"
+    assert third.headers["X-Cache"] == "HIT"
+
+
+def test_cache_opt_out_header(client):
+    """Test bypassing the result cache with Cache-Control: no-cache."""
+    contents = _unique_image_bytes((7, 8, 9))
+    files = {"file": ("a.png", contents, "image/png")}
+    client.post("/preprocess", files=files)
+    response = client.post("/preprocess", files=files, headers={"Cache-Control": "no-cache"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "BYPASS"
+
+
+def test_predict_by_hash(client):
+    """Test looking up a /predict result by content hash before and after the upload."""
+    contents = _unique_image_bytes((10, 11, 12))
+    digest = hashlib.sha256(contents).hexdigest()
+
+    response = client.get(f"/predict/by-hash/{digest}")
+    assert response.status_code == 404
+
+    uploaded = client.post("/predict", files={"file": ("a.png", contents, "image/png")})
+    response = client.get(f"/predict/by-hash/{digest.upper()}")
+    assert response.status_code == 200
+    assert response.json() == {**uploaded.json(), "filename": None}
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.headers["ETag"] == uploaded.headers["ETag"]
+
+
+def test_classify_and_resize_by_hash_keyed_by_parameters(client):
+    """Test that a by-hash lookup only finds results computed with the same parameters."""
+    contents = _unique_image_bytes((13, 14, 15))
+    digest = hashlib.sha256(contents).hexdigest()
+    files = {"file": ("a.png", contents, "image/png")}
+    uploaded = client.post("/classify_and_resize", files=files, data={"width": 20, "height": 10})
+
+    url = f"/classify_and_resize/by-hash/{digest}"
+    response = client.get(url, params={"width": 20, "height": 10})
+    assert response.status_code == 200
+    assert response.json() == {**uploaded.json(), "filename": None}
+    assert response.headers["ETag"] == uploaded.headers["ETag"]
+    assert client.get(url, params={"width": 20, "height": 11}).status_code == 404
+    assert client.get(url, params={"width": 20, "height": 10, "fit": "cover"}).status_code == 404
+
+
+@pytest.mark.parametrize(
+    "url,status_code",
+    [
+        ("/predict/by-hash/abc", 400),
+        (f"/predict/by-hash/{'g' * 64}", 400),
+        (f"/classify_and_resize/by-hash/{'0' * 64}?width=0&height=10", 400),
+        (f"/classify_and_resize/by-hash/{'0' * 64}?width=10&height=10&fit=crop", 400),
+        (f"/classify_and_resize/by-hash/{'0' * 64}", 422),
+    ],
+)
+def test_by_hash_errors(client, url, status_code):
+    """Test that malformed hashes and parameters are rejected."""
+    assert client.get(url).status_code == status_code
+
+
+def test_by_hash_with_cache_disabled(client, monkeypatch):
+    """Test that lookups miss, and uploads still get ETags, when the cache is disabled."""
+    monkeypatch.setattr(api_module, "get_cache", lambda: ResultCache(max_bytes=0))
+    contents = _unique_image_bytes((16, 17, 18))
+    response = client.post("/predict", files={"file": ("a.png", contents, "image/png")})
+    assert response.headers["X-Cache"] == "BYPASS"
+    assert response.headers["ETag"]
+
+    digest = hashlib.sha256(contents).hexdigest()
+    assert client.get(f"/predict/by-hash/{digest}").status_code == 404
+
+
+def test_etags_keyed_by_content_and_parameters(client):
+    """Test that ETags match across upload kinds and differ across parameters."""
+    contents = _unique_image_bytes((19, 20, 21))
+    files = {"file": ("a.png", contents, "image/png")}
+    multipart = client.post("/predict", files=files).headers["ETag"]
+    raw = client.post("/predict/raw", content=contents, headers=RAW_HEADERS).headers["ETag"]
+    other = client.post("/predict", files={"file": ("a.png", _unique_image_bytes((0, 0, 1)))})
+    assert multipart == raw
+    assert multipart.startswith('"') and multipart.endswith('"')
+    assert other.headers["ETag"] != multipart
+
+    etags = {
+        client.post("/classify_and_resize", files=files, data=data).headers["ETag"]
+        for data in (
+            {"width": 10, "height": 10},
+            {"width": 10, "height": 20},
+            {"width": 10, "height": 10, "fit": "contain"},
+        )
+    }
+    assert len(etags) == 3
+    assert multipart not in etags
+
+
+@pytest.mark.parametrize(
+    "request_kwargs",
+    [
+        {"method": "POST", "url": "/predict"},
+        {"method": "POST", "url": "/classify_and_resize", "data": {"width": 10, "height": 10}},
+    ],
+)
+def test_if_none_match_returns_not_modified(client, request_kwargs):
+    """Test that a matching If-None-Match skips the job and answers 304."""
+    files = {"file": ("a.png", _unique_image_bytes((22, 23, 24)), "image/png")}
+    etag = client.request(**request_kwargs, files=files).headers["ETag"]
+
+    for header in (etag, f'"other", W/{etag}', "*"):
+        response = client.request(**request_kwargs, files=files, headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+    response = client.request(**request_kwargs, files=files, headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_by_hash_if_none_match(client):
+    """Test that a by-hash lookup answers 304 for a known ETag, even after eviction."""
+    contents = _unique_image_bytes((25, 26, 27))
+    etag = client.post("/predict", files={"file": ("a.png", contents, "image/png")}).headers["ETag"]
+    api_module.get_cache().clear()
+
+    url = f"/predict/by-hash/{hashlib.sha256(contents).hexdigest()}"
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url).status_code == 404
+
+
+def test_stats_endpoint(client, sample_image_bytes):
+    """Test the stats endpoint reports worker pool usage."""
+    files = {"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+    client.post("/predict", files=files)
+
+    response = client.get("/stats")
+    assert response.status_code == 200
+    executor = response.json()["executor"]
+    assert "default" in executor
+    assert executor["default"]["completed"] >= 1
+    assert "queue_depth" in executor["default"]
+    assert "wait_ms" in executor["default"]
+    assert "hits" in response.json()["cache"]
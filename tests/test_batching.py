@@ -0,0 +1,156 @@
+"""Tests for the micro-batching module."""
+
+import asyncio
+import io
+import httpx
+import pytest
+from PIL import Image
+from api import api
+from logic.batching import MicroBatcher, batcher_from_env
+from logic.executor import WorkerPool
+from logic.timing import recording
+
+
+@pytest.fixture
+def pool():
+    """Create a small thread pool for batches."""
+    worker_pool = WorkerPool("batching-test", "thread", 2)
+    yield worker_pool
+    worker_pool.shutdown()
+
+
+def _double_all(items):
+    """Batch function that doubles every item."""
+    return [item * 2 for item in items]
+
+
+def _fail(items):
+    """Batch function that always fails."""
+    raise RuntimeError(f"failed on {len(items)} items")
+
+
+def test_concurrent_calls_share_a_batch(pool):
+    """Test that concurrent submits are flushed together after max_wait."""
+    observed = []
+    batcher = MicroBatcher(
+        _double_all,
+        max_batch_size=100,
+        max_wait=0.02,
+        pool=pool,
+        observer=lambda size, delays: observed.append((size, len(delays))),
+    )
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(value) for value in range(5)))
+
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8]
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["items"] == 5
+    assert stats["batch_sizes"] == {"5": 1}
+    assert stats["queue_delay_ms"]["max"] >= 0
+    assert observed == [(5, 5)]
+
+
+def test_full_batch_flushes_without_waiting(pool):
+    """Test that reaching max_batch_size flushes before max_wait."""
+    batcher = MicroBatcher(_double_all, max_batch_size=3, max_wait=60.0, pool=pool)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(value) for value in range(3))), timeout=5
+        )
+
+    assert asyncio.run(run()) == [0, 2, 4]
+    assert batcher.stats()["batch_sizes"] == {"3": 1}
+
+
+def test_cancelled_call_is_dropped_from_batch(pool):
+    """Test that cancelling a waiting caller removes it from the batch."""
+    batcher = MicroBatcher(_double_all, max_batch_size=100, max_wait=0.02, pool=pool)
+
+    async def run():
+        cancelled = asyncio.ensure_future(batcher.submit(1))
+        kept = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept, cancelled.cancelled()
+
+    assert asyncio.run(run()) == (4, True)
+    stats = batcher.stats()
+    assert stats["cancelled"] == 1
+    assert stats["batch_sizes"] == {"1": 1}
+
+
+def test_batch_errors_reach_every_caller(pool):
+    """Test that a failing batch raises in every waiting caller."""
+    batcher = MicroBatcher(_fail, max_batch_size=2, max_wait=1.0, pool=pool)
+
+    async def run():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert [str(error) for error in errors] == ["failed on 2 items"] * 2
+    assert batcher.stats()["failed"] == 2
+
+
+def test_batch_stages_are_recorded(pool):
+    """Test that the batch wait and pool stages reach the caller's recorder."""
+    batcher = MicroBatcher(_double_all, max_batch_size=1, pool=pool)
+
+    async def run():
+        with recording() as recorder:
+            await batcher.submit(1)
+        return recorder
+
+    assert {"batch_wait", "queue"} <= set(asyncio.run(run()).totals())
+
+
+def test_invalid_configuration():
+    """Test that invalid batch sizes and waits are rejected."""
+    with pytest.raises(ValueError, match="batch size"):
+        MicroBatcher(_double_all, max_batch_size=0)
+    with pytest.raises(ValueError, match="wait"):
+        MicroBatcher(_double_all, max_wait=-1)
+
+
+def test_batcher_from_env(monkeypatch):
+    """Test configuring a batcher from environment variables."""
+    monkeypatch.setenv("TEST_BATCH_MAX_SIZE", "8")
+    monkeypatch.setenv("TEST_BATCH_MAX_WAIT_MS", "2.5")
+    batcher = batcher_from_env(_double_all, prefix="TEST_BATCH")
+    assert batcher.max_batch_size == 8
+    assert batcher.max_wait == pytest.approx(0.0025)
+
+
+def test_concurrent_api_requests_share_batches(monkeypatch):
+    """Test that concurrent /predict and /classify_and_resize requests are coalesced."""
+    monkeypatch.setattr(api.predict_batcher, "max_wait", 0.05)
+    before = api.predict_batcher.stats()
+
+    img_bytes = io.BytesIO()
+    Image.new("RGB", (64, 64), color="blue").save(img_bytes, format="PNG")
+    files = {"file": ("test.png", img_bytes.getvalue(), "image/png")}
+    headers = {"Cache-Control": "no-cache"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            requests = [client.post("/predict", files=files, headers=headers) for _ in range(4)]
+            requests.append(
+                client.post(
+                    "/classify_and_resize",
+                    files=files,
+                    data={"width": "16", "height": "16"},
+                    headers=headers,
+                )
+            )
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(run())
+    assert [response.status_code for response in responses] == [200] * 5
+    assert all(response.json()["predicted_class"] for response in responses)
+
+    after = api.predict_batcher.stats()
+    assert after["items"] - before["items"] == 5
+    assert after["batches"] - before["batches"] < 5
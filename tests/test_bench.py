@@ -0,0 +1,96 @@
+"""Tests for the classifier benchmark suite."""
+
+import json
+import pytest
+from PIL import Image
+from benchmarks import classifier as bench
+from benchmarks import cascade as cascade_bench
+from benchmarks import resize as resize_bench
+from logic.classifier import RESIZE_PROFILES
+
+
+@pytest.mark.parametrize("mode", bench.MODES)
+def test_synthetic_image_modes(mode):
+    """Test that synthetic images have the requested mode and a 4:3 size."""
+    image = bench.synthetic_image(64, mode)
+    assert image.mode == mode
+    assert image.size == (64, 48)
+
+
+def test_encode_synthetic_skips_unsupported_modes():
+    """Test that format/mode pairs the encoder rejects are skipped."""
+    assert bench.encode_synthetic(bench.synthetic_image(64, "RGBA"), "JPEG") is None
+    assert bench.encode_synthetic(bench.synthetic_image(64, "RGBA"), "PNG")[:4] == b"\x89PNG"
+
+
+def test_run_benchmarks_in_process():
+    """Test that a small matrix produces one timed result per case."""
+    results = list(
+        bench.run_benchmarks(
+            sizes=[64],
+            modes=["L", "RGBA"],
+            formats=["JPEG", "PNG"],
+            ops=["resize", "probe"],
+            min_time=0,
+            min_iterations=2,
+            isolate=False,
+        )
+    )
+
+    # RGBA cannot be stored as JPEG, so that pair is skipped
+    assert [(r["mode"], r["format"], r["op"]) for r in results] == [
+        ("L", "JPEG", "resize"),
+        ("L", "JPEG", "probe"),
+        ("L", "PNG", "resize"),
+        ("L", "PNG", "probe"),
+        ("RGBA", "PNG", "resize"),
+        ("RGBA", "PNG", "probe"),
+    ]
+    for result in results:
+        assert result["iterations"] >= 2
+        assert result["ops_per_sec"] > 0
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["max"]
+        assert result["width"] == 64
+
+
+def test_run_benchmarks_unknown_op():
+    """Test that unknown operations are rejected."""
+    with pytest.raises(ValueError, match="Unknown operations"):
+        list(bench.run_benchmarks(ops=["sharpen"]))
+
+
+def test_main_writes_and_compares_json(tmp_path, capsys):
+    """Test that results are written as JSON and can be compared with a baseline."""
+    output = tmp_path / "bench.json"
+    args = ["--sizes", "64", "--modes", "L", "--formats", "png", "--ops", "decode"]
+    args += ["--min-time", "0", "--min-iterations", "1", "--in-process"]
+
+    assert bench.main(args + ["--output", str(output)]) == 0
+    data = json.loads(output.read_text())
+    assert data["environment"]["pillow"]
+    assert len(data["results"]) == 1
+
+    assert bench.main(args + ["--compare", str(output)]) == 0
+    assert "x\n" in capsys.readouterr().out
+
+
+def test_resize_profiles_benchmark():
+    """Test the resize profile benchmark on a small downscale and upscale."""
+    results = list(resize_bench.iter_results([(256, 64), (64, 128)], min_time=0, min_iterations=1))
+    assert [(r["target"], r["profile"]) for r in results] == [
+        (target, profile) for target in (64, 128) for profile in RESIZE_PROFILES
+    ]
+    for result in results:
+        assert result["latency_ms"]["p50"] > 0
+        assert result["psnr_db"] > 20
+    image = Image.new("RGB", (4, 4), (10, 20, 30))
+    assert resize_bench.psnr(image, image) == float("inf")
+
+
+def test_cascade_benchmark():
+    """Test the thumbnail cascade benchmark on a small pyramid."""
+    (result,) = cascade_bench.iter_results([512], [128, 64], min_time=0, min_iterations=1)
+    assert set(result["latency_ms"]) == {"separate", "cascade"}
+    assert result["speedup"] > 0
+    assert result["min_psnr_db"] > 30
+    assert cascade_bench.format_row(result).split()[:2] == ["512", "quality"]
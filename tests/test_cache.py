@@ -0,0 +1,121 @@
+"""Tests for the cache module."""
+
+import numpy as np
+import pytest
+from logic.cache import ResultCache, content_hash, get_cache, make_key, reset_cache
+
+
+def test_content_hash_is_stable():
+    """Test that equal bytes hash to the same digest."""
+    assert content_hash(b"image") == content_hash(b"image")
+    assert content_hash(b"image") != content_hash(b"other")
+
+
+def test_make_key_includes_parameters():
+    """Test that keys differ by operation and parameters."""
+    digest = content_hash(b"image")
+    assert make_key("resize", digest, 50, 50) == make_key("resize", digest, 50, 50)
+    assert make_key("resize", digest, 50, 50) != make_key("resize", digest, 50, 60)
+    assert make_key("resize", digest, 50, 50) != make_key("preprocess", digest, 50, 50)
+
+
+def test_cache_hit_and_miss():
+    """Test hit and miss counters."""
+    cache = ResultCache()
+    assert cache.get("key") is None
+    cache.set("key", "cat")
+    assert cache.get("key") == "cat"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_cache_lru_eviction_by_entries():
+    """Test that the least recently used entry is evicted first."""
+    cache = ResultCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_eviction_by_bytes():
+    """Test that the cache stays within its memory bound."""
+    cache = ResultCache(max_bytes=100)
+    cache.set("a", b"x" * 60)
+    cache.set("b", b"y" * 60)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 60
+
+
+def test_cache_sizes_nested_results_by_their_payload():
+    """Test that API-style results holding bytes are sized close to the payload length."""
+    payload = b"\xff" * 5_000_000
+    cache = ResultCache(max_bytes=64 * 1024 * 1024)
+    cache.set("a", ((4000, 3000, "RGB"), payload))
+    cache.set("b", [np.zeros(1000, dtype=np.uint8), {"mode": "L"}])
+
+    assert 5_000_000 <= cache.stats()["bytes"] - 1000 < 5_001_000
+
+
+def test_cache_skips_oversized_values():
+    """Test that values larger than the cache are not stored."""
+    cache = ResultCache(max_bytes=10)
+    cache.set("a", np.zeros(100, dtype=np.uint8))
+    assert cache.get("a") is None
+
+
+def test_cache_ttl_expiry(monkeypatch):
+    """Test that entries expire after the TTL."""
+    now = [1000.0]
+    monkeypatch.setattr("logic.cache.time.monotonic", lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.set("a", "cat")
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_get_or_compute():
+    """Test computing a value only on a miss."""
+    cache = ResultCache()
+    calls = []
+    for _ in range(3):
+        value = cache.get_or_compute("a", lambda: calls.append(1) or "dog")
+    assert value == "dog"
+    assert len(calls) == 1
+
+
+def test_cache_disabled():
+    """Test that a zero-size cache stores nothing."""
+    cache = ResultCache(max_bytes=0)
+    assert not cache.enabled
+    cache.set("a", "cat")
+    assert cache.get("a") is None
+
+
+def test_cache_with_invalid_limits():
+    """Test creating a cache with invalid limits."""
+    with pytest.raises(ValueError, match="Cache limits must be non-negative integers"):
+        ResultCache(max_bytes=-1)
+    with pytest.raises(ValueError, match="Cache TTL must be positive"):
+        ResultCache(ttl=0)
+
+
+def test_get_cache_reads_environment(monkeypatch):
+    """Test that the shared cache is configured from the environment."""
+    monkeypatch.setenv("RESULT_CACHE_MAX_BYTES", "1234")
+    monkeypatch.setenv("RESULT_CACHE_TTL", "5")
+    reset_cache()
+    try:
+        cache = get_cache()
+        assert cache.max_bytes == 1234
+        assert cache.ttl == 5
+        assert get_cache() is cache
+    finally:
+        reset_cache()
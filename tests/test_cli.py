@@ -1,5 +1,7 @@
 """Tests for the CLI module."""
 
+import json
+import numpy as np
 import pytest
 from click.testing import CliRunner
 from cli.cli import cli
@@ -112,6 +114,41 @@ def test_preprocess_command_with_custom_dimensions(runner, sample_image):
             os.remove(output_path)
 
 
+def test_preprocess_command_with_reducing_gap(runner, sample_image):
+    """Test the preprocess command with the reducing gap disabled."""
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as output_file:
+        output_path = output_file.name
+
+    try:
+        result = runner.invoke(
+            cli, ["preprocess", sample_image, output_path, "--width", "32", "--reducing-gap", "0"]
+        )
+        assert result.exit_code == 0
+        assert Image.open(output_path).size == (32, 224)
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+
+def test_preprocess_command_with_npy_output(runner, sample_image, tmp_path):
+    """Test the preprocess command saving a tensor as .npy."""
+    output_path = tmp_path / "tensor.npy"
+    result = runner.invoke(cli, ["preprocess", sample_image, str(output_path), "--width", "32"])
+    assert result.exit_code == 0
+    assert "float32 tensor (1, 3, 224, 32)" in result.output
+    tensor = np.load(output_path)
+    assert tensor.shape == (1, 3, 224, 32)
+    assert tensor.dtype == np.float32
+
+
+def test_preprocess_command_with_uint8_npy_output(runner, sample_image, tmp_path):
+    """Test the preprocess command saving a uint8 NHWC tensor."""
+    output_path = tmp_path / "tensor.npy"
+    result = runner.invoke(cli, ["preprocess", sample_image, str(output_path), "--dtype", "uint8"])
+    assert result.exit_code == 0
+    assert np.load(output_path).shape == (1, 224, 224, 3)
+
+
 def test_to_rgb_command(runner, sample_image):
     """Test the to-rgb command."""
     with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as output_file:
@@ -143,3 +180,201 @@ def test_info_command_with_nonexistent_file(runner):
     """Test info command with nonexistent file."""
     result = runner.invoke(cli, ["info", "nonexistent.png"])
     assert result.exit_code != 0
+
+
+@pytest.fixture
+def image_tree(tmp_path):
+    """Create a directory tree with images and one invalid file."""
+    root = tmp_path / "images"
+    (root / "sub").mkdir(parents=True)
+    Image.new("RGB", (100, 80), color="red").save(root / "a.png")
+    Image.new("L", (60, 60), color=128).save(root / "sub" / "b.jpg")
+    return root
+
+
+def test_batch_resize_mirrors_tree(runner, image_tree, tmp_path):
+    """Test batch resize writes outputs mirroring the input tree."""
+    output_dir = tmp_path / "out"
+    result = runner.invoke(
+        cli,
+        ["batch", "resize", str(image_tree), "-o", str(output_dir), "--width", "20"]
+        + ["--height", "10", "--jobs", "2"],
+    )
+    assert result.exit_code == 0
+    assert "Processed 2 files (0 failed)" in result.output
+    assert Image.open(output_dir / "a.png").size == (20, 10)
+    assert Image.open(output_dir / "sub" / "b.jpg").size == (20, 10)
+
+
+def test_resize_commands_with_profile(runner, sample_image, image_tree, tmp_path):
+    """Test the --profile option of resize and batch resize."""
+    output_path = tmp_path / "fast.png"
+    result = runner.invoke(
+        cli, ["resize", sample_image, "30", "20", str(output_path), "--profile", "fast"]
+    )
+    assert result.exit_code == 0
+    assert Image.open(output_path).size == (30, 20)
+
+    output_dir = tmp_path / "out"
+    result = runner.invoke(
+        cli,
+        ["batch", "preprocess", str(image_tree), "-o", str(output_dir), "-j", "1"]
+        + ["--width", "16", "--height", "16", "--profile", "balanced"],
+    )
+    assert result.exit_code == 0
+    assert Image.open(output_dir / "a.png").size == (16, 16)
+
+    result = runner.invoke(cli, ["preprocess", sample_image, str(output_path), "--profile", "x"])
+    assert result.exit_code == 2
+
+
+def test_preprocess_command_with_fit(runner, tmp_path):
+    """Test the --fit option of preprocess for images and tensors."""
+    input_path = tmp_path / "wide.png"
+    image = Image.new("RGB", (200, 100), "red")
+    image.paste("blue", (100, 0, 200, 100))
+    image.save(input_path)
+
+    output_path = tmp_path / "contain.png"
+    result = runner.invoke(
+        cli,
+        ["preprocess", str(input_path), str(output_path)]
+        + ["--width", "40", "--height", "40", "--fit", "contain"],
+    )
+    assert result.exit_code == 0
+    assert Image.open(output_path).getpixel((20, 2)) == (0, 0, 0)
+
+    tensor_path = tmp_path / "cover.npy"
+    result = runner.invoke(
+        cli,
+        ["preprocess", str(input_path), str(tensor_path)]
+        + ["--width", "40", "--height", "40", "--fit", "cover", "--dtype", "uint8"],
+    )
+    assert result.exit_code == 0
+    tensor = np.load(tensor_path)
+    assert tensor[0, 20, 0].tolist() == [255, 0, 0]
+    assert tensor[0, 20, 39].tolist() == [0, 0, 255]
+
+    result = runner.invoke(cli, ["preprocess", str(input_path), str(output_path), "--fit", "x"])
+    assert result.exit_code == 2
+
+
+def test_thumbnails_command(runner, sample_image, tmp_path):
+    """Test writing several sizes of an image with the thumbnails command."""
+    output_dir = tmp_path / "thumbs"
+    result = runner.invoke(
+        cli, ["thumbnails", sample_image, str(output_dir), "64", "32x16", "--format", "png"]
+    )
+    assert result.exit_code == 0
+    stem = Path(sample_image).stem
+    assert Image.open(output_dir / f"{stem}_64x64.png").size == (64, 64)
+    assert Image.open(output_dir / f"{stem}_32x16.png").size == (32, 16)
+
+    result = runner.invoke(cli, ["thumbnails", sample_image, str(output_dir), "0"])
+    assert result.exit_code != 0
+    assert "Size must be" in result.output
+
+
+def test_pipeline_command(runner, sample_image, tmp_path):
+    """Test the pipeline command with an inline spec and a spec file."""
+    output_path = tmp_path / "out.png"
+    spec = '[{"op": "resize_shorter", "size": 50}, {"op": "center_crop", "size": 40}]'
+    result = runner.invoke(cli, ["pipeline", sample_image, str(output_path), spec, "--explain"])
+    assert result.exit_code == 0
+    assert "resample 80x80 at (10, 10) to 40x40" in result.output
+    assert Image.open(output_path).size == (40, 40)
+
+    spec_path = tmp_path / "spec.json"
+    spec_path.write_text('[{"op": "convert", "mode": "L"}]')
+    result = runner.invoke(cli, ["pipeline", sample_image, str(output_path), f"@{spec_path}"])
+    assert result.exit_code == 0
+    assert Image.open(output_path).mode == "L"
+
+    result = runner.invoke(cli, ["pipeline", sample_image, str(output_path), "[]"])
+    assert result.exit_code != 0
+    assert "non-empty list" in result.output
+
+
+def test_batch_preprocess_with_glob(runner, image_tree, tmp_path):
+    """Test batch preprocess with a glob pattern."""
+    output_dir = tmp_path / "out"
+    pattern = str(image_tree / "**" / "*.jpg")
+    result = runner.invoke(cli, ["batch", "preprocess", pattern, "-o", str(output_dir), "-j", "1"])
+    assert result.exit_code == 0
+    preprocessed = Image.open(output_dir / "sub" / "b.jpg")
+    assert preprocessed.size == (224, 224)
+    assert preprocessed.mode == "RGB"
+
+
+def test_batch_predict_reports_failures(runner, image_tree):
+    """Test batch predict reports a bad file without aborting the run."""
+    (image_tree / "broken.png").write_bytes(b"not an image")
+    result = runner.invoke(cli, ["batch", "predict", str(image_tree), "-j", "1"])
+    assert result.exit_code == 1
+    assert "broken.png" in result.output
+    assert "Processed 3 files (1 failed)" in result.output
+    assert result.output.count("Error:") == 1
+
+
+def test_batch_info_with_file_list(runner, image_tree, tmp_path):
+    """Test batch info reading paths from a file list."""
+    file_list = tmp_path / "files.txt"
+    file_list.write_text(f"{image_tree / 'a.png'}\n\n{image_tree / 'sub' / 'b.jpg'}\n")
+    result = runner.invoke(cli, ["batch", "info", "--file-list", str(file_list), "-j", "1"])
+    assert result.exit_code == 0
+    assert "100x80 RGB" in result.output
+    assert "60x60 L" in result.output
+
+
+def test_batch_to_rgb(runner, image_tree, tmp_path):
+    """Test batch RGB conversion."""
+    output_dir = tmp_path / "out"
+    result = runner.invoke(cli, ["batch", "to-rgb", str(image_tree), "-o", str(output_dir)])
+    assert result.exit_code == 0
+    assert Image.open(output_dir / "sub" / "b.jpg").mode == "RGB"
+
+
+def test_batch_keeps_same_named_files_apart(runner, tmp_path):
+    """Test that same-named files from different directories get separate outputs."""
+    for name, color in (("a", "red"), ("b", "blue")):
+        (tmp_path / name).mkdir()
+        Image.new("RGB", (40, 40), color=color).save(tmp_path / name / "img.png")
+    file_list = tmp_path / "files.txt"
+    file_list.write_text(f"{tmp_path / 'b' / 'img.png'}\n")
+
+    output_dir = tmp_path / "out"
+    args = ["batch", "to-rgb", str(tmp_path / "a" / "img.png"), "--file-list", str(file_list)]
+    result = runner.invoke(cli, args + ["-o", str(output_dir), "-j", "2"])
+    assert result.exit_code == 0
+    assert Image.open(output_dir / "a" / "img.png").getpixel((0, 0)) == (255, 0, 0)
+    assert Image.open(output_dir / "b" / "img.png").getpixel((0, 0)) == (0, 0, 255)
+
+    # Directory inputs with the same layout would still collide
+    args = ["batch", "to-rgb", str(tmp_path / "a"), str(tmp_path / "b"), "-o", str(output_dir)]
+    result = runner.invoke(cli, args)
+    assert result.exit_code != 0
+    assert "map to the same output file: img.png" in result.output
+
+
+def test_batch_without_inputs(runner):
+    """Test batch command with no inputs."""
+    result = runner.invoke(cli, ["batch", "predict"])
+    assert result.exit_code != 0
+    assert "No input images found" in result.output
+
+
+def test_scan_command(runner, image_tree, tmp_path):
+    """Test scanning a tree to a JSONL file."""
+    output_path = tmp_path / "scan.jsonl"
+    result = runner.invoke(cli, ["scan", str(image_tree), "-o", str(output_path), "-j", "2"])
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [record["mode"] for record in records] == ["RGB", "L"]
+    assert records[0]["width"] == 100
+    assert '"files": 2' in result.output
+
+
+def test_scan_command_without_inputs(runner):
+    """Test scan command without inputs."""
+    result = runner.invoke(cli, ["scan"])
+    assert result.exit_code != 0
@@ -0,0 +1,224 @@
+"""Tests for the API client."""
+
+import asyncio
+import io
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from api.api import app
+from client.client import (
+    APIError,
+    AsyncImageClient,
+    ImageClient,
+    prepare_image,
+)
+
+
+def _jpeg_bytes(size=(2000, 1000), color=(200, 100, 50)):
+    """Create JPEG bytes for an image of the given size and colour."""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color=color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _mock_client(handler, client_class=ImageClient, **kwargs):
+    """Create a client whose requests are answered by handler."""
+    http_class = httpx.AsyncClient if client_class is AsyncImageClient else httpx.Client
+    http = http_class(transport=httpx.MockTransport(handler), base_url="http://api")
+    return client_class(http_client=http, backoff=0, **kwargs)
+
+
+def _predicted(label="cat", status_code=200):
+    return httpx.Response(status_code, json={"success": True, "predicted_class": label})
+
+
+def test_prepare_image_downscales_to_cover_model_input():
+    """Test that large images are downscaled to just cover the model input size."""
+    prepared = prepare_image(_jpeg_bytes((2000, 1000)))
+    image = Image.open(io.BytesIO(prepared.data))
+    assert image.size == (448, 224)
+    assert prepared.media_type == "image/jpeg"
+    assert len(prepared.digest) == 64
+
+
+def test_prepare_image_sends_small_files_unchanged():
+    """Test that small encoded images are uploaded without re-encoding."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100)).save(buffer, format="PNG")
+    prepared = prepare_image(buffer.getvalue())
+    assert prepared.data == buffer.getvalue()
+    assert prepared.media_type == "image/png"
+
+
+def test_prepare_image_from_pil_and_path(tmp_path):
+    """Test preparing PIL images (converted to RGB) and files."""
+    prepared = prepare_image(Image.new("RGBA", (1000, 1000)))
+    assert Image.open(io.BytesIO(prepared.data)).mode == "RGB"
+
+    path = tmp_path / "photo.png"
+    Image.new("L", (1000, 800)).save(path)
+    prepared = prepare_image(str(path))
+    assert prepared.filename == "photo.jpg"
+    assert Image.open(io.BytesIO(prepared.data)).size == (280, 224)
+
+
+def test_prepare_image_without_downscale():
+    """Test that downscaling can be disabled."""
+    data = _jpeg_bytes((640, 480))
+    assert prepare_image(data, size=None).data == data
+
+
+def test_predict_against_api():
+    """Test the sync client against the API app."""
+    client = ImageClient(http_client=TestClient(app))
+    assert client.health() == {"status": "healthy"}
+    assert isinstance(client.predict(_jpeg_bytes()), str)
+
+
+def test_predict_against_api_async():
+    """Test the async client against the API app."""
+
+    async def run():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api")
+        async with AsyncImageClient(http_client=http) as client:
+            return await client.predict_many([_jpeg_bytes(), _jpeg_bytes((300, 300))])
+
+    results = asyncio.run(run())
+    assert len(results) == 2
+    assert all(isinstance(result, str) for result in results)
+
+
+def test_results_are_cached():
+    """Test that the same image is only sent once."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return _predicted()
+
+    client = _mock_client(handler)
+    assert client.predict(_jpeg_bytes()) == "cat"
+    assert client.predict(_jpeg_bytes()) == "cat"
+    assert len(calls) == 1
+
+    client.clear_cache()
+    client.predict(_jpeg_bytes())
+    assert len(calls) == 2
+
+
+def test_hash_lookup_uploads_only_on_miss():
+    """Test that hash_lookup asks for the hash first, and uploads only on a 404."""
+    calls = []
+    known = set()
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.method == "GET":
+            digest = request.url.path.rsplit("/", 1)[1]
+            return _predicted() if digest in known else httpx.Response(404, json={})
+        return _predicted()
+
+    client = _mock_client(handler, hash_lookup=True, cache_size=0)
+    prepared = prepare_image(_jpeg_bytes())
+    lookup = ("GET", f"/predict/by-hash/{prepared.digest}")
+
+    assert client.predict(_jpeg_bytes()) == "cat"
+    assert calls == [lookup, ("POST", "/predict")]
+
+    known.add(prepared.digest)
+    calls.clear()
+    assert client.predict(_jpeg_bytes()) == "cat"
+    assert calls == [lookup]
+
+
+def test_hash_lookup_against_api():
+    """Test the hash-first flow against the API app: the second client skips the upload."""
+    image = _jpeg_bytes((640, 400))
+    with ImageClient(http_client=TestClient(app), hash_lookup=True) as client:
+        first = client.predict(image)
+    with ImageClient(http_client=TestClient(app), hash_lookup=True) as client:
+        assert client.predict(image) == first
+
+
+def test_retries_cold_start():
+    """Test that connection errors and 503s are retried with backoff."""
+    responses = iter([httpx.ConnectError("refused"), _predicted(status_code=503), _predicted()])
+
+    def handler(_request):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = _mock_client(handler)
+    assert client.predict(_jpeg_bytes()) == "cat"
+
+
+def test_retries_give_up():
+    """Test that retries are limited, and client errors are not retried."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) < 10 else 400, json={"detail": "down"})
+
+    client = _mock_client(handler, retries=2)
+    with pytest.raises(APIError) as error:
+        client.predict(_jpeg_bytes())
+    assert error.value.status_code == 503
+    assert len(calls) == 3
+
+    calls[:] = [None] * 10
+    with pytest.raises(APIError) as error:
+        client.predict(_jpeg_bytes())
+    assert error.value.status_code == 400
+    assert len(calls) == 11
+
+
+def test_predict_many_sync():
+    """Test sync batch submission, with exceptions returned per item."""
+
+    def handler(request):
+        if b"image/png" in request.content:
+            return httpx.Response(400, json={"detail": "bad image"})
+        return _predicted()
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, format="PNG")
+    client = _mock_client(handler)
+    results = client.predict_many([_jpeg_bytes(), buffer.getvalue()], return_exceptions=True)
+    assert results[0] == "cat"
+    assert isinstance(results[1], APIError)
+    with pytest.raises(APIError):
+        client.predict_many([buffer.getvalue()])
+
+
+def test_async_dedup_and_bounded_concurrency():
+    """Test that identical requests share one call, and concurrency is bounded."""
+    calls = []
+    active = {"now": 0, "max": 0}
+
+    async def handler(request):
+        calls.append(request)
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return _predicted()
+
+    async def run():
+        client = _mock_client(handler, AsyncImageClient, cache_size=0)
+        image = _jpeg_bytes((200, 200))
+        same = await asyncio.gather(*(client.predict(image) for _ in range(5)))
+        assert same == ["cat"] * 5
+        assert len(calls) == 1
+
+        # Distinct pixels, so these are not deduplicated after downscaling
+        images = [_jpeg_bytes((300, 300), color=(40 * i, 0, 0)) for i in range(6)]
+        assert await client.predict_many(images, max_concurrency=2) == ["cat"] * 6
+        await client.close()
+
+    asyncio.run(run())
+    assert len(calls) == 7
+    assert active["max"] == 2
@@ -0,0 +1,101 @@
+"""Tests for the executor module."""
+
+import asyncio
+import pytest
+from PIL import Image
+from logic.classifier import normalize_image
+from logic.executor import (
+    WorkerPool,
+    configure_pool,
+    get_pool,
+    pool_stats,
+    run_in_pool,
+    shutdown_pools,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_pools():
+    """Shut down the pools created by each test."""
+    yield
+    shutdown_pools()
+
+
+def test_thread_pool_runs_function():
+    """Test running a function in a thread pool."""
+    pool = WorkerPool("test", "thread", 2)
+    image = Image.new("RGB", (30, 20), color="red")
+    result = asyncio.run(pool.run(normalize_image, image))
+    pool.shutdown()
+    assert result == (30, 20, "RGB")
+
+
+def test_process_pool_runs_function():
+    """Test running a picklable function in a process pool."""
+    pool = WorkerPool("test", "process", 1)
+    image = Image.new("L", (12, 8), color=128)
+    result = asyncio.run(pool.run(normalize_image, image))
+    pool.shutdown()
+    assert result == (12, 8, "L")
+
+
+def test_pool_propagates_errors():
+    """Test that exceptions raised in the pool reach the caller."""
+    pool = WorkerPool("test", "thread", 1)
+    with pytest.raises(ValueError, match="Input must be a PIL Image object"):
+        asyncio.run(pool.run(normalize_image, "not_an_image"))
+    stats = pool.stats()
+    pool.shutdown()
+    assert stats["failed"] == 1
+    assert stats["completed"] == 0
+
+
+def test_pool_stats():
+    """Test the pool statistics after a few calls."""
+    pool = WorkerPool("test", "thread", 2)
+    image = Image.new("RGB", (10, 10))
+
+    async def run_many():
+        await asyncio.gather(*(pool.run(normalize_image, image) for _ in range(5)))
+
+    asyncio.run(run_many())
+    stats = pool.stats()
+    pool.shutdown()
+    assert stats["kind"] == "thread"
+    assert stats["max_workers"] == 2
+    assert stats["submitted"] == 5
+    assert stats["completed"] == 5
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["wait_ms"]["max"] >= 0
+
+
+def test_pool_with_invalid_kind():
+    """Test creating a pool with an unknown executor kind."""
+    with pytest.raises(ValueError, match="Executor kind must be one of"):
+        WorkerPool("test", "fiber")
+
+
+def test_pool_with_invalid_workers():
+    """Test creating a pool with a non-positive size."""
+    with pytest.raises(ValueError, match="Executor workers must be a positive integer"):
+        WorkerPool("test", "thread", 0)
+
+
+def test_get_pool_reads_environment(monkeypatch):
+    """Test that the default pool is configured from the environment."""
+    monkeypatch.setenv("IMAGE_EXECUTOR_KIND", "thread")
+    monkeypatch.setenv("IMAGE_EXECUTOR_WORKERS", "3")
+    pool = get_pool()
+    assert pool.kind == "thread"
+    assert pool.max_workers == 3
+    assert get_pool() is pool
+
+
+def test_configure_pool_replaces_default():
+    """Test replacing the default pool and running through it."""
+    pool = configure_pool("thread", 1)
+    assert get_pool() is pool
+    result = asyncio.run(run_in_pool(normalize_image, Image.new("RGB", (4, 4))))
+    assert result == (4, 4, "RGB")
+    assert pool_stats()["default"]["completed"] == 1
@@ -0,0 +1,136 @@
+"""Tests for incremental decoding and streaming uploads."""
+
+import io
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from api import limits
+from api.api import app
+from logic.classifier import ImageTooLargeError, draft_image
+from logic.incremental import IncrementalImageDecoder
+
+
+@pytest.fixture
+def client():
+    """Create a test client."""
+    return TestClient(app)
+
+
+def _encode(size=(320, 240), image_format="JPEG", **kwargs):
+    """Encode a gradient image of the given size."""
+    width, height = size
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    pixels[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def _feed_chunks(decoder, data, chunk_size=1000):
+    """Feed data to a decoder in fixed-size chunks."""
+    for start in range(0, len(data), chunk_size):
+        decoder.feed(data[start : start + chunk_size])
+
+
+@pytest.mark.parametrize("progressive", [False, True])
+def test_jpeg_matches_normal_decode(progressive):
+    """Test that a chunked JPEG decode gives the same pixels as Image.open."""
+    data = _encode(progressive=progressive)
+    decoder = IncrementalImageDecoder()
+    _feed_chunks(decoder, data)
+    assert decoder.mode == "jpeg"
+
+    image = decoder.close()
+    expected = Image.open(io.BytesIO(data))
+    assert image.size == expected.size
+    assert np.array_equal(np.asarray(image), np.asarray(expected))
+
+
+def test_jpeg_draft_for_target_size():
+    """Test that a target size decodes the JPEG at reduced size, as draft_image does."""
+    data = _encode((1600, 1200))
+    decoder = IncrementalImageDecoder(target_size=(200, 150))
+    _feed_chunks(decoder, data)
+    image = decoder.close()
+
+    expected = Image.open(io.BytesIO(data))
+    draft_image(expected, 200, 150)
+    assert image.size == expected.size < (1600, 1200)
+    assert np.array_equal(np.asarray(image), np.asarray(expected))
+
+
+def test_parser_formats_decode_incrementally():
+    """Test that BMP goes through PIL's incremental parser."""
+    data = _encode(image_format="BMP")
+    decoder = IncrementalImageDecoder()
+    _feed_chunks(decoder, data)
+    assert decoder.mode == "parser"
+    assert np.array_equal(np.asarray(decoder.close()), np.asarray(Image.open(io.BytesIO(data))))
+
+
+def test_other_formats_are_buffered():
+    """Test that PNG is buffered and returned as bytes."""
+    data = _encode(image_format="PNG")
+    decoder = IncrementalImageDecoder()
+    _feed_chunks(decoder, data)
+    assert decoder.mode == "buffer"
+    assert decoder.close() == data
+    assert decoder.bytes_received == len(data)
+
+
+def test_oversized_image_rejected_from_header():
+    """Test that the limits are checked as soon as the header has arrived."""
+    data = _encode((640, 480))
+    decoder = IncrementalImageDecoder(max_pixels=1000)
+    with pytest.raises(ImageTooLargeError):
+        _feed_chunks(decoder, data)
+    # Rejected long before the whole image was received
+    assert decoder.bytes_received < len(data)
+    assert decoder.probe.width == 640
+
+
+def test_truncated_jpeg():
+    """Test that a truncated JPEG is reported on close."""
+    data = _encode()
+    decoder = IncrementalImageDecoder()
+    _feed_chunks(decoder, data[: len(data) // 2])
+    with pytest.raises(OSError):
+        decoder.close()
+
+
+def test_invalid_data():
+    """Test that data that is not an image is reported on close."""
+    decoder = IncrementalImageDecoder()
+    decoder.feed(b"not an image")
+    with pytest.raises(OSError):
+        decoder.close()
+
+
+def test_predict_streams_upload(client):
+    """Test that /predict decodes a streamed multipart upload."""
+    data = _encode((1024, 768))
+    response = client.post("/predict", files={"file": ("a.jpg", data, "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json()["filename"] == "a.jpg"
+    assert "decode;dur=" in response.headers["server-timing"]
+
+
+def test_predict_streamed_upload_over_pixel_limit(client, monkeypatch):
+    """Test that /predict rejects an oversized streamed image with 413."""
+    monkeypatch.setattr(limits, "MAX_IMAGE_PIXELS", 1000)
+    data = _encode((640, 480))
+    response = client.post("/predict", files={"file": ("a.jpg", data, "image/jpeg")})
+    assert response.status_code == 413
+
+
+def test_predict_skips_other_fields(client):
+    """Test that form fields other than the image are ignored."""
+    data = _encode()
+    response = client.post(
+        "/predict",
+        data={"note": "hello"},
+        files={"file": ("a.jpg", data, "image/jpeg")},
+    )
+    assert response.status_code == 200
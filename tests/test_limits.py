@@ -0,0 +1,82 @@
+"""Tests for the upload limits module."""
+
+import io
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from api import limits
+from api.api import app
+
+
+@pytest.fixture
+def client():
+    """Create a test client."""
+    return TestClient(app)
+
+
+def _png_bytes(size):
+    """Create PNG bytes for an image of the given size."""
+    img_bytes = io.BytesIO()
+    Image.new("L", size).save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
+def test_declared_body_over_limit(client, monkeypatch):
+    """Test that a large Content-Length is rejected before reading the body."""
+    monkeypatch.setattr(limits, "MAX_UPLOAD_BYTES", 100)
+    files = {"file": ("test.png", _png_bytes((64, 64)), "image/png")}
+    response = client.post("/predict", files=files)
+    assert response.status_code == 413
+    assert "exceeds the limit of 100 bytes" in response.json()["detail"]
+
+
+def test_streamed_body_over_limit(client, monkeypatch):
+    """Test that a chunked body is cut off once it crosses the limit."""
+    monkeypatch.setattr(limits, "MAX_UPLOAD_BYTES", 1000)
+
+    def chunks():
+        yield b"--boundary\r\nContent-Disposition: form-data; name=file; filename=a.png\r\n\r\n"
+        for _ in range(10):
+            yield b"x" * 500
+
+    headers = {"Content-Type": "multipart/form-data; boundary=boundary"}
+    response = client.post("/predict", content=chunks(), headers=headers)
+    assert response.status_code == 413
+
+
+def test_body_limit_disabled(client, monkeypatch):
+    """Test that uploads are accepted when the limit is disabled."""
+    monkeypatch.setattr(limits, "MAX_UPLOAD_BYTES", None)
+    files = {"file": ("test.png", _png_bytes((64, 64)), "image/png")}
+    assert client.post("/predict", files=files).status_code == 200
+
+
+def test_image_over_pixel_limit(client, monkeypatch):
+    """Test that images over the pixel limit are rejected from the header."""
+    monkeypatch.setattr(limits, "MAX_IMAGE_PIXELS", 1000)
+    files = {"file": ("test.png", _png_bytes((50, 50)), "image/png")}
+    data = {"width": "10", "height": "10"}
+    response = client.post("/resize", files=files, data=data)
+    assert response.status_code == 413
+    assert "exceeds the limit of 1000 pixels" in response.json()["detail"]
+
+
+def test_image_over_dimension_limit(client, monkeypatch):
+    """Test that images over the dimension limit are rejected."""
+    monkeypatch.setattr(limits, "MAX_IMAGE_DIMENSION", 40)
+    files = {"file": ("test.png", _png_bytes((50, 10)), "image/png")}
+    response = client.post("/predict", files=files)
+    assert response.status_code == 413
+
+
+def test_archive_over_upload_limit(client, monkeypatch):
+    """Test that archives expanding beyond the upload limit are rejected."""
+    import zipfile  # pylint: disable=import-outside-toplevel
+
+    archive_bytes = io.BytesIO()
+    with zipfile.ZipFile(archive_bytes, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("big.bin", b"\0" * 100000)
+    monkeypatch.setattr(limits, "MAX_UPLOAD_BYTES", 50000)
+    files = [("files", ("a.zip", archive_bytes.getvalue(), "application/zip"))]
+    response = client.post("/predict_batch", files=files)
+    assert response.status_code == 413
@@ -0,0 +1,169 @@
+"""Tests for the API load-test harness."""
+
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from api.api import app
+from benchmarks import ingest, loadtest
+
+
+def _run(specs, **options):
+    """Run a workload against the in-process app."""
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await loadtest.run_load(client, specs, **options)
+
+    return asyncio.run(run()).summary()
+
+
+def test_parse_weighted():
+    """Test parsing values with optional weights."""
+    assert loadtest.parse_weighted(["256:3", "1024"], int) == [(256, 3.0), (1024, 1.0)]
+    with pytest.raises(ValueError):
+        loadtest.parse_weighted(["256:0"], int)
+
+
+def test_build_workload_is_reproducible():
+    """Test that workloads follow the mixes and depend only on the seed."""
+    endpoints = [("/predict", 1.0), ("/resize", 1.0)]
+    specs = loadtest.build_workload(endpoints, [(64, 1.0)], 20, target_size=32, seed=1)
+    assert specs == loadtest.build_workload(endpoints, [(64, 1.0)], 20, target_size=32, seed=1)
+    assert {spec.endpoint for spec in specs} == {"/predict", "/resize"}
+    for spec in specs:
+        assert spec.form == ({"width": 32, "height": 32} if spec.endpoint == "/resize" else {})
+
+
+def test_build_workload_unknown_endpoint():
+    """Test that unknown endpoints are rejected."""
+    with pytest.raises(ValueError, match="Endpoint must be one of"):
+        loadtest.build_workload([("/nope", 1.0)], [(64, 1.0)], 1)
+
+
+def test_run_load_in_process():
+    """Test a small run against every endpoint of the in-process app."""
+    specs = loadtest.build_workload(
+        [(endpoint, 1.0) for endpoint in loadtest.ENDPOINTS], [(64, 1.0)], 16, target_size=32
+    )
+    summary = _run(specs, concurrency=4, warmup=2)
+
+    assert summary["requests"] == 16
+    assert summary["errors"] == 0
+    assert summary["statuses"] == {"200": 16}
+    assert summary["throughput_rps"] > 0
+    assert set(summary["endpoints"]) <= set(loadtest.ENDPOINTS)
+    latency = summary["latency_ms"]
+    assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+
+
+def test_run_load_raw_endpoints():
+    """Test a small run against the raw-body variants of every endpoint."""
+    specs = loadtest.build_workload(
+        [(endpoint, 1.0) for endpoint in loadtest.RAW_ENDPOINTS], [(64, 1.0)], 8, target_size=32
+    )
+    summary = _run(specs, concurrency=4)
+    assert summary["statuses"] == {"200": 8}
+    assert set(summary["endpoints"]) <= set(loadtest.RAW_ENDPOINTS)
+
+
+def test_run_load_duration_ends_near_deadline():
+    """Test that --duration stops new work at the deadline, with bounded concurrency."""
+    active = {"now": 0, "max": 0}
+
+    async def handler(_request):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return httpx.Response(200)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            specs = loadtest.build_workload([("/predict", 1.0)], [(64, 1.0)], 4)
+            started = time.perf_counter()
+            stats = await loadtest.run_load(client, specs, concurrency=3, duration=0.3)
+            return stats.summary(), time.perf_counter() - started
+
+    summary, elapsed = asyncio.run(run())
+    assert 0.3 <= elapsed < 1.0
+    assert active["max"] <= 3
+    # About 0.3 s / 0.01 s per request * 3 slots, far from an unbounded burst
+    assert 0 < summary["requests"] < 200
+
+
+def test_ingest_comparison():
+    """Test the multipart vs raw-body benchmark on the in-process app."""
+    results = ingest.run_comparison(["/resize"], [64], requests=4, concurrency=2, warmup=0)
+    assert [(result["endpoint"], result["size"]) for result in results] == [("/resize", 64)]
+    assert results[0]["multipart"]["errors"] == results[0]["raw"]["errors"] == 0
+    assert ingest.format_results(results).splitlines()[1].split()[:2] == ["/resize", "64"]
+    with pytest.raises(ValueError, match="Endpoint must be one of"):
+        ingest.run_comparison(["/resize/raw"], [64])
+
+
+def test_replay_trace(tmp_path):
+    """Test replaying a JSONL trace, including scheduled and failing requests."""
+    trace = tmp_path / "trace.jsonl"
+    lines = [
+        {"endpoint": "/resize", "size": 64, "form": {"width": 16, "height": 16}, "at": 0.02},
+        {"endpoint": "/predict", "size": 64, "at": 0.0},
+        {"endpoint": "/resize", "size": 64, "form": {"width": 0, "height": 16}, "at": 0.01},
+    ]
+    trace.write_text("\n".join(json.dumps(line) for line in lines) + "\n\n")
+
+    specs = loadtest.load_trace(str(trace))
+    assert [spec.at for spec in specs] == [0.0, 0.01, 0.02]
+
+    summary = _run(specs, concurrency=2)
+    assert summary["requests"] == 3
+    assert summary["errors"] == 1
+    assert summary["endpoints"]["/resize"]["errors"] == 1
+    assert summary["duration_s"] >= 0.02
+
+
+def test_load_trace_rejects_unknown_endpoint(tmp_path):
+    """Test that trace lines must name a known endpoint."""
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text(json.dumps({"request_id": "x"}) + "\n")
+    with pytest.raises(ValueError, match="trace.jsonl:1"):
+        loadtest.load_trace(str(trace))
+
+
+def _summary(rps, p50, errors=0):
+    latency = {"mean": p50, "p50": p50, "p95": p50 * 2, "p99": p50 * 3, "max": p50 * 4}
+    return {
+        "requests": 100,
+        "errors": errors,
+        "throughput_rps": rps,
+        "latency_ms": latency,
+        "endpoints": {"/predict": {"requests": 100, "errors": errors, "latency_ms": latency}},
+    }
+
+
+def test_check_regression():
+    """Test regression detection against a baseline."""
+    baseline = _summary(100.0, 10.0)
+    assert not loadtest.check_regression(_summary(90.0, 11.0), baseline, tolerance=0.2)
+
+    failures = loadtest.check_regression(_summary(70.0, 13.0, errors=1), baseline, 0.2)
+    assert any("throughput" in failure for failure in failures)
+    assert any("error rate" in failure for failure in failures)
+    assert any(failure.startswith("overall p95") for failure in failures)
+    assert any(failure.startswith("/predict p99") for failure in failures)
+
+
+def test_main_fails_on_regression(tmp_path, capsys):
+    """Test that main writes a summary and exits 1 when it regresses."""
+    output = tmp_path / "run.json"
+    args = ["-n", "4", "-c", "2", "--warmup", "0", "--sizes", "64", "--endpoints", "/predict"]
+    assert loadtest.main(args + ["--output", str(output)]) == 0
+    assert json.loads(output.read_text())["requests"] == 4
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(_summary(1e9, 1e-6)))
+    assert loadtest.main(args + ["--baseline", str(baseline)]) == 1
+    assert "Regression: throughput" in capsys.readouterr().err
@@ -1,10 +1,31 @@
 """Tests for the logic module."""
 
+import io
+import numpy as np
 import pytest
 from PIL import Image
 from logic.classifier import (
     predict_class,
+    predict_batch,
+    predict_array,
+    images_to_batch,
+    images_to_tensor,
+    tensor_to_npy,
+    encode_image,
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    ImageTooLargeError,
+    check_image_limits,
+    probe_image,
+    draft_image,
+    fit_box,
+    fit_image,
+    fit_scaled_size,
+    parse_size,
+    plan_resize,
+    resize_cascade,
     resize_image,
+    RESIZE_PROFILES,
     convert_to_rgb,
     normalize_image,
     preprocess_image,
@@ -25,6 +46,104 @@ def test_predict_class_with_invalid_input():
         predict_class("not_an_image")
 
 
+def test_predict_batch_with_valid_images():
+    """Test batch prediction keeps one result per image."""
+    images = [
+        Image.new("RGB", (100, 100), color="red"),
+        Image.new("L", (50, 80), color=128),
+        Image.new("RGBA", (224, 224)),
+    ]
+    predicted = predict_batch(images)
+    assert len(predicted) == 3
+    assert all(name in CLASS_NAMES for name in predicted)
+
+
+def test_predict_batch_with_empty_list():
+    """Test batch prediction with no images."""
+    assert predict_batch([]) == []
+
+
+def test_predict_batch_with_invalid_input():
+    """Test batch prediction with an invalid item."""
+    with pytest.raises(ValueError, match="Input must be a PIL Image object"):
+        predict_batch([Image.new("RGB", (10, 10)), "not_an_image"])
+
+
+def test_predict_array_with_invalid_shape():
+    """Test array prediction with a non-batched array."""
+    with pytest.raises(ValueError, match="Batch must be an array of shape"):
+        predict_array(np.zeros((224, 224, 3), dtype=np.uint8))
+
+
+def test_images_to_batch():
+    """Test stacking preprocessed images into one array."""
+    images = [Image.new("L", (100, 50), color=10), Image.new("RGB", (32, 16), color="blue")]
+    batch = images_to_batch(images, 32, 16)
+    assert batch.shape == (2, 16, 32, 3)
+    assert batch.dtype == np.uint8
+    assert tuple(batch[0, 0, 0]) == (10, 10, 10)
+    assert tuple(batch[1, 0, 0]) == (0, 0, 255)
+
+
+def test_images_to_batch_with_preallocated_output():
+    """Test writing a batch into a preallocated array."""
+    out = np.zeros((1, 8, 8, 3), dtype=np.uint8)
+    batch = images_to_batch([Image.new("RGB", (8, 8), color="white")], 8, 8, out=out)
+    assert batch is out
+    assert out.min() == 255
+
+
+def test_images_to_batch_with_wrong_output_shape():
+    """Test writing a batch into an array of the wrong shape."""
+    with pytest.raises(ValueError, match="Output array must have shape"):
+        images_to_batch([Image.new("RGB", (8, 8))], 8, 8, out=np.zeros((2, 8, 8, 3), np.uint8))
+
+
+def test_images_to_tensor_float32():
+    """Test normalized CHW float32 tensor output."""
+    images = [Image.new("RGB", (100, 50), color=(255, 0, 128)), Image.new("L", (10, 10))]
+    tensor = images_to_tensor(images, 32, 16)
+    assert tensor.shape == (2, 3, 16, 32)
+    assert tensor.dtype == np.float32
+    expected = (np.array([255, 0, 128]) / 255.0 - np.array(IMAGENET_MEAN)) / IMAGENET_STD
+    assert tensor[0, :, 5, 5] == pytest.approx(expected, abs=1e-3)
+    assert tensor[1, :, 0, 0] == pytest.approx(-np.array(IMAGENET_MEAN) / IMAGENET_STD, abs=1e-5)
+
+
+def test_images_to_tensor_with_custom_normalization():
+    """Test tensor output with custom mean and std."""
+    tensor = images_to_tensor(
+        [Image.new("RGB", (4, 4), color="white")], 4, 4, mean=(0, 0, 0), std=(1, 1, 1)
+    )
+    assert np.allclose(tensor, 1.0)
+
+
+def test_images_to_tensor_uint8():
+    """Test raw uint8 NHWC tensor output."""
+    tensor = images_to_tensor([Image.new("RGB", (4, 4), color="red")], 4, 4, dtype="uint8")
+    assert tensor.shape == (1, 4, 4, 3)
+    assert tensor.dtype == np.uint8
+
+
+def test_images_to_tensor_with_invalid_dtype():
+    """Test tensor output with an unsupported dtype."""
+    with pytest.raises(ValueError, match="Tensor dtype must be one of"):
+        images_to_tensor([Image.new("RGB", (4, 4))], dtype="float16")
+
+
+def test_images_to_tensor_with_invalid_std():
+    """Test tensor output with a zero standard deviation."""
+    with pytest.raises(ValueError, match="Mean and std must have 3 values"):
+        images_to_tensor([Image.new("RGB", (4, 4))], std=(1, 0, 1))
+
+
+def test_tensor_to_npy_roundtrip():
+    """Test serializing a tensor to .npy bytes."""
+    tensor = np.arange(24, dtype=np.float32).reshape(1, 2, 3, 4)
+    loaded = np.load(io.BytesIO(tensor_to_npy(tensor)))
+    assert np.array_equal(loaded, tensor)
+
+
 def test_resize_image_with_valid_dimensions():
     """Test resizing with valid dimensions."""
     image = Image.new("RGB", (100, 100), color="blue")
@@ -87,6 +206,43 @@ def test_normalize_image_with_invalid_input():
         normalize_image("not_an_image")
 
 
+def test_probe_image_reads_header_only():
+    """Test probing an image without decoding its pixels."""
+    image = _large_jpeg()
+    probe = probe_image(image)
+    assert probe == ("JPEG", 1600, 1200, "RGB", 1)
+    assert image.tile
+
+
+def test_probe_image_counts_frames():
+    """Test probing an animated image."""
+    frames = [Image.new("RGB", (10, 10), color=(80 * index, 0, 0)) for index in range(3)]
+    img_bytes = io.BytesIO()
+    frames[0].save(img_bytes, format="GIF", save_all=True, append_images=frames[1:])
+    img_bytes.seek(0)
+    probe = probe_image(Image.open(img_bytes))
+    assert probe.format == "GIF"
+    assert probe.mode == "P"
+    assert probe.frames == 3
+
+
+def test_probe_image_with_invalid_input():
+    """Test probing with invalid input."""
+    with pytest.raises(ValueError, match="Input must be a PIL Image object"):
+        probe_image("not_an_image")
+
+
+def test_check_image_limits():
+    """Test pixel and dimension limits."""
+    probe = probe_image(Image.new("RGB", (200, 100)))
+    check_image_limits(probe, max_pixels=20000, max_dimension=200)
+    check_image_limits(probe)
+    with pytest.raises(ImageTooLargeError, match="exceeds the limit of 19999 pixels"):
+        check_image_limits(probe, max_pixels=19999)
+    with pytest.raises(ImageTooLargeError, match="exceed the limit of 199 pixels per side"):
+        check_image_limits(probe, max_dimension=199)
+
+
 def test_preprocess_image_with_defaults():
     """Test preprocessing with default dimensions."""
     image = Image.new("RGB", (100, 100), color="purple")
@@ -109,6 +265,237 @@ def test_preprocess_image_with_invalid_input():
         preprocess_image("not_an_image")
 
 
+def _large_jpeg(size=(1600, 1200)):
+    """Open a JPEG image that has not been decoded yet."""
+    img_bytes = io.BytesIO()
+    Image.new("RGB", size, color="orange").save(img_bytes, format="JPEG")
+    img_bytes.seek(0)
+    return Image.open(img_bytes)
+
+
+def test_draft_image_reduces_jpeg_decode_size():
+    """Test that draft mode decodes a large JPEG at a reduced scale."""
+    image = _large_jpeg()
+    box = draft_image(image, 100, 100, 2.0)
+    assert box is not None
+    assert image.size == (400, 300)
+    assert image.size[1] >= 100 * 2.0
+
+
+def test_draft_image_disabled():
+    """Test that a reducing gap of None or 0 leaves the image untouched."""
+    image = _large_jpeg()
+    assert draft_image(image, 100, 100, None) is None
+    assert draft_image(image, 100, 100, 0) is None
+    assert image.size == (1600, 1200)
+
+
+def test_draft_image_ignores_decoded_images():
+    """Test that draft mode is skipped for in-memory images."""
+    image = Image.new("RGB", (1600, 1200))
+    assert draft_image(image, 100, 100) is None
+    assert image.size == (1600, 1200)
+
+
+def test_resize_image_with_reducing_gap():
+    """Test two-step resizing of a large JPEG."""
+    resized = resize_image(_large_jpeg(), 100, 80, 2.0)
+    assert resized.size == (100, 80)
+    assert resized.getpixel((50, 40)) == pytest.approx((255, 165, 0), abs=3)
+
+
+def test_resize_image_with_invalid_reducing_gap():
+    """Test resizing with a reducing gap below 1.0."""
+    image = Image.new("RGB", (100, 100))
+    with pytest.raises(ValueError, match="Reducing gap must be at least 1.0"):
+        resize_image(image, 50, 50, 0.5)
+
+
+def test_plan_resize_profiles():
+    """Test the filter and reducing gap chosen by each profile."""
+    down = {
+        profile: plan_resize((1600, 1200), 100, 75, 3.0, profile) for profile in RESIZE_PROFILES
+    }
+    assert down == {
+        "fast": (Image.Resampling.BILINEAR, 1.0),
+        "balanced": (Image.Resampling.BICUBIC, 2.0),
+        "quality": (Image.Resampling.LANCZOS, 3.0),
+    }
+    # A disabled reducing gap stays disabled, and upscales never reduce
+    assert plan_resize((1600, 1200), 100, 75, 0, "fast") == (Image.Resampling.BILINEAR, None)
+    assert plan_resize((100, 75), 200, 150, 3.0, "quality") == (Image.Resampling.BICUBIC, None)
+    assert plan_resize((100, 75), 200, 150, 3.0, "fast") == (Image.Resampling.BILINEAR, None)
+    # Shrinking either side counts as a downscale
+    assert plan_resize((100, 75), 200, 50, 3.0, "quality")[0] == Image.Resampling.LANCZOS
+
+
+@pytest.mark.parametrize("profile", RESIZE_PROFILES)
+def test_resize_image_profiles(profile):
+    """Test resizing a large JPEG down and a small image up with each profile."""
+    resized = resize_image(_large_jpeg(), 100, 80, profile=profile)
+    assert resized.size == (100, 80)
+    assert resized.getpixel((50, 40)) == pytest.approx((255, 165, 0), abs=3)
+    assert resize_image(Image.new("L", (10, 10)), 40, 30, profile=profile).size == (40, 30)
+
+
+def test_fast_profile_decodes_less():
+    """Test that the fast profile reduces a JPEG further before resampling."""
+    fast, quality = _large_jpeg(), _large_jpeg()
+    preprocess_image(fast, 100, 75, profile="fast")
+    preprocess_image(quality, 100, 75, profile="quality")
+    assert fast.size == (200, 150)
+    assert quality.size == (400, 300)
+
+
+def _halves(size=(200, 100)):
+    """Make an image with a red left half and a blue right half."""
+    image = Image.new("RGB", size, "red")
+    image.paste("blue", (size[0] // 2, 0, size[0], size[1]))
+    return image
+
+
+def test_fit_box():
+    """Test the source box, resized size and paste offset of each fit mode."""
+    assert fit_box((400, 200), 100, 100, "stretch") == ((0, 0, 400, 200), (100, 100), (0, 0))
+    assert fit_box((400, 200), 100, 100, "cover") == ((100, 0, 300, 200), (100, 100), (0, 0))
+    assert fit_box((400, 200), 100, 100, "contain") == ((0, 0, 400, 200), (100, 50), (0, 25))
+    assert fit_box((200, 400), 100, 100, "contain")[1:] == ((50, 100), (25, 0))
+    # Cover scales the whole image past the target size before cropping
+    assert fit_scaled_size((400, 200), 100, 100, "cover") == (200, 100)
+    assert fit_scaled_size((400, 200), 100, 100, "contain") == (100, 50)
+    with pytest.raises(ValueError, match="Fit must be one of"):
+        fit_box((400, 200), 100, 100, "fill")
+
+
+def test_fit_image_modes():
+    """Test that cover crops the center, contain letterboxes and stretch squashes."""
+    image = _halves((400, 100))
+    cover = fit_image(image, 50, 50, "cover")
+    assert cover.size == (50, 50)
+    reference = image.crop((150, 0, 250, 100)).resize((50, 50), Image.Resampling.LANCZOS)
+    assert np.array_equal(np.asarray(cover), np.asarray(reference))
+
+    contain = fit_image(image, 50, 50, "contain")
+    assert contain.size == (50, 50)
+    assert contain.getpixel((25, 5)) == (0, 0, 0)
+    assert contain.getpixel((5, 25)) == (255, 0, 0)
+    assert contain.getpixel((45, 25)) == (0, 0, 255)
+
+    stretch = fit_image(image, 50, 50, "stretch")
+    assert np.array_equal(np.asarray(stretch), np.asarray(resize_image(image, 50, 50)))
+
+
+def test_preprocess_image_fit_drafts_jpeg():
+    """Test fitting a large JPEG decodes it at reduced size and keeps the center."""
+    image = Image.open(io.BytesIO(encode_image(_halves((3600, 1200)), "JPEG", 95)))
+    preprocessed = preprocess_image(image, 100, 100, fit="cover")
+    assert preprocessed.size == (100, 100)
+    assert image.size == (900, 300)
+    assert preprocessed.getpixel((10, 50)) == pytest.approx((254, 0, 0), abs=3)
+    assert preprocessed.getpixel((90, 50)) == pytest.approx((0, 0, 254), abs=3)
+
+    batch = images_to_batch([_halves(), _halves((100, 200))], 32, 32, fit="contain")
+    assert batch.shape == (2, 32, 32, 3)
+    assert batch[0, 0, 16].tolist() == [0, 0, 0]
+    assert batch[1, 16, 0].tolist() == [0, 0, 0]
+
+
+def test_parse_size():
+    """Test exact sizes and longer-side sizes."""
+    assert parse_size("128x96", (400, 200)) == (128, 96)
+    assert parse_size("100", (400, 200)) == (100, 50)
+    assert parse_size("100", (200, 400)) == (50, 100)
+    assert parse_size("4", (4000, 10)) == (4, 1)
+    for spec in ("", "0", "10x", "axb", "1x2x3", "-5"):
+        with pytest.raises(ValueError, match="Size must be"):
+            parse_size(spec, (400, 200))
+
+
+def test_resize_cascade():
+    """Test that a cascade decodes a JPEG once and matches separate resizes closely."""
+    image = _large_jpeg((1600, 1200))
+    sizes = [(64, 48), (400, 300), (128, 128), (64, 48)]
+    resized = resize_cascade(image, sizes)
+    assert [thumbnail.size for thumbnail in resized] == sizes
+    # One draft decode, at the scale the largest size needs
+    assert image.size == (1600, 1200) and not image.tile
+    for thumbnail in resized:
+        assert thumbnail.getpixel((10, 10)) == pytest.approx((255, 165, 0), abs=3)
+
+    with pytest.raises(ValueError, match="At least one size"):
+        resize_cascade(Image.new("RGB", (10, 10)), [])
+    with pytest.raises(ValueError, match="positive"):
+        resize_cascade(Image.new("RGB", (10, 10)), [(0, 5)])
+
+
+def test_resize_cascade_resamples_from_larger_results(monkeypatch):
+    """Test that each size is resampled from the smallest larger result."""
+    sources = []
+    original_resize = Image.Image.resize
+
+    def resize(self, size, *args, **kwargs):
+        sources.append((self.size, size))
+        return original_resize(self, size, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "resize", resize)
+    resize_cascade(Image.new("RGB", (800, 600)), [(64, 48), (400, 300), (1000, 100), (100, 75)])
+    # 1000x100 is not covered by 400x300, so it is resampled from the source
+    assert sources == [
+        ((800, 600), (400, 300)),
+        ((800, 600), (1000, 100)),
+        ((1000, 100), (100, 75)),
+        ((100, 75), (64, 48)),
+    ]
+
+
+def test_resize_image_with_invalid_profile():
+    """Test resizing with an unknown profile."""
+    with pytest.raises(ValueError, match="Resize profile must be one of"):
+        resize_image(Image.new("RGB", (100, 100)), 50, 50, profile="best")
+
+
+def test_preprocess_image_with_large_jpeg():
+    """Test preprocessing a large JPEG decoded in draft mode."""
+    preprocessed = preprocess_image(_large_jpeg(), 224, 224)
+    assert preprocessed.size == (224, 224)
+    assert preprocessed.mode == "RGB"
+
+
+def test_preprocess_image_with_zero_dimensions():
+    """Test preprocessing with zero dimensions."""
+    with pytest.raises(ValueError, match="Width and height must be positive integers"):
+        preprocess_image(_large_jpeg(), 0, 224)
+
+
+@pytest.mark.parametrize("image_format", ["JPEG", "png", "WebP"])
+def test_encode_image(image_format):
+    """Test encoding an image in each supported format."""
+    image = Image.new("RGB", (40, 30), color="green")
+    encoded = encode_image(image, image_format, 90)
+    decoded = Image.open(io.BytesIO(encoded))
+    assert decoded.format == image_format.upper()
+    assert decoded.size == (40, 30)
+
+
+def test_encode_image_converts_alpha_for_jpeg():
+    """Test that JPEG encoding converts modes JPEG cannot store."""
+    image = Image.new("RGBA", (10, 10), color=(0, 0, 255, 128))
+    decoded = Image.open(io.BytesIO(encode_image(image, "JPEG")))
+    assert decoded.mode == "RGB"
+
+
+def test_encode_image_with_invalid_format():
+    """Test encoding with an unsupported format."""
+    with pytest.raises(ValueError, match="Format must be one of"):
+        encode_image(Image.new("RGB", (10, 10)), "BMP")
+
+
+def test_encode_image_with_invalid_quality():
+    """Test encoding with an out-of-range quality."""
+    with pytest.raises(ValueError, match="Quality must be between 1 and 100"):
+        encode_image(Image.new("RGB", (10, 10)), "JPEG", 0)
+
+
 def test_class_names_not_empty():
     """Test that CLASS_NAMES is not empty."""
     assert len(CLASS_NAMES) > 0
@@ -0,0 +1,114 @@
+"""Tests for the metrics module and /metrics endpoint."""
+
+import io
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from api import metrics
+from api.api import app
+from logic.timing import StageRecorder
+
+
+@pytest.fixture
+def client():
+    """Create a test client."""
+    return TestClient(app)
+
+
+def _jpeg_bytes(size=(320, 240)):
+    """Create JPEG bytes for an image of the given size."""
+    img_bytes = io.BytesIO()
+    Image.new("RGB", size, color="red").save(img_bytes, format="JPEG")
+    return img_bytes.getvalue()
+
+
+def test_counter_and_gauge_render():
+    """Test counter and gauge text exposition."""
+    counter = metrics.Counter("test_total", "A counter.", ("kind",))
+    counter.inc("a")
+    counter.inc("a", value=2)
+    gauge = metrics.Gauge("test_gauge", "A gauge.")
+    gauge.inc()
+    gauge.dec()
+    gauge.set(value=5)
+
+    assert counter.get("a") == 3
+    assert counter.render() == [
+        "# HELP test_total A counter.",
+        "# TYPE test_total counter",
+        'test_total{kind="a"} 3',
+    ]
+    assert gauge.render()[-1] == "test_gauge 5"
+
+
+def test_histogram_render():
+    """Test that histogram buckets are cumulative and end with +Inf."""
+    histogram = metrics.Histogram("test_seconds", "A histogram.", ("stage",), (0.1, 1.0))
+    histogram.observe("read", value=0.05)
+    histogram.observe("read", value=0.5)
+    histogram.observe("read", value=5.0)
+
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="read",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="read",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="read",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="read"} 3' in lines
+    assert histogram.count("read") == 3
+
+
+def test_label_values_are_escaped():
+    """Test escaping of quotes and backslashes in label values."""
+    counter = metrics.Counter("test_total", "A counter.", ("path",))
+    counter.inc('a"b\\c')
+    assert counter.render()[-1] == 'test_total{path="a\\"b\\\\c"} 1'
+
+
+def test_server_timing():
+    """Test the Server-Timing header value."""
+    recorder = StageRecorder()
+    recorder.add_stage("read", 0.001)
+    recorder.add_stage("read", 0.001)
+    recorder.add_stage("open", 0.0005)
+    assert metrics.server_timing(recorder, 0.01) == "read;dur=2.00, open;dur=0.50, total;dur=10.00"
+
+
+def test_metrics_endpoint(client):
+    """Test that /metrics serves the text exposition format."""
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE image_api_requests_total counter" in response.text
+    assert 'image_api_requests_total{endpoint="/health",method="GET",status="200"}' in response.text
+
+
+def test_request_metrics_and_server_timing(client):
+    """Test that a request records stages, bytes, pixels and a Server-Timing header."""
+    requests_before = metrics.REQUESTS.get("/resize", "POST", "200")
+    bytes_in_before = metrics.BYTES_IN.get("/resize")
+    bytes_out_before = metrics.BYTES_OUT.get("/resize")
+    pixels_before = metrics.DECODED_PIXELS.get("/resize")
+    resize_before = metrics.STAGE_DURATION.count("/resize", "resize")
+
+    files = {"file": ("test.jpg", _jpeg_bytes(), "image/jpeg")}
+    data = {"width": "32", "height": "32"}
+    response = client.post("/resize", files=files, data=data, headers={"Cache-Control": "no-cache"})
+    assert response.status_code == 200
+
+    server_timing = response.headers["server-timing"]
+    for name in ("read", "queue", "open", "resize", "serialize", "total"):
+        assert f"{name};dur=" in server_timing
+
+    assert metrics.REQUESTS.get("/resize", "POST", "200") == requests_before + 1
+    assert metrics.BYTES_IN.get("/resize") > bytes_in_before
+    assert metrics.BYTES_OUT.get("/resize") == bytes_out_before + len(response.content)
+    assert metrics.DECODED_PIXELS.get("/resize") > pixels_before
+    assert metrics.STAGE_DURATION.count("/resize", "resize") == resize_before + 1
+    assert metrics.IN_FLIGHT.get("/resize") == 0
+
+
+def test_unknown_paths_share_a_label(client):
+    """Test that unmatched paths are labelled "other"."""
+    before = metrics.REQUESTS.get("other", "GET", "404")
+    client.get("/no-such-path")
+    assert metrics.REQUESTS.get("other", "GET", "404") == before + 1
@@ -0,0 +1,152 @@
+"""Tests for the declarative preprocessing pipeline."""
+
+import io
+import json
+import numpy as np
+import pytest
+from PIL import Image
+from logic.pipeline import (
+    Convert,
+    Crop,
+    PipelineError,
+    Resample,
+    compile_pipeline,
+    parse_pipeline,
+    run_pipeline,
+)
+
+CENTER_CROP_SPEC = [
+    {"op": "rgb"},
+    {"op": "resize_shorter", "size": 256},
+    {"op": "center_crop", "size": 224},
+]
+
+
+def _jpeg(size=(1600, 1200)):
+    """Create a just-opened JPEG with some texture."""
+    buffer = io.BytesIO()
+    noise = Image.effect_noise(size, 40).convert("L")
+    Image.merge("RGB", (noise, Image.linear_gradient("L").resize(size), noise)).save(
+        buffer, format="JPEG"
+    )
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+@pytest.mark.parametrize(
+    "spec, message",
+    [
+        ("not json", "not valid JSON"),
+        ([], "non-empty list"),
+        ([{"op": "blur"}], "op one of"),
+        ([{"op": "resize", "width": 10}], "missing height"),
+        ([{"op": "rgb", "mode": "L"}], "unknown parameters mode"),
+        ([{"op": "resize_shorter", "size": 0}], "size must be a positive integer"),
+        ([{"op": "crop", "left": -1, "top": 0, "width": 1, "height": 1}], "left must be"),
+        ([{"op": "convert", "mode": "P"}], "mode must be one of"),
+        ([{"op": "center_crop", "size": 5, "width": 5}], "either size"),
+        ([{"op": "center_crop", "width": 5}], "either size"),
+        ([{"op": "resize_longer", "size": 5, "profile": "best"}], "profile must be one of"),
+        ([{"op": "resize_longer", "size": 5, "reducing_gap": 0.5}], "reducing_gap"),
+        ([{"op": "rgb"}] * 33, "more than 32 ops"),
+    ],
+)
+def test_parse_pipeline_rejects_invalid_specs(spec, message):
+    """Test that malformed specs are rejected with a useful message."""
+    with pytest.raises(PipelineError, match=message):
+        parse_pipeline(spec)
+
+
+def test_parse_pipeline_accepts_json():
+    """Test that specs can be given as JSON text."""
+    assert parse_pipeline(json.dumps(CENTER_CROP_SPEC)) == CENTER_CROP_SPEC
+
+
+def test_compile_merges_resize_and_crop_into_one_resample():
+    """Test that a resize followed by a crop becomes one resample of a source box."""
+    plan = compile_pipeline(CENTER_CROP_SPEC, (1600, 1200), "RGB")
+    assert plan.size == (224, 224) and plan.mode == "RGB"
+    (step,) = plan.steps
+    assert isinstance(step, Resample)
+    assert step.size == (224, 224)
+    # The 341x256 resize is cropped at (58, 16), i.e. 1051x1050 at (272.1, 75) in the source
+    assert step.box == pytest.approx((272.14, 75.0, 1323.17, 1125.0), abs=0.01)
+    assert step.resample == Image.Resampling.LANCZOS
+
+
+def test_compile_converts_after_shrinking():
+    """Test that conversions run on the shrunk image, except for palette and alpha sources."""
+    plan = compile_pipeline(CENTER_CROP_SPEC, (1600, 1200), "L")
+    assert [type(step) for step in plan.steps] == [Resample, Convert]
+    plan = compile_pipeline(CENTER_CROP_SPEC, (1600, 1200), "P")
+    assert [type(step) for step in plan.steps] == [Convert, Resample]
+
+
+@pytest.mark.parametrize("convert_first", [True, False])
+def test_alpha_sources_keep_spec_order(convert_first):
+    """Test that RGBA conversions stay on their side of the resample, as in the spec."""
+    image = Image.new("RGBA", (40, 40), (255, 0, 0, 0))
+    image.paste((0, 0, 255, 255), (0, 0, 20, 40))
+    resize = {"op": "resize", "width": 20, "height": 20}
+    spec = [{"op": "rgb"}, resize] if convert_first else [resize, {"op": "rgb"}]
+
+    plan = compile_pipeline(spec, image.size, image.mode)
+    expected = [Convert, Resample] if convert_first else [Resample, Convert]
+    assert [type(step) for step in plan.steps] == expected
+
+    if convert_first:
+        reference = image.convert("RGB").resize((20, 20), Image.Resampling.LANCZOS)
+    else:
+        reference = image.resize((20, 20), Image.Resampling.LANCZOS).convert("RGB")
+    result = run_pipeline(image.copy(), spec)
+    assert np.array_equal(np.asarray(result), np.asarray(reference))
+
+
+def test_compile_upscale_converts_first_only_when_dropping_bands():
+    """Test conversion placement around an upscale."""
+    upscale = {"op": "resize", "width": 800, "height": 600}
+    plan = compile_pipeline([{"op": "convert", "mode": "L"}, upscale], (400, 300), "RGB")
+    assert plan.steps[0] == Convert("L")
+    assert plan.steps[1].resample == Image.Resampling.BICUBIC
+    plan = compile_pipeline([{"op": "rgb"}, upscale], (400, 300), "L")
+    assert plan.steps[1] == Convert("RGB")
+
+
+def test_compile_skips_no_ops():
+    """Test that no-op conversions and resizes are dropped, and crops skip resampling."""
+    spec = [{"op": "rgb"}, {"op": "resize", "width": 400, "height": 300}, {"op": "rgb"}]
+    assert compile_pipeline(spec, (400, 300), "RGB").steps == ()
+
+    spec = [{"op": "crop", "left": 10, "top": 20, "width": 100, "height": 50}, {"op": "rgb"}]
+    plan = compile_pipeline(spec, (400, 300), "L")
+    assert plan.steps == (Crop((10, 20, 110, 70)), Convert("RGB"))
+    assert plan.describe() == ["crop 100x50 at (10, 20)", "convert to RGB"]
+
+
+def test_compile_rejects_crops_outside_the_image():
+    """Test that crops must fit in the image at that point of the pipeline."""
+    spec = [{"op": "resize_longer", "size": 100}, {"op": "center_crop", "size": 80}]
+    with pytest.raises(PipelineError, match="outside the 100x75 image"):
+        compile_pipeline(spec, (400, 300), "RGB")
+
+
+def test_run_pipeline_matches_step_by_step_result():
+    """Test that the fused plan matches running the ops one by one, and draft-decodes."""
+    image = _jpeg((3200, 2400))
+    result = run_pipeline(image, CENTER_CROP_SPEC)
+    assert result.size == (224, 224) and result.mode == "RGB"
+    assert image.size == (1600, 1200)
+
+    reference = _jpeg((3200, 2400)).convert("RGB").resize((341, 256), Image.Resampling.LANCZOS)
+    reference = reference.crop((58, 16, 282, 240))
+    difference = np.asarray(result, dtype=np.float64) - np.asarray(reference, dtype=np.float64)
+    assert 10 * np.log10(255.0**2 / np.mean(difference**2)) > 30
+
+
+def test_run_plan_checks_the_image():
+    """Test that a plan only runs on images like the one it was compiled for."""
+    plan = compile_pipeline(CENTER_CROP_SPEC, (1600, 1200), "RGB")
+    with pytest.raises(ValueError, match="size and mode"):
+        plan.run(Image.new("RGB", (100, 100)))
+    with pytest.raises(ValueError, match="PIL Image"):
+        run_pipeline("image.jpg", CENTER_CROP_SPEC)
@@ -0,0 +1,70 @@
+"""Tests for the metadata scanner module."""
+
+import pytest
+from PIL import Image
+from cli.scan import Reservoir, ScanSummary, iter_scan_paths, probe_file, scan
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Create a directory with a few images of different modes."""
+    Image.new("RGB", (40, 30)).save(tmp_path / "a.png")
+    Image.new("L", (20, 10)).save(tmp_path / "b.jpg")
+    Image.new("RGBA", (8, 8)).save(tmp_path / "c.png")
+    return tmp_path
+
+
+def test_probe_file(image_dir):
+    """Test probing one file."""
+    record = probe_file(str(image_dir / "b.jpg"))
+    assert record["format"] == "JPEG"
+    assert (record["width"], record["height"], record["mode"]) == (20, 10, "L")
+    assert record["bytes"] > 0
+    assert "mtime" in record
+
+
+def test_probe_file_with_invalid_file(tmp_path):
+    """Test probing a file that is not an image."""
+    path = tmp_path / "bad.png"
+    path.write_bytes(b"not an image")
+    record = probe_file(str(path))
+    assert record["path"] == str(path)
+    assert "error" in record
+
+
+def test_scan_keeps_input_order(image_dir):
+    """Test that records come back in input order."""
+    paths = list(iter_scan_paths([str(image_dir)])) * 10
+    records = list(scan(iter(paths), jobs=3))
+    assert [record["path"] for record in records] == paths
+
+
+def test_scan_with_invalid_jobs():
+    """Test scanning with a non-positive thread count."""
+    with pytest.raises(ValueError, match="Jobs must be a positive integer"):
+        list(scan([], jobs=0))
+
+
+def test_reservoir_bounded_memory():
+    """Test that the reservoir keeps a bounded sample with exact min/max."""
+    reservoir = Reservoir(size=100)
+    for value in range(10000):
+        reservoir.add(value)
+    stats = reservoir.percentiles()
+    assert len(reservoir.samples) == 100
+    assert stats["min"] == 0
+    assert stats["max"] == 9999
+    assert 3000 < stats["p50"] < 7000
+
+
+def test_scan_summary(image_dir):
+    """Test aggregating scan records."""
+    summary = ScanSummary()
+    for record in scan(iter_scan_paths([str(image_dir)]), jobs=2):
+        summary.add(record)
+    summary.add({"path": "missing.png", "error": "not found"})
+    result = summary.to_dict()
+    assert result["files"] == 4
+    assert result["errors"] == 1
+    assert result["modes"] == {"RGB": 1, "L": 1, "RGBA": 1}
+    assert result["width"]["max"] == 40
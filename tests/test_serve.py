@@ -0,0 +1,125 @@
+"""Tests for the pre-fork multi-worker server."""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from api import serve
+from benchmarks import serve as serve_bench
+from benchmarks.loadtest import _free_port
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork") or not os.path.exists("/proc/self/task"),
+    reason="needs os.fork and /proc",
+)
+
+
+def _children(pid):
+    """Get the pids of a process's children."""
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as f:
+        return sorted(int(child) for child in f.read().split())
+
+
+def _wait_for(condition, timeout=20.0):
+    """Poll a condition until it is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.1)
+
+
+def _healthy(url):
+    try:
+        return httpx.get(f"{url}/health", timeout=1.0).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+@pytest.fixture(params=[False, True], ids=["shared-socket", "reuse-port"])
+def server(request):
+    """Start api.serve with two workers."""
+    port = _free_port()
+    command = [sys.executable, "-m", "api.serve", "--host", "127.0.0.1", "--port", str(port)]
+    command += ["--workers", "2", "--graceful-timeout", "5", "--log-level", "warning"]
+    if request.param:
+        command.append("--reuse-port")
+    process = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_for(lambda: _healthy(url) and len(_children(process.pid)) == 2)
+        yield process, url
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_default_worker_count(monkeypatch):
+    """Test that the worker count defaults to $WEB_CONCURRENCY, then the CPU count."""
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert serve.default_worker_count() == 3
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert serve.default_worker_count() == (os.cpu_count() or 1)
+
+
+def test_arbiter_validation():
+    """Test that invalid configurations are rejected."""
+    with pytest.raises(ValueError, match="positive"):
+        serve.Arbiter(workers=-1)
+    with pytest.raises(ValueError, match="port"):
+        serve.Arbiter(port=0, reuse_port=True)
+
+
+def test_reuse_port_sockets_share_a_port():
+    """Test that SO_REUSEPORT sockets can bind the same port."""
+    first = serve.bind_socket("127.0.0.1", 0, reuse_port=True)
+    second = serve.bind_socket("127.0.0.1", first.getsockname()[1], reuse_port=True)
+    assert first.getsockname() == second.getsockname()
+    first.close()
+    second.close()
+    plain = serve.bind_socket("127.0.0.1", 0)
+    with pytest.raises(OSError):
+        serve.bind_socket("127.0.0.1", plain.getsockname()[1])
+    plain.close()
+
+
+def test_crashed_worker_is_restarted(server):
+    """Test that a killed worker is replaced and the server keeps serving."""
+    process, url = server
+    workers = _children(process.pid)
+    os.kill(workers[0], signal.SIGKILL)
+    _wait_for(lambda: len(_children(process.pid)) == 2 and workers[0] not in _children(process.pid))
+    assert _healthy(url)
+
+
+def test_rolling_restart_and_shutdown(server):
+    """Test that SIGHUP replaces every worker and SIGTERM stops the server."""
+    process, url = server
+    workers = set(_children(process.pid))
+    process.send_signal(signal.SIGHUP)
+    _wait_for(
+        lambda: len(_children(process.pid)) == 2 and not workers & set(_children(process.pid))
+    )
+    assert _healthy(url)
+
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=20) == 0
+    with pytest.raises(OSError):
+        socket.create_connection(("127.0.0.1", int(url.rsplit(":", 1)[1])), timeout=1.0)
+
+
+def test_format_scaling_results():
+    """Test the scaling benchmark report."""
+    latency = {"p50": 10.0, "p99": 20.0}
+    results = [
+        {"workers": 1, "throughput_rps": 50.0, "latency_ms": latency, "errors": 0},
+        {"workers": 2, "throughput_rps": 95.0, "latency_ms": latency, "errors": 0},
+    ]
+    lines = serve_bench.format_results(results).splitlines()
+    assert lines[1].endswith("1.00x")
+    assert lines[2].endswith("1.90x")
@@ -0,0 +1,30 @@
+"""Tests for the CLI startup benchmark and budget."""
+
+from benchmarks import startup
+
+
+def test_parse_importtime():
+    """Test parsing -X importtime reports."""
+    report = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:      1500 |      31000 | cli.cli\n"
+        "unrelated line\n"
+    )
+    assert startup.parse_importtime(report) == {"_io": (0.12, 0.12), "cli.cli": (1.5, 31.0)}
+
+
+def test_cli_import_is_lazy_and_within_budget():
+    """Test that importing the CLI loads no heavy modules and stays within budget."""
+    result = startup.measure_import(repeat=3)
+    assert result["heavy_modules"] == []
+    assert result["import_ms"] < startup.IMPORT_BUDGET_MS, startup.format_report(
+        result, {"command": "-", "wall_ms": 0.0, "wall_ms_median": 0.0}
+    )
+
+
+def test_cli_help_runs():
+    """Test timing the CLI's --help."""
+    result = startup.measure_command(repeat=1)
+    assert result["command"] == "python -m cli.cli --help"
+    assert result["wall_ms"] > 0
@@ -0,0 +1,67 @@
+"""Tests for the stage timing module."""
+
+import asyncio
+from logic.executor import WorkerPool
+from logic.timing import StageRecorder, count, current_recorder, recording, stage
+
+
+def _staged_job(value):
+    """Job that records a stage and a counter in the worker."""
+    with stage("work"):
+        count("items", value)
+    return value
+
+
+def test_stage_without_recorder():
+    """Test that stages and counters are no-ops when nothing is recording."""
+    assert current_recorder() is None
+    with stage("work"):
+        count("items", 1)
+    assert current_recorder() is None
+
+
+def test_recording_collects_stages_and_counts():
+    """Test that stages and counters go to the active recorder."""
+    with recording() as recorder:
+        with stage("read"):
+            pass
+        with stage("read"):
+            pass
+        count("decoded_pixels", 10)
+        count("decoded_pixels", 5)
+
+    assert [name for name, _ in recorder.stages] == ["read", "read"]
+    assert list(recorder.totals()) == ["read"]
+    assert recorder.counts == {"decoded_pixels": 15}
+    assert current_recorder() is None
+
+
+def test_recorder_merge():
+    """Test merging one recorder into another."""
+    first, second = StageRecorder(), StageRecorder()
+    first.add_stage("open", 0.5)
+    first.add_count("items", 1)
+    second.add_stage("open", 0.25)
+    second.add_count("items", 2)
+
+    first.merge(second)
+    assert first.totals() == {"open": 0.75}
+    assert first.counts == {"items": 3}
+
+
+def test_pool_returns_worker_stages():
+    """Test that worker stages and the queue wait reach the caller's recorder."""
+    pool = WorkerPool("timing-test", "thread", 1)
+
+    async def run():
+        with recording() as recorder:
+            assert await pool.run(_staged_job, 3) == 3
+        return recorder
+
+    try:
+        recorder = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert set(recorder.totals()) == {"queue", "work"}
+    assert recorder.counts == {"items": 3}
@@ -0,0 +1,216 @@
+"""Tests for zero-copy upload handling."""
+
+import asyncio
+import gzip
+import io
+import mmap
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+import zlib
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from api import uploads
+from api.api import _resize_job, _run_cached, app
+from api.uploads import BodyDecoder, open_upload, upload_digest
+from logic.cache import content_hash
+from logic.executor import WorkerPool
+
+# Starlette spools uploads larger than this to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+@pytest.fixture
+def client():
+    """Create a test client."""
+    return TestClient(app)
+
+
+def _bmp_bytes(size=(1200, 900)):
+    """Encode a noise image as BMP, so the upload is as large as the decoded image."""
+    width, height = size
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="BMP")
+    return buffer.getvalue()
+
+
+def _upload(data, max_size=SPOOL_MAX_SIZE):
+    """Create an UploadFile spooled like Starlette's form parser does."""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+    spool.write(data)
+    return UploadFile(spool, size=len(data), filename="test.bmp")
+
+
+async def _source_type(file):
+    """Get the type of source that open_upload yields."""
+    async with open_upload(file) as source:
+        return type(source)
+
+
+def test_in_memory_upload_is_not_copied():
+    """Test that an upload kept in memory is handed over as the spool file itself."""
+    file = _upload(b"x" * 100)
+    assert asyncio.run(_source_type(file)) is tempfile.SpooledTemporaryFile
+
+
+def test_disk_upload_is_memory_mapped():
+    """Test that an upload spooled to disk is memory-mapped, and unmapped afterwards."""
+    file = _upload(b"x" * (SPOOL_MAX_SIZE + 1))
+
+    async def check():
+        async with open_upload(file) as source:
+            assert isinstance(source, mmap.mmap)
+            assert source[:3] == b"xxx"
+        assert source.closed
+
+    asyncio.run(check())
+
+
+def test_process_pool_gets_bytes(monkeypatch):
+    """Test that uploads are read into bytes for process pools, which can't share files."""
+    monkeypatch.setattr(uploads, "get_pool", lambda: WorkerPool("test", "process", 1))
+    assert asyncio.run(_source_type(_upload(b"x" * 100))) is bytes
+
+
+def test_process_pool_decodes_streamed_uploads_off_the_event_loop(monkeypatch):
+    """Test that incremental decoding runs in a thread even when the pool is a process pool."""
+    monkeypatch.setattr(uploads, "get_pool", lambda: WorkerPool("test", "process", 1))
+    threads = []
+
+    class RecordingDecoder(uploads.IncrementalImageDecoder):
+        def feed(self, data):
+            threads.append(threading.get_ident())
+            return super().feed(data)
+
+        def close(self):
+            threads.append(threading.get_ident())
+            return super().close()
+
+    monkeypatch.setattr(uploads, "IncrementalImageDecoder", RecordingDecoder)
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48)).save(buffer, format="JPEG")
+
+    async def decode():
+        feed = uploads._DecoderFeed((32, 32), None)
+        await feed.feed(buffer.getvalue())
+        return await feed.close(time.perf_counter())
+
+    assert asyncio.run(decode()).size[0] > 0
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+@pytest.mark.parametrize("size", [100, SPOOL_MAX_SIZE + 1])
+def test_upload_digest_matches_content_hash(size):
+    """Test that hashing a spooled upload gives the same key as hashing its bytes."""
+    data = bytes(range(256)) * (size // 256 + 1)
+
+    async def digest():
+        async with open_upload(_upload(data)) as source:
+            return upload_digest(source)
+
+    assert asyncio.run(digest()) == content_hash(data)
+
+
+@pytest.mark.parametrize("max_size", [SPOOL_MAX_SIZE, 8 * SPOOL_MAX_SIZE])
+def test_peak_allocation_stays_near_decoded_size(max_size):
+    """
+    Test that handling an upload does not copy it.
+
+    Decoded pixels live in PIL's own memory, which tracemalloc does not see. So
+    the Python allocations while hashing, decoding and resizing the upload must
+    be small next to the decoded image: then the peak per request is the decoded
+    image plus a small overhead, instead of several copies of the upload on top.
+    """
+    data = _bmp_bytes()
+    decoded_size = 1200 * 900 * 3
+
+    async def handle(file):
+        async with open_upload(file) as source:
+            return await _run_cached("resize", None, _resize_job, source, 100, 75, 2.0)
+
+    # Warm up imports and the worker pool
+    asyncio.run(handle(_upload(data, max_size)))
+
+    file = _upload(data, max_size)
+    tracemalloc.start()
+    try:
+        result, _ = asyncio.run(handle(file))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert result[0] == (1200, 900, "RGB")
+    assert peak < decoded_size // 4
+
+
+def test_resize_endpoint_with_disk_spooled_upload(client):
+    """Test an endpoint with an upload large enough to be memory-mapped."""
+    data = _bmp_bytes()
+    assert len(data) > SPOOL_MAX_SIZE
+    response = client.post(
+        "/resize",
+        files={"file": ("test.bmp", data, "image/bmp")},
+        data={"width": "120", "height": "90"},
+    )
+    assert response.status_code == 200
+    assert response.json()["original_size"] == {"width": 1200, "height": 900}
+
+
+def _decode_body(content_encoding, body, max_bytes=None, chunk_size=1000):
+    """Decode a body fed to a BodyDecoder in chunks."""
+    decoder = BodyDecoder(content_encoding, max_bytes)
+    chunks = [decoder.decode(body[i : i + chunk_size]) for i in range(0, len(body), chunk_size)]
+    return b"".join(chunks) + decoder.finish()
+
+
+@pytest.mark.parametrize(
+    "content_encoding, encode",
+    [
+        (None, lambda data: data),
+        ("identity", lambda data: data),
+        ("gzip", gzip.compress),
+        ("X-Gzip", gzip.compress),
+        ("deflate", zlib.compress),
+        ("gzip, deflate", lambda data: zlib.compress(gzip.compress(data))),
+    ],
+)
+def test_body_decoder(content_encoding, encode):
+    """Test undoing each supported Content-Encoding, fed in chunks."""
+    data = _bmp_bytes((100, 100))
+    assert _decode_body(content_encoding, encode(data)) == data
+
+
+def test_body_decoder_errors():
+    """Test unsupported codings, corrupt and truncated bodies, and the size cap."""
+    data = _bmp_bytes((100, 100))
+    with pytest.raises(HTTPException) as error:
+        BodyDecoder("br")
+    assert error.value.status_code == 415
+    for body in (b"not gzip", gzip.compress(data)[:-8]):
+        with pytest.raises(HTTPException) as error:
+            _decode_body("gzip", body)
+        assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        _decode_body(None, data, max_bytes=len(data) - 1)
+    assert error.value.status_code == 413
+    assert _decode_body(None, data, max_bytes=len(data)) == data
+
+
+def test_body_decoder_caps_decompression_bombs():
+    """Test that a highly compressed body is stopped at the cap, not inflated in full."""
+    bomb = gzip.compress(bytes(64 * 1024 * 1024))
+    tracemalloc.start()
+    try:
+        with pytest.raises(HTTPException) as error:
+            _decode_body("gzip", bomb, max_bytes=1024 * 1024, chunk_size=len(bomb))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert error.value.status_code == 413
+    assert peak < 8 * 1024 * 1024